@@ -0,0 +1,345 @@
+# agregados.py - TOTAIS MANTIDOS INCREMENTALMENTE
+from datetime import date
+
+from calculos import arredondar_valores
+from indices import IndiceGarantias
+from modelos import presente_ou
+
+# Os valores são somados como inteiros em ponto fixo (valor * 2**64). Somar e
+# depois subtrair o mesmo registro volta exatamente ao total anterior, sem o
+# erro acumulado que teríamos subtraindo floats. A conversão para float só
+# acontece na leitura, antes do mesmo round(..., 2) usado em calculos.py.
+ESCALA = 2 ** 64
+
+
+def _total(fixo, quantidade):
+    """Converte para float; sem registros devolve 0 (int), como sum() de lista vazia"""
+    return fixo / ESCALA if quantidade else 0
+
+
+def _fixo(valor):
+    # O valor já é float no modelo: registros antigos com valor inválido contam
+    # como zero (ver modelos.Registro), para que ainda possam ser editados ou excluídos
+    return int(valor * ESCALA)
+
+
+def _texto_fixo(fixo):
+    # Em texto no JSON: o orjson lê inteiros acima de 64 bits como float
+    return str(fixo)
+
+
+class SomaAgrupada:
+    """Soma e quantidade de registros por chave; chaves sem registros somem"""
+
+    def __init__(self):
+        self.somas = {}
+        self.quantidades = {}
+
+    def somar(self, chave, fixo, sinal):
+        quantidade = self.quantidades.get(chave, 0) + sinal
+        if quantidade <= 0:
+            self.somas.pop(chave, None)
+            self.quantidades.pop(chave, None)
+            return
+        self.somas[chave] = self.somas.get(chave, 0) + sinal * fixo
+        self.quantidades[chave] = quantidade
+
+    def total(self, chave):
+        return _total(self.somas.get(chave, 0), self.quantidades.get(chave, 0))
+
+    def valores(self, ordenar=False):
+        return arredondar_valores({k: v / ESCALA for k, v in self.somas.items()}, ordenar)
+
+    def exportar(self):
+        """[chave, soma, quantidade] de cada chave (as chaves podem não ser texto)"""
+        return [[chave, _texto_fixo(self.somas[chave]), quantidade] for chave, quantidade in self.quantidades.items()]
+
+    def incorporar(self, itens, sinal=1):
+        """Soma (sinal 1) ou retira (sinal -1) os totais de outro agrupamento exportado"""
+        for chave, fixo, quantidade in itens:
+            quantidade = self.quantidades.get(chave, 0) + sinal * quantidade
+            if quantidade <= 0:
+                self.somas.pop(chave, None)
+                self.quantidades.pop(chave, None)
+                continue
+            self.somas[chave] = self.somas.get(chave, 0) + sinal * int(fixo)
+            self.quantidades[chave] = quantidade
+
+
+class SomaPorMes:
+    """Uma SomaAgrupada por mês ('AAAA-MM'), com chaves em tupla: lê-se só os meses pedidos.
+
+    projecao() agrupa as somas de um mês por uma posição da chave e guarda o
+    resultado até o mês mudar: meses fechados são agrupados uma vez só.
+    """
+
+    def __init__(self):
+        self.meses = {}
+        self._projecoes = {}
+
+    def somar(self, ano_mes, chave, fixo, sinal):
+        grupo = self.meses.get(ano_mes)
+        if grupo is None:
+            grupo = self.meses[ano_mes] = SomaAgrupada()
+        grupo.somar(chave, fixo, sinal)
+        if not grupo.quantidades:
+            del self.meses[ano_mes]
+        if self._projecoes:
+            self._projecoes.pop(ano_mes, None)
+
+    def projecao(self, ano_mes, posicao):
+        """{chave[posicao]: soma} do mês"""
+        grupo = self.meses.get(ano_mes)
+        if grupo is None:
+            return {}
+        projecoes = self._projecoes.setdefault(ano_mes, {})
+        somas = projecoes.get(posicao)
+        if somas is None:
+            somas = projecoes[posicao] = {}
+            for chave, fixo in grupo.somas.items():
+                somas[chave[posicao]] = somas.get(chave[posicao], 0) + fixo
+        return somas
+
+    def descartar(self, ano_mes):
+        """Tira o mês inteiro (para trocá-lo pelos totais lidos de outro lugar)"""
+        self.meses.pop(ano_mes, None)
+        self._projecoes.pop(ano_mes, None)
+
+    def exportar(self):
+        """[mês, chave, soma, quantidade] de cada chave de cada mês"""
+        return [[ano_mes, list(chave), soma, quantidade]
+                for ano_mes, grupo in self.meses.items()
+                for chave, soma, quantidade in grupo.exportar()]
+
+    def incorporar(self, itens, sinal=1):
+        for ano_mes, chave, fixo, quantidade in itens:
+            grupo = self.meses.get(ano_mes)
+            if grupo is None:
+                grupo = self.meses[ano_mes] = SomaAgrupada()
+            grupo.incorporar([[tuple(chave), fixo, quantidade]], sinal)
+            if not grupo.quantidades:
+                del self.meses[ano_mes]
+            self._projecoes.pop(ano_mes, None)
+
+
+class Contagem:
+    """Quantidade de registros por valor (para distintos e contagens)"""
+
+    def __init__(self):
+        self.quantidades = {}
+
+    def somar(self, chave, sinal):
+        quantidade = self.quantidades.get(chave, 0) + sinal
+        if quantidade <= 0:
+            self.quantidades.pop(chave, None)
+        else:
+            self.quantidades[chave] = quantidade
+
+    def distintos(self):
+        return self.quantidades.keys()
+
+    def __len__(self):
+        return len(self.quantidades)
+
+    def exportar(self):
+        return [[chave, quantidade] for chave, quantidade in self.quantidades.items()]
+
+    def incorporar(self, itens, sinal=1):
+        for chave, quantidade in itens:
+            self.somar(chave, sinal * quantidade)
+
+
+class AgregadosFrota:
+    """Totais do dashboard e da análise sem filtros.
+
+    Cada inclusão/alteração/exclusão é aplicada como delta (subtrai o registro
+    antigo, soma o novo), então a leitura custa O(grupos) e não O(registros).
+    Os registros são do modelo (ver modelos.py): valor, mês e garantia já
+    vêm convertidos.
+    """
+
+    def __init__(self):
+        self.reconstruir([], [])
+
+    def reconstruir(self, gastos, diarias):
+        """Recalcula tudo a partir dos registros (carga inicial/recarga)"""
+        self.gastos_por_tipo = SomaAgrupada()
+        self.gastos_por_veiculo = SomaAgrupada()
+        self.gastos_por_placa = SomaAgrupada()
+        self.gastos_mensal = SomaAgrupada()
+        self.diarias_por_motorista = SomaAgrupada()
+        self.diarias_mensal = SomaAgrupada()
+        # Gastos de cada mês por (veículo, placa, motorista) (ver tendencias.py)
+        self.gastos_mensal_detalhado = SomaPorMes()
+        self.total_gastos = 0
+        self.total_diarias = 0
+        self.quantidade_gastos = 0
+        self.quantidade_diarias = 0
+        # Datas de garantia dos serviços em ordem (chave: id do gasto)
+        self.garantias = IndiceGarantias()
+        self.garantias.reconstruir((gasto.get('id'), gasto) for gasto in gastos)
+        self.quantidade_servicos = 0
+        self.servicos_sem_garantia = 0
+        self.veiculos = Contagem()
+        self.placas = Contagem()
+        self.motoristas_gastos = Contagem()
+        self.motoristas_diarias = Contagem()
+        self.anos = Contagem()
+        for gasto in gastos:
+            self._gasto(gasto, 1)
+        for diaria in diarias:
+            self._diaria(diaria, 1)
+
+    # ------------------------------------
+    # Resumos (ver repositorio_particionado.py)
+    # ------------------------------------
+    # Os totais de um conjunto de registros viram um resumo em JSON, e os
+    # resumos se somam e se subtraem sem voltar aos registros: as somas em
+    # ponto fixo continuam exatas.
+    SOMAS = ('gastos_por_tipo', 'gastos_por_veiculo', 'gastos_por_placa', 'gastos_mensal',
+             'diarias_por_motorista', 'diarias_mensal')
+    SERIES = ('gastos_mensal_detalhado',)
+    CONTAGENS = ('veiculos', 'placas', 'motoristas_gastos', 'motoristas_diarias', 'anos')
+    TOTAIS = ('total_gastos', 'quantidade_gastos', 'total_diarias', 'quantidade_diarias',
+              'quantidade_servicos', 'servicos_sem_garantia')
+    TOTAIS_FIXOS = ('total_gastos', 'total_diarias')
+
+    def exportar(self, garantias=True, series=True):
+        """Resumo dos totais, em tipos do JSON (garantias=False/series=False deixam de fora o
+        índice de garantias/os totais por mês de cada veículo)"""
+        resumo = {
+            'totais': [
+                _texto_fixo(getattr(self, nome)) if nome in self.TOTAIS_FIXOS else getattr(self, nome)
+                for nome in self.TOTAIS
+            ],
+            'somas': {nome: getattr(self, nome).exportar() for nome in self.SOMAS},
+            'contagens': {nome: getattr(self, nome).exportar() for nome in self.CONTAGENS}
+        }
+        if series:
+            resumo['series'] = {nome: getattr(self, nome).exportar() for nome in self.SERIES}
+        if garantias:
+            resumo['garantias'] = self.garantias.exportar()
+        return resumo
+
+    def incorporar(self, resumo, sinal=1):
+        """Soma (sinal 1) ou retira (sinal -1) um resumo de exportar()"""
+        for nome, valor in zip(self.TOTAIS, resumo['totais']):
+            setattr(self, nome, getattr(self, nome) + sinal * int(valor))
+        for nome in self.SOMAS:
+            getattr(self, nome).incorporar(resumo['somas'][nome], sinal)
+        for nome in self.CONTAGENS:
+            getattr(self, nome).incorporar(resumo['contagens'][nome], sinal)
+        if 'series' in resumo:
+            for nome in self.SERIES:
+                getattr(self, nome).incorporar(resumo['series'][nome], sinal)
+        if 'garantias' in resumo:
+            self.garantias.incorporar(resumo['garantias'], sinal)
+
+    # ------------------------------------
+    # Deltas
+    # ------------------------------------
+    def aplicar_gasto(self, antigo, novo):
+        """Troca a contribuição de 'antigo' pela de 'novo' (qualquer um pode ser None).
+
+        Não valida o valor: quem insere ou atualiza valida o que foi enviado
+        (um valor inválido já gravado conta como 0).
+        """
+        if antigo is not None:
+            self._gasto(antigo, -1)
+            self.garantias.remover(antigo.get('id'), antigo)
+        if novo is not None:
+            self._gasto(novo, 1)
+            self.garantias.adicionar(novo.get('id'), novo)
+
+    def aplicar_diaria(self, antigo, novo):
+        if antigo is not None:
+            self._diaria(antigo, -1)
+        if novo is not None:
+            self._diaria(novo, 1)
+
+    def _gasto(self, gasto, sinal):
+        fixo = _fixo(gasto.valor)
+        self.total_gastos += sinal * fixo
+        self.quantidade_gastos += sinal
+        self.gastos_por_tipo.somar(presente_ou(gasto.tipo_gasto, 'Outros'), fixo, sinal)
+        veiculo = presente_ou(gasto.veiculo, 'Não Informado')
+        placa = presente_ou(gasto.placa, 'Sem Placa')
+        self.gastos_por_veiculo.somar(veiculo, fixo, sinal)
+        self.gastos_por_placa.somar(placa, fixo, sinal)
+        if gasto.ano_mes is not None:
+            self.gastos_mensal.somar(gasto.ano_mes, fixo, sinal)
+            self.gastos_mensal_detalhado.somar(
+                gasto.ano_mes, (veiculo, placa, presente_ou(gasto.motorista, 'Não Informado')), fixo, sinal)
+            if len(gasto.ano) == 4:
+                self.anos.somar(gasto.ano, sinal)
+        if gasto.servico:
+            self.quantidade_servicos += sinal
+            if not gasto.garantia_validade:
+                self.servicos_sem_garantia += sinal
+        # AUSENTE é falso, como o None de dict.get
+        if gasto.veiculo:
+            self.veiculos.somar(gasto.veiculo, sinal)
+        if gasto.placa:
+            self.placas.somar(gasto.placa, sinal)
+        if gasto.motorista:
+            self.motoristas_gastos.somar(gasto.motorista, sinal)
+
+    def _diaria(self, diaria, sinal):
+        fixo = _fixo(diaria.valor_total)
+        self.total_diarias += sinal * fixo
+        self.quantidade_diarias += sinal
+        self.diarias_por_motorista.somar(presente_ou(diaria.motorista, 'Não Informado'), fixo, sinal)
+        if diaria.ano_mes is not None:
+            self.diarias_mensal.somar(diaria.ano_mes, fixo, sinal)
+        if diaria.motorista:
+            self.motoristas_diarias.somar(diaria.motorista, sinal)
+
+    # ------------------------------------
+    # Leituras (mesmo formato de calculos.py)
+    # ------------------------------------
+    def analise_gastos(self):
+        return {
+            'por_tipo': self.gastos_por_tipo.valores(),
+            'por_veiculo': self.gastos_por_veiculo.valores(),
+            'por_placa': self.gastos_por_placa.valores(),
+            'mensal': self.gastos_mensal.valores(ordenar=True)
+        }
+
+    def analise_diarias(self):
+        return {
+            'por_motorista': self.diarias_por_motorista.valores(),
+            'mensal': self.diarias_mensal.valores(ordenar=True)
+        }
+
+    def resumo_garantias(self, hoje=None):
+        """Contagens do resumo de /api/servicos, pela data de hoje ('AAAA-MM-DD')"""
+        hoje = hoje or date.today().isoformat()
+        return {
+            'total': self.quantidade_servicos,
+            'vigentes': self.garantias.vigentes(hoje),
+            'vencidas': self.garantias.vencidas(hoje),
+            'sem_data': self.servicos_sem_garantia
+        }
+
+    def resumo_dashboard(self, mes_atual):
+        # O status depende da data de hoje: um bisect no índice de garantias
+        servicos_vencidos = self.garantias.vencidas(date.today().isoformat())
+        return {
+            'total_gastos': round(_total(self.total_gastos, self.quantidade_gastos), 2),
+            'total_diarias': round(_total(self.total_diarias, self.quantidade_diarias), 2),
+            'gastos_mes_atual': round(self.gastos_mensal.total(mes_atual), 2),
+            'diarias_mes_atual': round(self.diarias_mensal.total(mes_atual), 2),
+            'servicos_vencidos': servicos_vencidos,
+            'servicos_sem_garantia': self.servicos_sem_garantia,
+            'total_veiculos': len(self.placas),
+            'total_motoristas': len(self.motoristas_gastos)
+        }
+
+    def opcoes_filtros(self):
+        return {
+            'veiculos': sorted(self.veiculos.distintos()),
+            'placas': sorted(self.placas.distintos()),
+            'motoristas_gastos': sorted(self.motoristas_gastos.distintos()),
+            'motoristas_diarias': sorted(self.motoristas_diarias.distintos()),
+            'anos': sorted(self.anos.distintos(), reverse=True)
+        }
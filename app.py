@@ -1,44 +1,150 @@
 # app.py - BACKEND DE GESTÃO DE FROTAS
-import json
+import hashlib
+import math
 import os
-from datetime import datetime, timedelta
-from flask import Flask, request, jsonify
+import random
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from functools import wraps
+from flask import Flask, Response, g, has_request_context, request, jsonify, make_response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from werkzeug.local import LocalProxy
+from calculos import calcular_status_garantia
+from codificacao import codificar, decodificar
+from eventos import Leitor
+from frotas import FROTA_PADRAO, Frotas, PrefixoFrota
+from importacao import TIPOS_CONTEUDO, detectar_formato, exportar, ler_registros
+from metricas import Perfilador, medir, metricas
+from modelos import json_registros
+from persistencia import criar_persistencia
+from repositorio import RepositorioDados, criar_motor_analise
+from tendencias import ler_parametros as ler_parametros_tendencias
 
 # ====================================
 # CONFIGURAÇÃO INICIAL
 # ====================================
 app = Flask(__name__)
-CORS(app)  # Habilita CORS para todas as rotas
-ARQUIVO_JSON = 'gastos_veiculos.json'
+CORS(app, expose_headers=['ETag'])  # Habilita CORS para todas as rotas
+ARQUIVO_JSON = os.environ.get('FROTA_ARQUIVO_JSON', 'gastos_veiculos.json')
+# 'arquivo' regrava o JSON inteiro a cada alteração; 'journal' acrescenta cada
+# alteração em gastos_veiculos.json.journal e compacta em segundo plano
+MODO_PERSISTENCIA = os.environ.get('FROTA_PERSISTENCIA', 'arquivo')
+# 'memoria' (JSON carregado em memória), 'sqlite' (banco com índices) ou
+# 'particionado' (um arquivo por mês, lido sob demanda)
+BACKEND_DADOS = os.environ.get('FROTA_BACKEND', 'memoria')
+ARQUIVO_SQLITE = os.environ.get('FROTA_ARQUIVO_SQLITE', 'gastos_veiculos.db')
+PASTA_PARTICOES = os.environ.get('FROTA_PASTA_PARTICOES', 'gastos_veiculos.particoes')
+# Backend 'particionado': registros mantidos em memória antes de descartar as
+# partições usadas há mais tempo
+LIMITE_PARTICOES = int(os.environ.get('FROTA_LIMITE_PARTICOES', '100000'))
+# Frotas além da padrão (/api/frotas/<nome>/...): uma pasta por frota, com os
+# mesmos nomes de arquivo acima
+PASTA_FROTAS = os.environ.get('FROTA_PASTA_FROTAS', 'frotas')
+# Análise com filtros no backend 'memoria': 'python' (registro a registro) ou
+# 'numpy' (colunar; exige o pacote numpy). No 'sqlite' quem agrupa é o banco.
+MOTOR_ANALISE = os.environ.get('FROTA_MOTOR_ANALISE', 'python')
+# Backend 'memoria': imagem binária dos dados já montados (<json>.imagem), para
+# iniciar sem ler o JSON. FROTA_IMAGEM=0 desliga (ver imagem.py).
+USAR_IMAGEM = os.environ.get('FROTA_IMAGEM', '1') == '1'
+
+def criar_repositorio(frota=FROTA_PADRAO):
+    """Cria o backend de dados configurado para a frota"""
+    arquivo_json = frotas.caminho(frota, ARQUIVO_JSON)
+    if BACKEND_DADOS == 'sqlite':
+        from repositorio_sqlite import RepositorioSQLite, migrar_json
+        arquivo_sqlite = frotas.caminho(frota, ARQUIVO_SQLITE)
+        # Primeira execução: importa o JSON existente para o banco
+        if not os.path.exists(arquivo_sqlite) and os.path.exists(arquivo_json):
+            return migrar_json(arquivo_json, arquivo_sqlite)
+        return RepositorioSQLite(arquivo_sqlite)
+    if BACKEND_DADOS == 'particionado':
+        from repositorio_particionado import MANIFESTO, RepositorioParticionado, migrar_json
+        pasta_particoes = frotas.caminho(frota, PASTA_PARTICOES)
+        # Primeira execução: divide o JSON existente em partições
+        if not os.path.exists(os.path.join(pasta_particoes, MANIFESTO)) and os.path.exists(arquivo_json):
+            return migrar_json(arquivo_json, pasta_particoes, LIMITE_PARTICOES)
+        return RepositorioParticionado(pasta_particoes, LIMITE_PARTICOES)
+    if BACKEND_DADOS == 'memoria':
+        return RepositorioDados(arquivo_json, criar_persistencia(MODO_PERSISTENCIA, arquivo_json),
+                                criar_motor_analise(MOTOR_ANALISE),
+                                f"{arquivo_json}.imagem" if USAR_IMAGEM else None)
+    raise ValueError(f"Backend de dados inválido: {BACKEND_DADOS}")
+
+# Cada frota tem seu repositório, com cache, trava e canal de eventos próprios
+# (ver frotas.py). A padrão abre já na inicialização.
+frotas = Frotas(PASTA_FROTAS, criar_repositorio)
+_inicio_carga = time.perf_counter()
+frotas.obter(FROTA_PADRAO)
+print(f"⏱️ Frota padrão carregada em {(time.perf_counter() - _inicio_carga) * 1000:.0f} ms")
+
+def repositorio_atual():
+    """Repositório da frota da requisição; fora de uma requisição, o da frota padrão"""
+    if has_request_context() and g.get('frota') is not None:
+        return g.frota.repositorio
+    return frotas.obter(FROTA_PADRAO).repositorio
+
+# Ponto único de acesso aos dados (ver repositorio.py, repositorio_sqlite.py e
+# repositorio_particionado.py): as rotas usam `repositorio` e recebem o da frota pedida
+repositorio = LocalProxy(repositorio_atual)
+# Entra nos ETags: a versão dos dados recomeça do zero a cada execução
+INSTANCIA = uuid.uuid4().hex
+# Prazo padrão de /api/servicos/vencendo e o máximo aceito em ?dias=
+DIAS_VENCENDO = 30
+DIAS_VENCENDO_MAXIMO = 3650
+
+# Perfil (cProfile) das requisições, desligado por padrão. Com FROTA_PERFIL=1,
+# uma fração FROTA_PERFIL_AMOSTRA das requisições (ou as que pedirem ?perfil=1)
+# roda com o profiler; as que passarem de FROTA_PERFIL_LIMITE_MS (ou forem
+# pedidas) têm o .pstats gravado em FROTA_PERFIL_PASTA.
+perfilador = None
+if os.environ.get('FROTA_PERFIL') == '1':
+    perfilador = Perfilador(
+        os.environ.get('FROTA_PERFIL_PASTA', 'perfis'),
+        float(os.environ.get('FROTA_PERFIL_LIMITE_MS', '500')),
+        float(os.environ.get('FROTA_PERFIL_AMOSTRA', '1'))
+    )
+
+class ProvedorJSON(DefaultJSONProvider):
+    """JSON do Flask pelo codificacao.py (orjson quando instalado), com o tempo de serialização medido.
+
+    As respostas vão direto em bytes compactos. Em modo debug o corpo continua
+    indentado pelo json padrão, para leitura.
+    """
+
+    @staticmethod
+    def default(o):
+        # Registros do repositório (ver modelos.py) no modo debug, pelo json padrão
+        if hasattr(o, 'para_dict'):
+            return o.para_dict()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return codificar(obj, ordenar=self.sort_keys, padrao=self.default).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return decodificar(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            with medir('serializar'):
+                return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        with medir('serializar'):
+            corpo = codificar(obj, ordenar=self.sort_keys, padrao=self.default) + b'\n'
+        return self._app.response_class(corpo, mimetype=self.mimetype)
+
+app.json = ProvedorJSON(app)
 
 # ====================================
-# FUNÇÕES DE UTILIDADE E PERSISTÊNCIA
+# FUNÇÕES DE UTILIDADE
 # ====================================
-def carregar_dados():
-    """Carrega dados do arquivo JSON e garante as chaves necessárias"""
-    if os.path.exists(ARQUIVO_JSON):
-        try:
-            with open(ARQUIVO_JSON, 'r', encoding='utf-8') as f:
-                dados = json.load(f)
-                if 'gastos' not in dados: dados['gastos'] = []
-                if 'diarias' not in dados: dados['diarias'] = []
-                return dados
-        except Exception as e:
-            print(f"Erro ao carregar dados: {e}")
-            return {'gastos': [], 'diarias': []}
-    return {'gastos': [], 'diarias': []}
-
-def salvar_dados(dados):
-    """Salva dados no arquivo JSON"""
-    try:
-        with open(ARQUIVO_JSON, 'w', encoding='utf-8') as f:
-            json.dump(dados, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        print(f"Erro ao salvar dados: {e}")
-        return False
-
 def calcular_dias_uteis(data_inicio, data_fim):
     """Calcula dias (total) entre duas datas"""
     try:
@@ -49,57 +155,254 @@ def calcular_dias_uteis(data_inicio, data_fim):
     except:
         return 1
 
-def calcular_status_garantia(data_garantia):
-    """Calcula status da garantia"""
-    if not data_garantia:
-        return 'Sem Data'
+CAMPOS_OBRIGATORIOS_GASTO = ['veiculo', 'placa', 'motorista', 'tipo_gasto', 'valor', 'data']
+CAMPOS_OBRIGATORIOS_DIARIA = ['motorista', 'data_inicio', 'data_fim', 'valor_diaria_unitaria']
+
+def corpo_json():
+    """Corpo da requisição como objeto JSON (ValueError se vier vazio, inválido ou sem ser objeto)"""
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        raise ValueError('O corpo da requisição deve ser um objeto JSON')
+    return dados
+
+def campo_faltante(registro, campos_obrigatorios):
+    """Primeiro campo obrigatório vazio (None se estiverem todos preenchidos)"""
+    for campo in campos_obrigatorios:
+        if not registro.get(campo):
+            return campo
+    return None
+
+def valor_invalido(registro, campo):
+    """Mensagem de erro se registro[campo] veio e não é um número (None se estiver certo)"""
+    if campo not in registro:
+        return None
     try:
-        garantia = datetime.strptime(data_garantia, '%Y-%m-%d')
-        hoje = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        if garantia < hoje:
-            return 'Vencida'
-        else:
-            return 'Vigente'
-    except:
-        return 'Data Inválida'
-
-def aplicar_filtros(gastos, filtros):
-    """Filtra a lista de gastos com base nos filtros da requisição (Veículo, Placa, etc.)."""
-    
-    filtros = {k: v for k, v in filtros.items() if v} 
-
-    if not filtros:
-        return gastos
+        if math.isfinite(float(registro[campo])):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return f'Campo {campo} deve ser um número'
+
+def preparar_gasto(novo_gasto):
+    """Completa um gasto recebido (já validado) antes de inserir"""
+    erro = valor_invalido(novo_gasto, 'valor')
+    if erro:
+        raise ValueError(erro)
+    novo_gasto['data_registro'] = datetime.now().isoformat()
     
-    gastos_filtrados = []
+    if novo_gasto.get('garantia_validade'):
+        novo_gasto['status_garantia'] = calcular_status_garantia(novo_gasto['garantia_validade'])
+    return novo_gasto
+
+def montar_diaria(nova_diaria):
+    """Monta a diária completa (dias e valor total calculados) a partir dos dados recebidos"""
+    erro = valor_invalido(nova_diaria, 'valor_diaria_unitaria')
+    if erro:
+        raise ValueError(erro)
+    dias = calcular_dias_uteis(nova_diaria['data_inicio'], nova_diaria['data_fim'])
+    valor_total = dias * float(nova_diaria['valor_diaria_unitaria'])
     
-    mes_filtro = filtros.get('mes').zfill(2) if filtros.get('mes') else None
+    return {
+        'id': datetime.now().strftime('%Y%m%d%H%M%S'),
+        'motorista': nova_diaria['motorista'],
+        'data_inicio': nova_diaria['data_inicio'],
+        'data_fim': nova_diaria['data_fim'],
+        'dias_uteis': dias,
+        'valor_diaria_unitaria': float(nova_diaria['valor_diaria_unitaria']),
+        'valor_total': valor_total,
+        'observacoes': nova_diaria.get('observacoes', ''),
+        'data_registro': datetime.now().isoformat()
+    }
+
+def importar_lote(entidade, campos_obrigatorios, montar, inserir):
+    """Lê o corpo (CSV ou NDJSON), valida todas as linhas e insere tudo de uma vez.
+
+    Se alguma linha tiver erro nada é gravado e a resposta lista as linhas.
+    """
+    try:
+        formato = detectar_formato(request.args.get('formato'), request.content_type)
+    except ValueError as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 400
     
-    for gasto in gastos:
-        
-        if filtros.get('veiculo') and gasto.get('veiculo') != filtros['veiculo']: 
-            continue
-        
-        if filtros.get('placa') and gasto.get('placa') != filtros['placa']: 
+    registros = []
+    erros = []
+    for linha, registro in ler_registros(request.stream, formato):
+        if isinstance(registro, str):
+            erros.append({'linha': linha, 'mensagem': registro})
             continue
-            
-        if filtros.get('motorista') and gasto.get('motorista') != filtros['motorista']: 
+        campo = campo_faltante(registro, campos_obrigatorios)
+        if campo:
+            erros.append({'linha': linha, 'mensagem': f'Campo {campo} é obrigatório'})
             continue
-            
-        data_gasto = gasto.get('data', '')
-        if data_gasto:
-            ano = data_gasto[:4]
-            mes = data_gasto[5:7] 
-            
-            if filtros.get('ano') and ano != filtros['ano']: 
-                continue
-                
-            if mes_filtro and mes != mes_filtro: 
-                continue
-        
-        gastos_filtrados.append(gasto)
-        
-    return gastos_filtrados
+        try:
+            registros.append(montar(registro))
+        except ValueError as e:
+            erros.append({'linha': linha, 'mensagem': str(e)})
+    
+    if erros:
+        return jsonify({
+            'status': 'erro',
+            'mensagem': f'Nada foi importado: {len(erros)} linha(s) com erro',
+            'erros': erros[:100]
+        }), 400
+    if not registros:
+        return jsonify({'status': 'erro', 'mensagem': 'Nenhum registro encontrado'}), 400
+    
+    ids = inserir(registros)
+    # Um evento pelo lote todo: a tela busca as listas de novo
+    publicar_alteracao(entidade, 'importar', quantidade=len(ids))
+    return jsonify({
+        'status': 'sucesso',
+        'mensagem': f'{len(ids)} registro(s) importado(s) com sucesso!',
+        'quantidade': len(ids),
+        'ids': ids
+    })
+
+def resposta_exportacao(nome, registros):
+    """Envia os registros em CSV ou NDJSON (?formato=) aos poucos, sem montar o corpo inteiro"""
+    formato = detectar_formato(request.args.get('formato') or 'csv', None)
+    return Response(
+        stream_with_context(exportar(registros, formato)),
+        mimetype=TIPOS_CONTEUDO[formato],
+        headers={'Content-Disposition': f'attachment; filename={nome}.{formato}'}
+    )
+
+def ler_paginacao():
+    """Lê ?limit=, ?offset= e ?sort= da requisição (ValueError se inválidos)"""
+    try:
+        limite = request.args.get('limit')
+        limite = int(limite) if limite else None
+        offset = int(request.args.get('offset') or 0)
+    except ValueError:
+        raise ValueError('limit e offset devem ser números inteiros')
+    if (limite is not None and limite < 0) or offset < 0:
+        raise ValueError('limit e offset não podem ser negativos')
+    return limite, offset, request.args.get('sort') or None
+
+def projetar(registros):
+    """Mantém só os campos pedidos em ?fields= (o id sempre vai junto)"""
+    campos = [c for c in request.args.get('fields', '').split(',') if c]
+    if not campos:
+        return registros
+    campos = set(campos) | {'id'}
+    return [{k: v for k, v in r.items() if k in campos} for r in registros]
+
+def jsonify_lista(chave, registros, **extras):
+    """jsonify({'status': 'sucesso', chave: registros, **extras}) montado a partir do JSON
+    que cada registro guarda de si (ver modelos.Registro.json).
+
+    Só os outros campos do envelope são codificados a cada pedido; a lista é a
+    junção dos bytes já prontos. Com ?fields= (ou em modo debug) volta ao
+    jsonify comum.
+    """
+    corpo = {'status': 'sucesso', **extras}
+    if request.args.get('fields') or app.debug:
+        corpo[chave] = projetar(registros)
+        return jsonify(corpo)
+    with medir('serializar'):
+        # Um campo por vez, nas posições em que o jsonify (chaves em ordem) os colocaria
+        partes = []
+        for nome in sorted(set(corpo) | {chave}):
+            if nome == chave:
+                partes.append(codificar(chave) + b':[' + b','.join(json_registros(registros)) + b']')
+            else:
+                # {"nome":valor} sem as chaves de fora
+                partes.append(codificar({nome: corpo[nome]}, ordenar=True)[1:-1])
+        envelope = b'{' + b','.join(partes) + b'}'
+    return app.response_class(envelope + b'\n', mimetype=app.json.mimetype)
+
+def com_status_garantia(servicos, hoje):
+    """Completa o status_garantia que falta (em cópias, sem alterar os registros em memória)"""
+    return [
+        s if s.get('status_garantia') else {**s.para_dict(), 'status_garantia': s.status_garantia_em(hoje)}
+        for s in servicos
+    ]
+
+def publicar_alteracao(entidade, operacao, id=None, registro=None, frota=None, **extras):
+    """Avisa os clientes do /api/stream da frota (a da requisição, por padrão).
+
+    O registro vai junto para a tela se atualizar sem buscar a lista.
+    """
+    frota = frota or g.frota
+    evento = {'entidade': entidade, 'operacao': operacao, 'versao': frota.repositorio.versao(), **extras}
+    if id is not None:
+        evento['id'] = id
+    if registro is not None:
+        if entidade == 'gastos':
+            # Como em /api/servicos: status do dia e se o gasto entra na lista de serviços
+            evento['servico'] = registro.servico
+            registro = com_status_garantia([registro], date.today().isoformat())[0]
+        evento['registro'] = registro
+    frota.canal.publicar(evento)
+
+def dados_paginacao(total, limite, offset):
+    return {'total': total, 'limit': limite, 'offset': offset}
+
+def com_etag(por_dia=False):
+    """ETag a partir da versão dos dados + query string; If-None-Match igual -> 304.
+
+    A versão é lida antes de montar a resposta, então uma alteração no meio
+    do caminho só faz o próximo pedido buscar o corpo de novo. Rotas cujo
+    resultado depende da data de hoje (mês atual, garantias vencidas) usam
+    por_dia=True.
+    """
+    def decorador(rota):
+        @wraps(rota)
+        def com_cache(*args, **kwargs):
+            partes = [INSTANCIA, g.frota.nome, str(repositorio.versao()), request.full_path]
+            if por_dia:
+                partes.append(date.today().isoformat())
+            etag = hashlib.md5('|'.join(partes).encode('utf-8')).hexdigest()
+            if request.if_none_match.contains_weak(etag):
+                resposta = make_response('', 304)
+            else:
+                resposta = make_response(rota(*args, **kwargs))
+                if resposta.status_code != 200:
+                    return resposta
+            resposta.set_etag(etag)
+            # O navegador sempre confirma com o servidor antes de reaproveitar
+            resposta.headers['Cache-Control'] = 'no-cache'
+            return resposta
+        return com_cache
+    return decorador
+
+# ====================================
+# MÉTRICAS E PERFIL
+# ====================================
+
+@app.before_request
+def iniciar_medicao():
+    g.inicio = time.perf_counter()
+    g.perfil = None
+    if perfilador is not None:
+        g.perfil_forcado = request.args.get('perfil') == '1'
+        if g.perfil_forcado or random.random() < perfilador.amostra:
+            g.perfil = perfilador.iniciar()
+
+@app.after_request
+def registrar_medicao(resposta):
+    duracao = time.perf_counter() - g.inicio
+    # A regra ('/api/gastos/<int:id>') e não a URL, para não criar uma série por id
+    rota = request.url_rule.rule if request.url_rule else 'desconhecida'
+    metricas.registrar_requisicao(request.method, rota, resposta.status_code, duracao)
+    if g.get('perfil') is not None:
+        caminho = perfilador.finalizar(g.perfil, rota, duracao, g.perfil_forcado)
+        g.perfil = None
+        if caminho:
+            resposta.headers['X-Perfil'] = os.path.basename(caminho)
+    return resposta
+
+@app.teardown_request
+def encerrar_perfil(erro=None):
+    # Requisição que terminou em exceção não passa pelo after_request
+    if g.get('perfil') is not None:
+        perfilador.finalizar(g.perfil, request.path, time.perf_counter() - g.inicio)
+        g.perfil = None
+
+@app.route('/api/metrics', methods=['GET'])
+def exportar_metricas():
+    """Contadores e histogramas no formato texto do Prometheus"""
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4')
 
 # ====================================
 # ROTAS BASE
@@ -121,55 +424,34 @@ def health_check():
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/api/stream', methods=['GET'])
+def stream_alteracoes():
+    """Alterações dos dados em Server-Sent Events: entidade, operação, id e versão.
+
+    O navegador reconecta sozinho enviando Last-Event-ID e recebe o que perdeu;
+    se não der (outro worker, histórico esgotado), recebe 'recarregar'.
+    """
+    leitor = Leitor(g.frota.canal, repositorio.versao, request.headers.get('Last-Event-ID'))
+    # O adaptador ASGI envia o fluxo pelo loop de eventos, sem prender uma thread (ver asgi.py)
+    request.environ['frota.eventos'] = leitor
+    return Response(leitor, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # ====================================
 # DASHBOARD
 # ====================================
 
 @app.route('/api/dashboard', methods=['GET'])
+@com_etag(por_dia=True)
 def dashboard():
     """Dashboard com dados reais do sistema"""
     try:
-        dados = carregar_dados()
-        gastos = dados.get('gastos', [])
-        diarias = dados.get('diarias', [])
-        
         mes_atual = datetime.now().strftime('%Y-%m')
-        gastos_mes = sum(float(g.get('valor', 0)) for g in gastos if g.get('data', '').startswith(mes_atual))
-        diarias_mes = sum(float(d.get('valor_total', 0)) for d in diarias if d.get('data_inicio', '').startswith(mes_atual))
-        
-        servicos_vencidos = 0
-        servicos_sem_garantia = 0
-        
-        for gasto in gastos:
-            if gasto.get('tipo_gasto', '').lower() in ['manutencao', 'manutenção']:
-                status = calcular_status_garantia(gasto.get('garantia_validade'))
-                
-                if status == 'Vencida':
-                    servicos_vencidos += 1
-                
-                if not gasto.get('garantia_validade'):
-                    servicos_sem_garantia += 1
-        
-        placas_unicas = set(g.get('placa') for g in gastos if g.get('placa'))
-        motoristas_unicos = set(g.get('motorista') for g in gastos if g.get('motorista'))
-        
-        total_gastos = sum(float(g.get('valor', 0)) for g in gastos)
-        total_diarias = sum(float(d.get('valor_total', 0)) for d in diarias)
-        
-        resumo = {
-            'total_gastos': round(total_gastos, 2),
-            'total_diarias': round(total_diarias, 2),
-            'gastos_mes_atual': round(gastos_mes, 2),
-            'diarias_mes_atual': round(diarias_mes, 2),
-            'servicos_vencidos': servicos_vencidos,
-            'servicos_sem_garantia': servicos_sem_garantia,
-            'total_veiculos': len(placas_unicas),
-            'total_motoristas': len(motoristas_unicos)
-        }
+        resumo = repositorio.resumo_dashboard(mes_atual)
         
         alertas = {
-            'servicos_vencidos': servicos_vencidos,
-            'servicos_sem_garantia': servicos_sem_garantia
+            'servicos_vencidos': resumo['servicos_vencidos'],
+            'servicos_sem_garantia': resumo['servicos_sem_garantia']
         }
         
         return jsonify({
@@ -184,36 +466,93 @@ def dashboard():
         print(f"❌ Erro no dashboard: {e}")
         return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
 
+# ====================================
+# RENOVAÇÃO DIÁRIA DAS GARANTIAS
+# ====================================
+
+def renovar_garantias(frota):
+    """Atualiza o status_garantia gravado da frota conforme a data de hoje"""
+    try:
+        renovados = frota.repositorio.renovar_status_garantia(date.today().isoformat())
+        if renovados:
+            print(f"🔁 status_garantia atualizado em {renovados} gastos (frota {frota.nome})")
+            publicar_alteracao('gastos', 'renovar', quantidade=renovados, frota=frota)
+    except Exception as e:
+        print(f"❌ Erro ao renovar garantias da frota {frota.nome}: {e}")
+
+def agendar_renovacao_garantias():
+    """Thread que repete a renovação logo depois de cada meia-noite"""
+    def executar():
+        while True:
+            amanha = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+            time.sleep(max(1, (amanha - datetime.now()).total_seconds() + 1))
+            for frota in frotas.abertas():
+                renovar_garantias(frota)
+    threading.Thread(target=executar, name='garantias-frota', daemon=True).start()
+
+def iniciar_renovacao_garantias():
+    """Põe em dia o status gravado (que vence com o tempo) ao abrir cada frota e a cada virada de dia.
+
+    Chamada pelos pontos de entrada do servidor (o __main__ abaixo e asgi.py),
+    não na importação: importar o app (testes, benchmark) não grava nada.
+    FROTA_RENOVAR_GARANTIAS=0 desliga (ex: processos só de leitura).
+    """
+    if os.environ.get('FROTA_RENOVAR_GARANTIAS', '1') != '1':
+        return
+    frotas.ao_abrir = renovar_garantias
+    for frota in frotas.abertas():
+        renovar_garantias(frota)
+    agendar_renovacao_garantias()
+
 # ====================================
 # SERVIÇOS
 # ====================================
 
 @app.route('/api/servicos', methods=['GET'])
+@com_etag(por_dia=True)
 def listar_servicos():
-    """Lista serviços de manutenção"""
+    """Lista serviços de manutenção (paginação opcional: ?limit=&offset=&sort=&fields=)"""
     try:
-        dados = carregar_dados()
-        gastos = dados.get('gastos', [])
-        
-        servicos = [g for g in gastos if g.get('tipo_gasto', '').lower() in ['manutencao', 'manutenção']]
-        
-        for servico in servicos:
-            if not servico.get('status_garantia'):
-                servico['status_garantia'] = calcular_status_garantia(servico.get('garantia_validade'))
-        
-        vigentes = sum(1 for s in servicos if s.get('status_garantia') == 'Vigente')
-        vencidas = sum(1 for s in servicos if s.get('status_garantia') == 'Vencida')
-        
+        limite, offset, ordenar = ler_paginacao()
+    except ValueError as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 400
+    try:
+        hoje = date.today().isoformat()
+        total, pagina = repositorio.pagina('servicos', ordenar, limite, offset)
+        
+        return jsonify_lista(
+            'servicos', com_status_garantia(pagina, hoje),
+            paginacao=dados_paginacao(total, limite, offset),
+            # O resumo considera todos os serviços, não só a página (índice de garantias)
+            resumo=repositorio.resumo_garantias(hoje)
+        )
+    except ValueError as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
+
+@app.route('/api/servicos/vencendo', methods=['GET'])
+@com_etag(por_dia=True)
+def listar_servicos_vencendo():
+    """Serviços cuja garantia vence de hoje até daqui a ?dias= (padrão 30), por data"""
+    try:
+        dias = int(request.args.get('dias', DIAS_VENCENDO))
+        if not 0 <= dias <= DIAS_VENCENDO_MAXIMO:
+            raise ValueError
+    except ValueError:
         return jsonify({
-            'status': 'sucesso',
-            'servicos': servicos,
-            'resumo': {
-                'total': len(servicos),
-                'vigentes': vigentes,
-                'vencidas': vencidas,
-                'sem_data': sum(1 for s in servicos if not s.get('garantia_validade'))
-            }
-        })
+            'status': 'erro',
+            'mensagem': f'dias deve ser um número inteiro de 0 a {DIAS_VENCENDO_MAXIMO}'
+        }), 400
+    try:
+        hoje = date.today()
+        ate = hoje + timedelta(days=dias)
+        servicos = repositorio.servicos_vencendo(hoje.isoformat(), ate.isoformat())
+        return jsonify_lista(
+            'servicos', com_status_garantia(servicos, hoje.isoformat()),
+            periodo={'inicio': hoje.isoformat(), 'fim': ate.isoformat(), 'dias': dias},
+            total=len(servicos)
+        )
     except Exception as e:
         return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
 
@@ -222,14 +561,15 @@ def listar_servicos():
 # ====================================
 
 @app.route('/api/diarias', methods=['GET'])
+@com_etag()
 def listar_diarias():
-    """Lista diárias"""
+    """Lista diárias (paginação opcional: ?limit=&offset=&sort=&fields=)"""
     try:
-        dados = carregar_dados()
-        return jsonify({
-            'status': 'sucesso',
-            'diarias': dados.get('diarias', [])
-        })
+        limite, offset, ordenar = ler_paginacao()
+        total, diarias = repositorio.pagina('diarias', ordenar, limite, offset)
+        return jsonify_lista('diarias', diarias, paginacao=dados_paginacao(total, limite, offset))
+    except ValueError as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 400
     except Exception as e:
         return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
 
@@ -237,37 +577,46 @@ def listar_diarias():
 def registrar_diaria():
     """Registra nova diária"""
     try:
-        dados = carregar_dados()
-        nova_diaria = request.json
+        nova_diaria = corpo_json()
         
-        campos_obrigatorios = ['motorista', 'data_inicio', 'data_fim', 'valor_diaria_unitaria']
-        for campo in campos_obrigatorios:
-            if not nova_diaria.get(campo):
-                return jsonify({'status': 'erro', 'mensagem': f'Campo {campo} é obrigatório'}), 400
+        campo = campo_faltante(nova_diaria, CAMPOS_OBRIGATORIOS_DIARIA)
+        if campo:
+            return jsonify({'status': 'erro', 'mensagem': f'Campo {campo} é obrigatório'}), 400
         
-        dias = calcular_dias_uteis(nova_diaria['data_inicio'], nova_diaria['data_fim'])
-        valor_total = dias * float(nova_diaria['valor_diaria_unitaria'])
-        
-        diaria_completa = {
-            'id': datetime.now().strftime('%Y%m%d%H%M%S'),
-            'motorista': nova_diaria['motorista'],
-            'data_inicio': nova_diaria['data_inicio'],
-            'data_fim': nova_diaria['data_fim'],
-            'dias_uteis': dias,
-            'valor_diaria_unitaria': float(nova_diaria['valor_diaria_unitaria']),
-            'valor_total': valor_total,
-            'observacoes': nova_diaria.get('observacoes', ''),
-            'data_registro': datetime.now().isoformat()
-        }
+        diaria_completa = montar_diaria(nova_diaria)
         
-        dados['diarias'].append(diaria_completa)
-        salvar_dados(dados)
+        diaria_completa = repositorio.inserir_diaria(diaria_completa)
+        publicar_alteracao('diarias', 'inserir', diaria_completa['id'], diaria_completa)
         
         return jsonify({
             'status': 'sucesso',
             'mensagem': 'Diária registrada com sucesso!',
             'diaria': diaria_completa
         })
+    except ValueError as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
+
+@app.route('/api/diarias/bulk', methods=['POST'])
+def importar_diarias():
+    """Importa várias diárias (CSV ou NDJSON) em uma única gravação"""
+    try:
+        return importar_lote(
+            'diarias', CAMPOS_OBRIGATORIOS_DIARIA, montar_diaria,
+            lambda diarias: [d['id'] for d in repositorio.inserir_diarias(diarias)]
+        )
+    except Exception as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
+
+@app.route('/api/diarias/exportar', methods=['GET'])
+@com_etag()
+def exportar_diarias():
+    """Exporta todas as diárias (?formato=csv|ndjson)"""
+    try:
+        return resposta_exportacao('diarias', repositorio.listar_diarias())
+    except ValueError as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 400
     except Exception as e:
         return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
 
@@ -275,15 +624,16 @@ def registrar_diaria():
 def atualizar_diaria(id):
     """Atualiza diária existente"""
     try:
-        dados = carregar_dados()
+        diaria_existente = repositorio.obter_diaria(id)
         
-        diaria_index = next((i for i, d in enumerate(dados['diarias']) if d.get('id') == id), None)
-        
-        if diaria_index is None:
+        if diaria_existente is None:
             return jsonify({'status': 'erro', 'mensagem': 'Diária não encontrada'}), 404
         
-        dados_atualizados = request.json
-        diaria_existente = dados['diarias'][diaria_index]
+        dados_atualizados = corpo_json()
+        
+        erro = valor_invalido(dados_atualizados, 'valor_diaria_unitaria')
+        if erro:
+            return jsonify({'status': 'erro', 'mensagem': erro}), 400
         
         # Recalcula dias e valor total se as datas ou valor unitário mudarem
         data_inicio = dados_atualizados.get('data_inicio', diaria_existente.get('data_inicio'))
@@ -305,11 +655,14 @@ def atualizar_diaria(id):
             'data_atualizacao': datetime.now().isoformat()
         }
         
-        # Atualiza a diária no JSON
-        dados['diarias'][diaria_index] = {**diaria_existente, **atualizacoes}
-        
-        salvar_dados(dados)
+        # Atualiza a diária em memória e no JSON
+        diaria = repositorio.atualizar_diaria(id, atualizacoes)
+        if diaria is None:
+            return jsonify({'status': 'erro', 'mensagem': 'Diária não encontrada'}), 404
+        publicar_alteracao('diarias', 'atualizar', id, diaria)
         return jsonify({'status': 'sucesso', 'mensagem': 'Diária atualizada com sucesso!'})
+    except ValueError as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 400
     except Exception as e:
         print(f"Erro ao atualizar diária: {e}")
         return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
@@ -320,15 +673,11 @@ def excluir_diaria(id):
     """Exclui diária"""
     print(f" tentativa de exclusão da diária ID: {id}") # Log de debug
     try:
-        dados = carregar_dados()
-        tamanho_original = len(dados['diarias'])
-        dados['diarias'] = [d for d in dados['diarias'] if d.get('id') != id]
-        
-        if len(dados['diarias']) == tamanho_original:
+        if not repositorio.excluir_diaria(id):
              # Isso só deve ocorrer se a diária não foi encontrada
              return jsonify({'status': 'erro', 'mensagem': 'Diária não encontrada para exclusão'}), 404
+        publicar_alteracao('diarias', 'excluir', id)
 
-        salvar_dados(dados)
         return jsonify({'status': 'sucesso', 'mensagem': 'Diária excluída com sucesso!'})
     except Exception as e:
         print(f"Erro ao excluir diária: {e}")
@@ -340,14 +689,27 @@ def excluir_diaria(id):
 # ... (Manutenção das rotas de GASTOS) ...
 
 @app.route('/api/gastos', methods=['GET'])
+@com_etag()
 def listar_gastos():
-    """Lista todos os gastos"""
+    """Lista os gastos (paginação opcional: ?limit=&offset=&sort=&fields=)"""
     try:
-        dados = carregar_dados()
-        return jsonify({
-            'status': 'sucesso', 
-            'gastos': dados.get('gastos', [])
-        })
+        limite, offset, ordenar = ler_paginacao()
+        total, gastos = repositorio.pagina('gastos', ordenar, limite, offset)
+        return jsonify_lista('gastos', gastos, paginacao=dados_paginacao(total, limite, offset))
+    except ValueError as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
+
+@app.route('/api/gastos/<int:id>', methods=['GET'])
+@com_etag()
+def obter_gasto(id):
+    """Retorna um único gasto"""
+    try:
+        gasto = repositorio.obter_gasto(id)
+        if gasto is None:
+            return jsonify({'status': 'erro', 'mensagem': 'Gasto não encontrado'}), 404
+        return jsonify({'status': 'sucesso', 'gasto': gasto})
     except Exception as e:
         return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
 
@@ -355,29 +717,44 @@ def listar_gastos():
 def registrar_gasto():
     """Registra novo gasto"""
     try:
-        dados = carregar_dados()
-        novo_gasto = request.json
-        
-        campos_obrigatorios = ['veiculo', 'placa', 'motorista', 'tipo_gasto', 'valor', 'data']
-        for campo in campos_obrigatorios:
-            if not novo_gasto.get(campo):
-                return jsonify({'status': 'erro', 'mensagem': f'Campo {campo} é obrigatório'}), 400
+        novo_gasto = corpo_json()
         
-        novo_id = max([g.get('id', 0) for g in dados['gastos']] + [0]) + 1
-        novo_gasto['id'] = novo_id
-        novo_gasto['data_registro'] = datetime.now().isoformat()
+        campo = campo_faltante(novo_gasto, CAMPOS_OBRIGATORIOS_GASTO)
+        if campo:
+            return jsonify({'status': 'erro', 'mensagem': f'Campo {campo} é obrigatório'}), 400
         
-        if novo_gasto.get('garantia_validade'):
-            novo_gasto['status_garantia'] = calcular_status_garantia(novo_gasto['garantia_validade'])
+        novo_gasto = preparar_gasto(novo_gasto)
         
-        dados['gastos'].append(novo_gasto)
-        salvar_dados(dados)
+        # O id é alocado dentro do repositório, sob o mesmo lock da inserção
+        novo_id = repositorio.inserir_gasto(novo_gasto)
+        publicar_alteracao('gastos', 'inserir', novo_id, repositorio.obter_gasto(novo_id))
         
         return jsonify({
             'status': 'sucesso', 
             'mensagem': 'Gasto registrado com sucesso!',
             'id': novo_id
         })
+    except ValueError as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
+
+@app.route('/api/gastos/bulk', methods=['POST'])
+def importar_gastos():
+    """Importa vários gastos (CSV ou NDJSON) com ids em bloco e uma única gravação"""
+    try:
+        return importar_lote('gastos', CAMPOS_OBRIGATORIOS_GASTO, preparar_gasto, repositorio.inserir_gastos)
+    except Exception as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
+
+@app.route('/api/gastos/exportar', methods=['GET'])
+@com_etag()
+def exportar_gastos():
+    """Exporta todos os gastos (?formato=csv|ndjson)"""
+    try:
+        return resposta_exportacao('gastos', repositorio.listar_gastos())
+    except ValueError as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 400
     except Exception as e:
         return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
 
@@ -385,22 +762,24 @@ def registrar_gasto():
 def atualizar_gasto(id):
     """Atualiza gasto existente"""
     try:
-        dados = carregar_dados()
-        gasto_index = next((i for i, g in enumerate(dados['gastos']) if g.get('id') == id), None)
-        
-        if gasto_index is None:
-            return jsonify({'status': 'erro', 'mensagem': 'Gasto não encontrado'}), 404
-        
-        dados_atualizados = request.json
+        dados_atualizados = corpo_json()
         dados_atualizados['id'] = id
         
+        erro = valor_invalido(dados_atualizados, 'valor')
+        if erro:
+            return jsonify({'status': 'erro', 'mensagem': erro}), 400
+        
         if dados_atualizados.get('garantia_validade'):
             dados_atualizados['status_garantia'] = calcular_status_garantia(dados_atualizados['garantia_validade'])
         
-        dados['gastos'][gasto_index] = {**dados['gastos'][gasto_index], **dados_atualizados}
+        gasto = repositorio.atualizar_gasto(id, dados_atualizados)
+        if gasto is None:
+            return jsonify({'status': 'erro', 'mensagem': 'Gasto não encontrado'}), 404
+        publicar_alteracao('gastos', 'atualizar', id, gasto)
         
-        salvar_dados(dados)
         return jsonify({'status': 'sucesso', 'mensagem': 'Gasto atualizado com sucesso!'})
+    except ValueError as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 400
     except Exception as e:
         return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
 
@@ -408,9 +787,8 @@ def atualizar_gasto(id):
 def excluir_gasto(id):
     """Exclui gasto"""
     try:
-        dados = carregar_dados()
-        dados['gastos'] = [g for g in dados['gastos'] if g.get('id') != id]
-        salvar_dados(dados)
+        if repositorio.excluir_gasto(id):
+            publicar_alteracao('gastos', 'excluir', id)
         return jsonify({'status': 'sucesso', 'mensagem': 'Gasto excluído com sucesso!'})
     except Exception as e:
         return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
@@ -421,101 +799,123 @@ def excluir_gasto(id):
 # ====================================
 # ... (Manutenção das rotas de ANÁLISE e FILTROS) ...
 @app.route('/api/analise', methods=['GET'])
+@com_etag()
 def analise_dados():
     """Calcula dados para gráficos aplicando filtros da URL."""
     try:
-        dados = carregar_dados()
-        gastos = dados.get('gastos', [])
-        diarias = dados.get('diarias', [])
-
         filtros = request.args.to_dict()
-        gastos_filtrados = aplicar_filtros(gastos, filtros) 
-
-        gastos_por_tipo = {}
-        gastos_por_veiculo = {}
-        gastos_por_placa = {}
-        gastos_mensal = {}
-
-        for gasto in gastos_filtrados: 
-            valor = float(gasto.get('valor', 0))
-            
-            tipo = gasto.get('tipo_gasto', 'Outros')
-            gastos_por_tipo[tipo] = gastos_por_tipo.get(tipo, 0) + valor
-            
-            veiculo = gasto.get('veiculo', 'Não Informado')
-            gastos_por_veiculo[veiculo] = gastos_por_veiculo.get(veiculo, 0) + valor
-            
-            placa = gasto.get('placa', 'Sem Placa')
-            gastos_por_placa[placa] = gastos_por_placa.get(placa, 0) + valor
-            
-            if gasto.get('data'):
-                mes_ano = gasto['data'][:7]
-                gastos_mensal[mes_ano] = gastos_mensal.get(mes_ano, 0) + valor
-        
-        diarias_por_motorista = {}
-        diarias_mensal = {}
-        for diaria in diarias:
-            valor_total = float(diaria.get('valor_total', 0))
-            motorista = diaria.get('motorista', 'Não Informado')
-            diarias_por_motorista[motorista] = diarias_por_motorista.get(motorista, 0) + valor_total
-            if diaria.get('data_inicio'):
-                mes_ano = diaria['data_inicio'][:7]
-                diarias_mensal[mes_ano] = diarias_mensal.get(mes_ano, 0) + valor_total
+        analise = repositorio.analise(filtros)
         
         return jsonify({
             'status': 'sucesso',
-            'analise': {
-                'gastos': {
-                    'por_tipo': {k: round(v, 2) for k, v in gastos_por_tipo.items()},
-                    'por_veiculo': {k: round(v, 2) for k, v in gastos_por_veiculo.items()},
-                    'por_placa': {k: round(v, 2) for k, v in gastos_por_placa.items()},
-                    'mensal': {k: round(v, 2) for k, v in sorted(gastos_mensal.items())}
-                },
-                'diarias': {
-                    'por_motorista': {k: round(v, 2) for k, v in diarias_por_motorista.items()},
-                    'mensal': {k: round(v, 2) for k, v in sorted(diarias_mensal.items())}
-                }
-            }
+            'analise': analise
         })
     except Exception as e:
         print(f"❌ Erro na análise: {e}")
         return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
 
+@app.route('/api/analise/tendencias', methods=['GET'])
+@com_etag()
+def analise_tendencias():
+    """Séries mensais por ?dimensao= (veiculo, placa ou motorista) com médias móveis
+    de ?janelas= meses e os ?top= outliers (ver tendencias.py)"""
+    try:
+        parametros = ler_parametros_tendencias(request.args)
+    except ValueError as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 400
+    try:
+        return jsonify({'status': 'sucesso', 'tendencias': repositorio.tendencias(**parametros)})
+    except Exception as e:
+        print(f"❌ Erro nas tendências: {e}")
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
+
+@app.route('/api/analise/cache', methods=['GET'])
+def estatisticas_cache_analise():
+    """Acertos/falhas do cache das análises com filtros"""
+    try:
+        return jsonify({'status': 'sucesso', 'cache': repositorio.estatisticas_cache()})
+    except Exception as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
+
 @app.route('/api/filtros', methods=['GET'])
+@com_etag()
 def obter_filtros():
     """Opções para filtros (usadas no frontend para preencher selects)"""
     try:
-        dados = carregar_dados()
-        gastos = dados.get('gastos', [])
-        diarias = dados.get('diarias', [])
-        
-        veiculos = sorted(list(set(g.get('veiculo') for g in gastos if g.get('veiculo'))))
-        placas = sorted(list(set(g.get('placa') for g in gastos if g.get('placa'))))
-        motoristas_gastos = sorted(list(set(g.get('motorista') for g in gastos if g.get('motorista'))))
-        motoristas_diarias = sorted(list(set(d.get('motorista') for d in diarias if d.get('motorista'))))
-        
-        anos = sorted(list(set(g['data'][:4] for g in gastos if g.get('data') and len(g['data']) >= 4)), reverse=True)
-        
         return jsonify({
             'status': 'sucesso',
-            'filtros': {
-                'veiculos': veiculos,
-                'placas': placas,
-                'motoristas_gastos': motoristas_gastos,
-                'motoristas_diarias': motoristas_diarias,
-                'anos': anos
-            }
+            'filtros': repositorio.opcoes_filtros()
+        })
+    except Exception as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
+
+
+# ====================================
+# FROTAS
+# ====================================
+# /api/frotas/<nome>/<rota> é a <rota> na frota <nome>; /api/<rota> é a frota padrão
+app.wsgi_app = PrefixoFrota(app.wsgi_app)
+
+@app.before_request
+def selecionar_frota():
+    nome = request.environ.get('frota.nome', FROTA_PADRAO)
+    g.frota = frotas.obter(nome)
+    if g.frota is None:
+        return jsonify({'status': 'erro', 'mensagem': f'Frota não encontrada: {nome}'}), 404
+
+@app.route('/api/frotas', methods=['GET'])
+def listar_frotas():
+    """Frotas existentes (as abertas já estão carregadas neste processo)"""
+    try:
+        abertas = {frota.nome for frota in frotas.abertas()}
+        return jsonify({
+            'status': 'sucesso',
+            'frotas': [{'nome': nome, 'aberta': nome in abertas} for nome in frotas.nomes()]
         })
     except Exception as e:
         return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
 
+@app.route('/api/frotas', methods=['POST'])
+def criar_frota():
+    """Cria uma frota vazia ({"nome": ...})"""
+    try:
+        nome = str(corpo_json().get('nome', ''))
+        if frotas.existe(nome):
+            return jsonify({'status': 'erro', 'mensagem': f'Frota {nome} já existe'}), 409
+        frotas.criar(nome)
+        return jsonify({'status': 'sucesso', 'mensagem': f'Frota {nome} criada com sucesso!', 'nome': nome})
+    except ValueError as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
+
+@app.route('/api/frotas/dashboard', methods=['GET'])
+def dashboard_consolidado():
+    """Dashboard de todas as frotas juntas, somando os agregados de cada uma (ver frotas.py)"""
+    try:
+        mes_atual = datetime.now().strftime('%Y-%m')
+        resumo, por_frota = frotas.dashboard_consolidado(mes_atual)
+        return jsonify({
+            'status': 'sucesso',
+            'dashboard': {
+                'resumo': resumo,
+                'alertas': {
+                    'servicos_vencidos': resumo['servicos_vencidos'],
+                    'servicos_sem_garantia': resumo['servicos_sem_garantia']
+                }
+            },
+            'frotas': por_frota
+        })
+    except Exception as e:
+        print(f"❌ Erro no dashboard consolidado: {e}")
+        return jsonify({'status': 'erro', 'mensagem': str(e)}), 500
 
 # ====================================
 # INICIALIZAÇÃO
 # ====================================
 
 if __name__ == '__main__':
-    if not os.path.exists(ARQUIVO_JSON):
+    if not os.path.exists(ARQUIVO_JSON) and repositorio.esta_vazio():
         dados_iniciais = {
             'gastos': [
                 {
@@ -559,10 +959,12 @@ if __name__ == '__main__':
                 }
             ]
         }
-        salvar_dados(dados_iniciais)
+        repositorio.substituir(dados_iniciais)
         print("📁 Arquivo JSON inicializado com dados de exemplo!")
     
+    iniciar_renovacao_garantias()
     print("🚀 Servidor Flask rodando na porta 5000!")
     print("📍 http://127.0.0.1:5000")
     print("📊 Dashboard: http://127.0.0.1:5000/api/dashboard")
+    print("🏭 Produção: uvicorn asgi:aplicacao --workers N (ver asgi.py)")
     app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
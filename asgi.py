@@ -0,0 +1,221 @@
+# asgi.py - ENTRADA ASGI PARA PRODUÇÃO
+#
+# Uso:
+#   uvicorn asgi:aplicacao --host 0.0.0.0 --port 5000 --workers 4
+#   python asgi.py          # o mesmo, configurado por FROTA_HOST, FROTA_PORTA e FROTA_WORKERS
+#
+# As rotas são as mesmas do app.py (o Flask roda por baixo). O loop de eventos
+# só recebe e envia bytes: cada requisição, com a leitura e a gravação do JSON,
+# roda em um pool de FROTA_THREADS threads (padrão 64) do próprio worker.
+#
+# Configuração dos workers:
+# - workers: um processo por núcleo de CPU. O GIL deixa cada processo usar um
+#   núcleo para o Python; as threads do pool cobrem as esperas de disco (fsync)
+#   e de rede.
+# - FROTA_THREADS: uma gravação segura a thread até o lote dela ir para o
+#   disco (ver escritor.py), sem gastar CPU. O pool precisa cobrir as
+#   gravações simultâneas, senão as leituras ficam na fila atrás delas: com
+#   16 threads e 128 clientes a vazão caiu pela metade no teste de carga.
+# - FROTA_PERSISTENCIA=journal: no modo 'arquivo' cada lote regrava o JSON
+#   inteiro (centenas de ms com dezenas de milhares de gastos) e é isso que
+#   limita a vazão, não o servidor.
+# - Cada worker tem sua cópia dos dados (backend 'memoria') ou sua conexão
+#   (backend 'sqlite'). As gravações passam pela trava entre processos (ver
+#   escritor.py), então nenhuma alteração se perde, mas no backend 'memoria'
+#   cada gravação faz os outros workers recarregarem o arquivo inteiro na
+#   leitura seguinte. Com muitas escritas e vários workers, prefira
+#   FROTA_BACKEND=sqlite; com um worker só, 'memoria' é o mais rápido.
+# - Métricas (/api/metrics) e perfis são por worker.
+# - /api/stream: cada navegador conectado espera no loop de eventos, não no
+#   pool. Os eventos são do worker que atendeu a gravação; os outros workers
+#   percebem a versão nova em até eventos.INTERVALO segundos e mandam
+#   'recarregar' aos seus clientes.
+# - A renovação diária das garantias roda em todos os workers; é idempotente
+#   (só o primeiro a rodar grava algo). FROTA_RENOVAR_GARANTIAS=0 desliga.
+#
+# Para medir: python teste_carga.py (compara com o servidor de desenvolvimento).
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, iniciar_renovacao_garantias
+
+THREADS = int(os.environ.get('FROTA_THREADS', '64'))
+_FIM = object()
+
+
+class _CorpoASGI(io.RawIOBase):
+    """wsgi.input que pede os pedaços do corpo ao loop de eventos conforme o app lê.
+
+    Uma importação em lote é processada enquanto ainda está chegando, sem
+    juntar o corpo inteiro na memória.
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._pendente = b''
+        self._fim = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        while not self._pendente and not self._fim:
+            mensagem = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if mensagem['type'] == 'http.disconnect':
+                self._fim = True
+                break
+            self._pendente = mensagem.get('body', b'')
+            self._fim = not mensagem.get('more_body', False)
+        tamanho = min(len(destino), len(self._pendente))
+        destino[:tamanho] = self._pendente[:tamanho]
+        self._pendente = self._pendente[tamanho:]
+        return tamanho
+
+
+def _ambiente(scope, corpo):
+    """Monta o environ WSGI a partir do scope ASGI"""
+    raiz = scope.get('root_path', '')
+    caminho = scope['path']
+    if raiz and caminho.startswith(raiz):
+        caminho = caminho[len(raiz):]
+    servidor = scope.get('server') or ('localhost', 80)
+    cliente = scope.get('client') or ('', 0)
+    ambiente = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': raiz.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': caminho.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': servidor[0],
+        'SERVER_PORT': str(servidor[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': cliente[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BufferedReader(corpo),
+        # Sem Content-Length (chunked) o corpo é lido até o fim
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    for nome, valor in scope.get('headers', []):
+        nome = nome.decode('latin-1').upper().replace('-', '_')
+        chave = nome if nome in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f"HTTP_{nome}"
+        valor = valor.decode('latin-1')
+        ambiente[chave] = f"{ambiente[chave]},{valor}" if chave in ambiente else valor
+    return ambiente
+
+
+class AdaptadorWSGI:
+    """Serve um app WSGI (o Flask) por ASGI, com cada requisição no pool de threads.
+
+    ao_iniciar(), se informado, roda no pool quando o servidor inicia (lifespan.startup).
+    """
+
+    def __init__(self, wsgi, threads=THREADS, ao_iniciar=None):
+        self.wsgi = wsgi
+        self.ao_iniciar = ao_iniciar
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi-frota')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._ciclo_de_vida(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        # websocket: não há rotas
+
+    async def _ciclo_de_vida(self, receive, send):
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'lifespan.startup':
+                if self.ao_iniciar is not None:
+                    await asyncio.get_running_loop().run_in_executor(self.executor, self.ao_iniciar)
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensagem['type'] == 'lifespan.shutdown':
+                # Espera as requisições em andamento (e suas gravações) terminarem
+                await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        ambiente = _ambiente(scope, _CorpoASGI(receive, loop))
+        resposta = {}
+
+        def iniciar_resposta(status, cabecalhos, exc_info=None):
+            if exc_info and 'status' in resposta:
+                raise exc_info[1].with_traceback(exc_info[2])
+            resposta['status'] = int(status.split(' ', 1)[0])
+            resposta['cabecalhos'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in cabecalhos]
+
+        def executar():
+            # Roda o app e já traz o primeiro pedaço: uma ida ao pool nas respostas comuns
+            iteravel = self.wsgi(ambiente, iniciar_resposta)
+            iterador = iter(iteravel)
+            return iteravel, iterador, next(iterador, _FIM)
+
+        iteravel = None
+        iniciada = False
+        try:
+            iteravel, iterador, pedaco = await loop.run_in_executor(self.executor, executar)
+            await send({'type': 'http.response.start', 'status': resposta['status'],
+                        'headers': resposta['cabecalhos']})
+            iniciada = True
+            leitor = ambiente.get('frota.eventos')
+            if leitor is not None:
+                # /api/stream: o primeiro pedaço (retry:) é o mesmo que aiter() envia
+                await self._eventos(leitor, receive, send)
+                return
+            # Respostas em streaming (exportação) seguem pedaço a pedaço
+            while pedaco is not _FIM:
+                if pedaco:
+                    await send({'type': 'http.response.body', 'body': pedaco, 'more_body': True})
+                pedaco = await loop.run_in_executor(self.executor, next, iterador, _FIM)
+            await send({'type': 'http.response.body', 'body': b''})
+        except Exception as e:
+            print(f"❌ Erro na requisição ASGI {scope['method']} {scope['path']}: {e}")
+            if not iniciada:
+                await send({'type': 'http.response.start', 'status': 500,
+                            'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+                await send({'type': 'http.response.body', 'body': b'Erro interno'})
+        finally:
+            if hasattr(iteravel, 'close'):
+                await loop.run_in_executor(self.executor, iteravel.close)
+
+    async def _eventos(self, leitor, receive, send):
+        """Envia o fluxo SSE até o cliente desconectar, esperando no loop e não no pool"""
+        # Um GET não tem corpo: a próxima mensagem do servidor é a desconexão
+        desconexao = asyncio.ensure_future(self._desconectou(receive))
+        fluxo = leitor.aiter(self.executor)
+        try:
+            async for pedaco in fluxo:
+                if desconexao.done():
+                    break
+                await send({'type': 'http.response.body', 'body': pedaco, 'more_body': True})
+        finally:
+            desconexao.cancel()
+            await fluxo.aclose()
+
+    @staticmethod
+    async def _desconectou(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+
+aplicacao = AdaptadorWSGI(app, ao_iniciar=iniciar_renovacao_garantias)
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        print("❌ Instale um servidor ASGI: pip install uvicorn")
+        sys.exit(1)
+    uvicorn.run('asgi:aplicacao', host=os.environ.get('FROTA_HOST', '127.0.0.1'),
+                port=int(os.environ.get('FROTA_PORTA', '5000')),
+                workers=int(os.environ.get('FROTA_WORKERS', '1')))
@@ -0,0 +1,335 @@
+# benchmark.py - BENCHMARK DAS ROTAS DA API COM FROTAS SINTÉTICAS
+#
+# Uso:
+#   python benchmark.py                              # escalas pequena e media
+#   python benchmark.py --escalas pequena,media,grande --saida resultados.json
+#   python benchmark.py --comparar resultados_antes.json
+#
+# O backend segue as mesmas variáveis de ambiente do app (FROTA_BACKEND,
+# FROTA_PERSISTENCIA, FROTA_MOTOR_ANALISE). Os dados ficam em uma pasta
+# temporária; gastos_veiculos.json não é tocado.
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from gerador_frota import gerar_frota
+
+ESCALAS = {
+    'pequena': {'veiculos': 10, 'motoristas': 8, 'anos': 1, 'gastos_por_veiculo_mes': 4, 'diarias_por_motorista_mes': 2},
+    'media': {'veiculos': 50, 'motoristas': 40, 'anos': 3, 'gastos_por_veiculo_mes': 8, 'diarias_por_motorista_mes': 4},
+    'grande': {'veiculos': 200, 'motoristas': 150, 'anos': 5, 'gastos_por_veiculo_mes': 10, 'diarias_por_motorista_mes': 4},
+}
+# Clientes gravando ao mesmo tempo na medição de escrita concorrente
+CLIENTES_CONCORRENTES = 8
+
+
+def percentil(ordenados, p):
+    """Percentil pelo método do posto mais próximo (lista já ordenada)"""
+    if not ordenados:
+        return 0
+    posicao = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[posicao]
+
+
+def resumir(tempos, status):
+    ordenados = sorted(tempos)
+    total = sum(tempos)
+    return {
+        'n': len(tempos),
+        'p50_ms': round(percentil(ordenados, 50) * 1000, 3),
+        'p95_ms': round(percentil(ordenados, 95) * 1000, 3),
+        'p99_ms': round(percentil(ordenados, 99) * 1000, 3),
+        'media_ms': round(total / len(tempos) * 1000, 3) if tempos else 0,
+        'vazao_rps': round(len(tempos) / total, 1) if total else 0,
+        'status': status
+    }
+
+
+def montar_rotas(dados, aleatorio):
+    """(nome, função que recebe o test client e devolve a resposta)"""
+    gastos = dados['gastos']
+    veiculos = sorted({g['veiculo'] for g in gastos})
+    placas = sorted({g['placa'] for g in gastos})
+    motoristas = sorted({g['motorista'] for g in gastos})
+    anos = sorted({g['data'][:4] for g in gastos})
+    ids = [g['id'] for g in gastos]
+
+    def analise_filtrada(c):
+        filtros = {}
+        for campo, valores in (('veiculo', veiculos), ('placa', placas), ('motorista', motoristas), ('ano', anos)):
+            if aleatorio.random() < 0.35:
+                filtros[campo] = aleatorio.choice(valores)
+        if aleatorio.random() < 0.3:
+            filtros['mes'] = str(aleatorio.randint(1, 12))
+        return c.get('/api/analise', query_string=filtros)
+
+    etags = {}
+
+    def dashboard_304(c):
+        # Mede só o pedido condicional; o ETag vem da resposta anterior
+        if 'dashboard' not in etags:
+            etags['dashboard'] = c.get('/api/dashboard').headers.get('ETag', '')
+        r = c.get('/api/dashboard', headers={'If-None-Match': etags['dashboard']})
+        if r.status_code == 200:
+            etags['dashboard'] = r.headers.get('ETag', '')
+        return r
+
+    novo_gasto = {'veiculo': veiculos[0], 'placa': placas[0], 'motorista': motoristas[0],
+                  'tipo_gasto': 'Manutencao', 'valor': '123.45', 'data': datetime.now().strftime('%Y-%m-%d'),
+                  'garantia_validade': ''}
+    nova_diaria = {'motorista': motoristas[0], 'data_inicio': '2025-01-01', 'data_fim': '2025-01-03',
+                   'valor_diaria_unitaria': '100'}
+    criados = {'gastos': [], 'diarias': []}
+
+    def post_gasto(c):
+        r = c.post('/api/gastos', json=dict(novo_gasto))
+        criados['gastos'].append(r.get_json().get('id'))
+        return r
+
+    def put_gasto(c):
+        return c.put(f"/api/gastos/{aleatorio.choice(ids)}", json={'valor': str(aleatorio.randint(10, 999))})
+
+    def delete_gasto(c):
+        alvo = criados['gastos'].pop() if criados['gastos'] else ids[-1]
+        return c.delete(f"/api/gastos/{alvo}")
+
+    def post_diaria(c):
+        r = c.post('/api/diarias', json=dict(nova_diaria))
+        criados['diarias'].append(r.get_json()['diaria']['id'])
+        return r
+
+    def put_diaria(c):
+        alvo = criados['diarias'][-1] if criados['diarias'] else dados['diarias'][0]['id']
+        return c.put(f"/api/diarias/{alvo}", json={'valor_diaria_unitaria': '80'})
+
+    def delete_diaria(c):
+        alvo = criados['diarias'].pop() if criados['diarias'] else dados['diarias'][-1]['id']
+        return c.delete(f"/api/diarias/{alvo}")
+
+    def bulk_gastos(c):
+        corpo = ''.join(json.dumps(novo_gasto) + '\n' for _ in range(100))
+        return c.post('/api/gastos/bulk', data=corpo, content_type='application/x-ndjson')
+
+    return [
+        ('GET /', lambda c: c.get('/')),
+        ('GET /api/health', lambda c: c.get('/api/health')),
+        ('GET /api/dashboard', lambda c: c.get('/api/dashboard')),
+        ('GET /api/dashboard (304)', dashboard_304),
+        ('GET /api/servicos', lambda c: c.get('/api/servicos')),
+        ('GET /api/servicos?limit=50', lambda c: c.get('/api/servicos?limit=50&sort=-data')),
+        ('GET /api/servicos/vencendo', lambda c: c.get('/api/servicos/vencendo?dias=30')),
+        ('GET /api/diarias', lambda c: c.get('/api/diarias')),
+        ('GET /api/gastos', lambda c: c.get('/api/gastos')),
+        ('GET /api/gastos?limit=50', lambda c: c.get('/api/gastos?limit=50&sort=-valor')),
+        ('GET /api/gastos/<id>', lambda c: c.get(f"/api/gastos/{aleatorio.choice(ids)}")),
+        ('GET /api/gastos/exportar', lambda c: c.get('/api/gastos/exportar')),
+        ('GET /api/analise', lambda c: c.get('/api/analise')),
+        ('GET /api/analise (filtros)', analise_filtrada),
+        ('GET /api/analise/tendencias', lambda c: c.get('/api/analise/tendencias?dimensao=veiculo&janelas=3,6,12')),
+        ('GET /api/filtros', lambda c: c.get('/api/filtros')),
+        ('POST /api/gastos', post_gasto),
+        ('PUT /api/gastos/<id>', put_gasto),
+        ('DELETE /api/gastos/<id>', delete_gasto),
+        ('POST /api/diarias', post_diaria),
+        ('PUT /api/diarias/<id>', put_diaria),
+        ('DELETE /api/diarias/<id>', delete_diaria),
+        ('POST /api/gastos/bulk (100)', bulk_gastos),
+    ]
+
+
+def medir_concorrencia(app_modulo, dados, clientes, repeticoes):
+    """Vários clientes fazendo POST /api/gastos ao mesmo tempo.
+
+    A vazão é sobre o tempo total (não a soma das latências): com a fila de
+    escrita, as gravações simultâneas saem juntas no mesmo lote.
+    """
+    modelo = {k: v for k, v in dados['gastos'][0].items() if k not in ('id', 'data_registro')}
+    tempos = []
+    status = {}
+    lock = threading.Lock()
+
+    def cliente():
+        c = app_modulo.app.test_client()
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resposta = c.post('/api/gastos', json=dict(modelo))
+            resposta.get_data()
+            with lock:
+                tempos.append(time.perf_counter() - inicio)
+                status[str(resposta.status_code)] = status.get(str(resposta.status_code), 0) + 1
+
+    threads = [threading.Thread(target=cliente) for _ in range(clientes)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - inicio
+    return {**resumir(tempos, status), 'vazao_rps': round(len(tempos) / total, 1), 'pico_memoria_mb': '-'}
+
+
+def medir_escala(app_modulo, nome, parametros, repeticoes, pasta):
+    dados = gerar_frota(**parametros)
+    caminho = os.path.join(pasta, f"{nome}.json")
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False)
+
+    # Aponta o app para o arquivo desta escala e mede a carga (tempo e memória)
+    app_modulo.ARQUIVO_JSON = caminho
+    app_modulo.ARQUIVO_SQLITE = os.path.join(pasta, f"{nome}.db")
+    app_modulo.PASTA_PARTICOES = os.path.join(pasta, f"{nome}.particoes")
+    # Frotas novas: a padrão abre (e é medida) com os arquivos desta escala
+    app_modulo.frotas = app_modulo.Frotas(app_modulo.PASTA_FROTAS, app_modulo.criar_repositorio)
+    inicio = time.perf_counter()
+    app_modulo.frotas.obter(app_modulo.FROTA_PADRAO)
+    carga = time.perf_counter() - inicio
+    # Segunda carga (descartada) só para medir memória: tracemalloc distorce o tempo
+    tracemalloc.start()
+    app_modulo.criar_repositorio()
+    _, pico_carga = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Carga a partir da imagem binária (backend memoria com FROTA_IMAGEM=1)
+    carga_imagem = None
+    repositorio = app_modulo.frotas.obter(app_modulo.FROTA_PADRAO).repositorio
+    if hasattr(repositorio, 'salvar_imagem') and repositorio.salvar_imagem():
+        inicio = time.perf_counter()
+        app_modulo.criar_repositorio()
+        carga_imagem = round(time.perf_counter() - inicio, 4)
+
+    cliente = app_modulo.app.test_client()
+    aleatorio = random.Random(1)
+    rotas = montar_rotas(dados, aleatorio)
+
+    # Uma passada com tracemalloc para o pico de memória de cada rota
+    memoria = {}
+    tracemalloc.start()
+    for rota, executar in rotas:
+        tracemalloc.reset_peak()
+        atual, _ = tracemalloc.get_traced_memory()
+        executar(cliente)
+        _, pico = tracemalloc.get_traced_memory()
+        memoria[rota] = round((pico - atual) / 1024 / 1024, 3)
+    _, pico_total = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    resultados = {}
+    for rota, executar in rotas:
+        tempos = []
+        status = {}
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resposta = executar(cliente)
+            resposta.get_data()
+            tempos.append(time.perf_counter() - inicio)
+            status[str(resposta.status_code)] = status.get(str(resposta.status_code), 0) + 1
+        resultados[rota] = {**resumir(tempos, status), 'pico_memoria_mb': memoria[rota]}
+    resultados[f'POST /api/gastos ({CLIENTES_CONCORRENTES} clientes)'] = medir_concorrencia(
+        app_modulo, dados, CLIENTES_CONCORRENTES, repeticoes)
+
+    return {
+        'nome': nome,
+        'parametros': parametros,
+        'gastos': len(dados['gastos']),
+        'diarias': len(dados['diarias']),
+        'carga_s': round(carga, 4),
+        'carga_imagem_s': carga_imagem,
+        'pico_memoria_carga_mb': round(pico_carga / 1024 / 1024, 3),
+        'pico_memoria_mb': round(max(pico_carga, pico_total) / 1024 / 1024, 3),
+        'rotas': resultados
+    }
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def imprimir(resultado):
+    for escala in resultado['escalas']:
+        print(f"\n📏 Escala {escala['nome']}: {escala['gastos']} gastos, {escala['diarias']} diárias "
+              f"(carga {escala['carga_s']}s, imagem {escala.get('carga_imagem_s')}s, pico {escala['pico_memoria_mb']} MB)")
+        print(f"{'rota':34} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'MB':>8}")
+        for rota, r in escala['rotas'].items():
+            print(f"{rota:34} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['vazao_rps']:>9} {r['pico_memoria_mb']:>8}")
+
+
+def comparar(anterior, atual):
+    """Mostra a variação do p50/p95 em relação a um resultado anterior"""
+    antigas = {e['nome']: e for e in anterior['escalas']}
+    print(f"\n🔍 Comparação com {anterior.get('commit') or 'resultado anterior'}")
+    for escala in atual['escalas']:
+        base = antigas.get(escala['nome'])
+        if not base:
+            continue
+        print(f"\n📏 Escala {escala['nome']}")
+        for rota, r in escala['rotas'].items():
+            antes = base['rotas'].get(rota)
+            if not antes or not antes['p50_ms']:
+                continue
+            variacao = (r['p50_ms'] - antes['p50_ms']) / antes['p50_ms'] * 100
+            alerta = ' ⚠️' if variacao > 20 else ''
+            print(f"{rota:34} p50 {antes['p50_ms']:>9} -> {r['p50_ms']:>9} ({variacao:+.1f}%){alerta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark das rotas da API')
+    parser.add_argument('--escalas', default='pequena,media', help=f"Lista separada por vírgula: {', '.join(ESCALAS)}")
+    parser.add_argument('--repeticoes', type=int, default=30)
+    parser.add_argument('--saida', help='Arquivo JSON com os resultados')
+    parser.add_argument('--comparar', help='Resultado anterior (JSON) para comparar')
+    args = parser.parse_args()
+
+    nomes = [n for n in args.escalas.split(',') if n]
+    for nome in nomes:
+        if nome not in ESCALAS:
+            parser.error(f"Escala desconhecida: {nome}")
+
+    pasta = tempfile.mkdtemp(prefix='benchmark-frota-')
+    try:
+        # O app cria o repositório ao ser importado: aponta para um arquivo vazio
+        os.environ['FROTA_ARQUIVO_JSON'] = os.path.join(pasta, 'inicial.json')
+        os.environ['FROTA_ARQUIVO_SQLITE'] = os.path.join(pasta, 'inicial.db')
+        os.environ['FROTA_PASTA_PARTICOES'] = os.path.join(pasta, 'inicial.particoes')
+        os.environ['FROTA_PASTA_FROTAS'] = os.path.join(pasta, 'frotas')
+        import app as app_modulo
+
+        resultado = {
+            'commit': commit_atual(),
+            'data': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'configuracao': {
+                'backend': app_modulo.BACKEND_DADOS,
+                'persistencia': app_modulo.MODO_PERSISTENCIA,
+                'motor_analise': app_modulo.MOTOR_ANALISE
+            },
+            'repeticoes': args.repeticoes,
+            'escalas': [medir_escala(app_modulo, nome, ESCALAS[nome], args.repeticoes, pasta) for nome in nomes]
+        }
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    imprimir(resultado)
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            comparar(json.load(f), resultado)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados gravados em {args.saida}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# cache_analise.py - CACHE DAS ANÁLISES COM FILTROS
+from collections import OrderedDict
+
+from calculos import aplicar_filtros, normalizar_filtros
+
+LIMITE_PADRAO = 128
+
+
+def chave_filtros(filtros):
+    """Tupla ordenada dos filtros normalizados (mês com dois dígitos)"""
+    return tuple(sorted(normalizar_filtros(filtros).items()))
+
+
+class CacheAnalise:
+    """LRU da seção 'gastos' da análise, por combinação de filtros.
+
+    Uma alteração só descarta as combinações em que o gasto antigo ou o novo
+    aparece (mesma regra de aplicar_filtros); as demais continuam válidas.
+    Quem usa o cache deve chamar os métodos sob o próprio lock.
+    """
+
+    LIMITE_LOTE = 64
+
+    def __init__(self, limite=LIMITE_PADRAO):
+        self.limite = limite
+        self._entradas = OrderedDict()  # chave -> (filtros, resultado)
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+
+    def obter(self, chave):
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            self.falhas += 1
+            return None
+        self._entradas.move_to_end(chave)
+        self.acertos += 1
+        return entrada[1]
+
+    def guardar(self, chave, resultado):
+        self._entradas[chave] = (dict(chave), resultado)
+        self._entradas.move_to_end(chave)
+        while len(self._entradas) > self.limite:
+            self._entradas.popitem(last=False)
+
+    def invalidar(self, *gastos):
+        """Descarta as análises que incluem algum dos gastos (None é ignorado)"""
+        gastos = [g for g in gastos if g is not None]
+        # Lote grande (importação): sai mais barato descartar tudo
+        if len(gastos) > self.LIMITE_LOTE:
+            self.limpar()
+            return
+        afetadas = [
+            chave for chave, (filtros, _) in self._entradas.items()
+            if aplicar_filtros(gastos, filtros)
+        ]
+        for chave in afetadas:
+            del self._entradas[chave]
+        self.invalidacoes += len(afetadas)
+
+    def limpar(self):
+        self.invalidacoes += len(self._entradas)
+        self._entradas.clear()
+
+    def estatisticas(self):
+        consultas = self.acertos + self.falhas
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acerto': round(self.acertos / consultas, 4) if consultas else 0,
+            'invalidacoes': self.invalidacoes,
+            'tamanho': len(self._entradas),
+            'limite': self.limite
+        }
@@ -0,0 +1,143 @@
+# calculos.py - CÁLCULOS SOBRE GASTOS E DIÁRIAS (sem acesso a disco)
+from datetime import date, datetime
+from operator import attrgetter
+
+TIPOS_MANUTENCAO = ['manutencao', 'manutenção']
+
+# Chaves aceitas em ?sort= (prefixo '-' para ordem decrescente) -> campo do registro
+CAMPOS_ORDENACAO = {
+    'gastos': {'data': 'data', 'valor': 'valor', 'placa': 'placa'},
+    'servicos': {'data': 'data', 'valor': 'valor', 'placa': 'placa'},
+    'diarias': {'data': 'data_inicio', 'valor': 'valor_total', 'motorista': 'motorista'},
+}
+CAMPOS_NUMERICOS = ('valor', 'valor_total')
+
+
+def normalizar_data_garantia(data_garantia):
+    """Data da garantia como 'AAAA-MM-DD' (ordenável como texto), ou None se vazia/inválida"""
+    try:
+        if len(data_garantia) == 10 and data_garantia[4] == data_garantia[7] == '-':
+            # Caso comum, já no formato: fromisoformat é bem mais rápido que strptime
+            return date.fromisoformat(data_garantia).isoformat()
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.strptime(data_garantia, '%Y-%m-%d').date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+def calcular_status_garantia(data_garantia, hoje=None):
+    """Calcula status da garantia (hoje: 'AAAA-MM-DD', por padrão a data atual)"""
+    if not data_garantia:
+        return 'Sem Data'
+    garantia = normalizar_data_garantia(data_garantia)
+    if garantia is None:
+        return 'Data Inválida'
+    if garantia < (hoje or date.today().isoformat()):
+        return 'Vencida'
+    else:
+        return 'Vigente'
+
+
+def normalizar_filtros(filtros):
+    """Mantém apenas os filtros preenchidos, com o mês em dois dígitos"""
+    filtros = {k: v for k, v in filtros.items() if k in ('veiculo', 'placa', 'motorista', 'ano', 'mes') and v}
+    if filtros.get('mes'):
+        filtros['mes'] = filtros['mes'].zfill(2)
+    return filtros
+
+
+def aplicar_filtros(gastos, filtros):
+    """Filtra a lista de gastos (ver modelos.Gasto) com base nos filtros da requisição (Veículo, Placa, etc.)."""
+
+    filtros = normalizar_filtros(filtros)
+
+    if not filtros:
+        return gastos
+
+    gastos_filtrados = []
+
+    mes_filtro = filtros.get('mes')
+
+    for gasto in gastos:
+
+        if filtros.get('veiculo') and gasto.veiculo != filtros['veiculo']:
+            continue
+
+        if filtros.get('placa') and gasto.placa != filtros['placa']:
+            continue
+
+        if filtros.get('motorista') and gasto.motorista != filtros['motorista']:
+            continue
+
+        # Gastos sem data passam pelos filtros de ano/mês
+        if gasto.ano is not None:
+
+            if filtros.get('ano') and gasto.ano != filtros['ano']:
+                continue
+
+            if mes_filtro and gasto.mes != mes_filtro:
+                continue
+
+        gastos_filtrados.append(gasto)
+
+    return gastos_filtrados
+
+
+def arredondar_valores(valores, ordenar=False):
+    """Arredonda os totais de um agrupamento para duas casas"""
+    itens = sorted(valores.items()) if ordenar else valores.items()
+    return {k: round(v, 2) for k, v in itens}
+
+
+def calcular_analise_gastos(gastos_filtrados):
+    """Agrupa os gastos (ver modelos.Gasto) por tipo, veículo, placa e mês"""
+    gastos_por_tipo = {}
+    gastos_por_veiculo = {}
+    gastos_por_placa = {}
+    gastos_mensal = {}
+
+    for gasto in gastos_filtrados:
+        valor = gasto.valor
+
+        tipo = gasto.get('tipo_gasto', 'Outros')
+        gastos_por_tipo[tipo] = gastos_por_tipo.get(tipo, 0) + valor
+
+        veiculo = gasto.get('veiculo', 'Não Informado')
+        gastos_por_veiculo[veiculo] = gastos_por_veiculo.get(veiculo, 0) + valor
+
+        placa = gasto.get('placa', 'Sem Placa')
+        gastos_por_placa[placa] = gastos_por_placa.get(placa, 0) + valor
+
+        mes_ano = gasto.ano_mes
+        if mes_ano is not None:
+            gastos_mensal[mes_ano] = gastos_mensal.get(mes_ano, 0) + valor
+
+    return {
+        'por_tipo': arredondar_valores(gastos_por_tipo),
+        'por_veiculo': arredondar_valores(gastos_por_veiculo),
+        'por_placa': arredondar_valores(gastos_por_placa),
+        'mensal': arredondar_valores(gastos_mensal, ordenar=True)
+    }
+
+
+def interpretar_ordenacao(entidade, ordenar):
+    """Converte '-valor' em ('valor', True); chave desconhecida levanta ValueError"""
+    decrescente = ordenar.startswith('-')
+    chave = ordenar[1:] if decrescente else ordenar
+    campos = CAMPOS_ORDENACAO[entidade]
+    if chave not in campos:
+        raise ValueError(f"Ordenação inválida: {ordenar}. Use: {', '.join(campos)}")
+    return campos[chave], decrescente
+
+
+def ordenar_registros(registros, entidade, ordenar):
+    """Ordena os registros (ver modelos.py) pela chave de ?sort=; empates mantêm a ordem de registro"""
+    campo, decrescente = interpretar_ordenacao(entidade, ordenar)
+    if campo in CAMPOS_NUMERICOS:
+        # Já é float no modelo (0.0 quando ausente ou inválido)
+        chave = attrgetter(campo)
+    else:
+        chave = lambda r: str(getattr(r, campo) or '')
+    return sorted(registros, key=chave, reverse=decrescente)
@@ -0,0 +1,69 @@
+# codificacao.py - CODIFICAÇÃO JSON (orjson quando instalado, json da biblioteca padrão senão)
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MOTORES_JSON = ('orjson', 'json')
+# FROTA_JSON=json força a biblioteca padrão mesmo com o orjson instalado
+MOTOR_JSON = os.environ.get('FROTA_JSON', 'orjson' if orjson is not None else 'json')
+if MOTOR_JSON not in MOTORES_JSON:
+    raise ValueError(f"Motor JSON inválido: {MOTOR_JSON}. Use: {', '.join(MOTORES_JSON)}")
+if MOTOR_JSON == 'orjson' and orjson is None:
+    print("⚠️ orjson não está instalado, usando o json da biblioteca padrão")
+    MOTOR_JSON = 'json'
+
+if orjson is not None:
+    # Chaves não-texto (ex: None, números) viram texto, como no json padrão
+    _OPCOES = orjson.OPT_NON_STR_KEYS
+    _OPCOES_ORDENADAS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+
+
+def _converter(padrao):
+    """default= que entende os registros de modelos.py (para_dict) antes de recorrer a padrao"""
+    def converter(obj):
+        para_dict = getattr(obj, 'para_dict', None)
+        if para_dict is not None:
+            return para_dict()
+        if padrao is not None:
+            return padrao(obj)
+        raise TypeError(f"Objeto do tipo {type(obj).__name__} não é serializável em JSON")
+    return converter
+
+
+def codificar(obj, ordenar=False, padrao=None):
+    """Objeto -> JSON compacto em bytes UTF-8.
+
+    ordenar=True coloca as chaves em ordem (como nas respostas da API);
+    padrao converte tipos que o JSON não conhece, como o default= do json.
+    Registros de modelos.py saem no formato de para_dict().
+    """
+    padrao = _converter(padrao)
+    if MOTOR_JSON == 'orjson':
+        try:
+            return orjson.dumps(obj, default=padrao, option=_OPCOES_ORDENADAS if ordenar else _OPCOES)
+        except TypeError:
+            # Casos que o orjson recusa (ex: inteiros acima de 64 bits) seguem pelo json padrão
+            pass
+    return json.dumps(obj, ensure_ascii=False, sort_keys=ordenar, separators=(',', ':'),
+                      default=padrao).encode('utf-8')
+
+
+def decodificar(dados):
+    """JSON (bytes ou str) -> objeto. Erros de sintaxe levantam json.JSONDecodeError."""
+    if MOTOR_JSON == 'orjson':
+        try:
+            return orjson.loads(dados)
+        except orjson.JSONDecodeError:
+            # O json padrão aceita NaN/Infinity, que arquivos antigos podem ter
+            pass
+    if isinstance(dados, (bytes, bytearray)):
+        try:
+            dados = dados.decode('utf-8')
+        except UnicodeDecodeError as e:
+            # Ex: linha de journal cortada no meio de um caractere
+            raise json.JSONDecodeError(f"UTF-8 inválido: {e.reason}", '', e.start) from e
+    return json.loads(dados)
@@ -0,0 +1,75 @@
+# escritor.py - FILA DE ESCRITA COM UMA ÚNICA THREAD GRAVADORA
+import queue
+import threading
+
+from metricas import metricas
+
+
+class _Pedido:
+    __slots__ = ('operacao', 'resultado', 'erro', 'pronto')
+
+    def __init__(self, operacao):
+        self.operacao = operacao
+        self.resultado = None
+        self.erro = None
+        self.pronto = threading.Event()
+
+
+class EscritorUnico:
+    """Serializa as alterações em uma thread só, com gravação em grupo.
+
+    As rotas enfileiram a alteração (uma função sem argumentos) e esperam o
+    resultado. A thread gravadora junta tudo o que estiver na fila e executa o
+    lote dentro de uma única transação do repositório: trava, sincroniza,
+    aplica as alterações uma a uma e grava no disco uma vez só. Quanto mais
+    clientes gravando ao mesmo tempo, maiores os lotes.
+
+    Uma alteração que falha (ex: valor inválido) devolve a exceção só para
+    quem a pediu; as outras do lote seguem normalmente.
+    """
+
+    LOTE_MAXIMO = 256
+
+    def __init__(self, transacao, nome='escritor-frota'):
+        # transacao(): context manager do repositório que envolve o lote
+        self._transacao = transacao
+        self._fila = queue.Queue()
+        self._thread = threading.Thread(target=self._executar, name=nome, daemon=True)
+        self._thread.start()
+
+    def executar(self, operacao):
+        """Enfileira a alteração e espera ela ser gravada. Retorna o resultado dela."""
+        if threading.current_thread() is self._thread:
+            # Chamada de dentro de um lote: já está na transação
+            return operacao()
+        pedido = _Pedido(operacao)
+        self._fila.put(pedido)
+        pedido.pronto.wait()
+        if pedido.erro is not None:
+            raise pedido.erro
+        return pedido.resultado
+
+    def _executar(self):
+        while True:
+            pedidos = [self._fila.get()]
+            while len(pedidos) < self.LOTE_MAXIMO:
+                try:
+                    pedidos.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._transacao():
+                    for pedido in pedidos:
+                        try:
+                            pedido.resultado = pedido.operacao()
+                        except Exception as e:
+                            pedido.erro = e
+            except Exception as e:
+                # A gravação do lote falhou: todos os pedidos recebem o erro
+                print(f"Erro ao gravar lote de alterações: {e}")
+                for pedido in pedidos:
+                    pedido.erro = pedido.erro or e
+            metricas.registrar_lote_escrita(len(pedidos))
+            for pedido in pedidos:
+                pedido.pronto.set()
+
@@ -0,0 +1,170 @@
+# eventos.py - ALTERAÇÕES DOS DADOS EM SERVER-SENT EVENTS (/api/stream)
+import threading
+import uuid
+from collections import deque
+
+from codificacao import codificar
+
+# Sem alterações, o fluxo manda um comentário a cada INTERVALO segundos: mantém a
+# conexão viva em proxies, descobre clientes que saíram e confere se outro
+# processo mudou os dados
+INTERVALO = 5.0
+# Milissegundos que o EventSource espera antes de reconectar
+RECONEXAO_MS = 3000
+PULSO = b': pulso\n\n'
+
+
+class CanalEventos:
+    """Últimas alterações publicadas neste processo, numeradas em ordem.
+
+    Guarda até `capacidade` eventos já codificados, para que um cliente que
+    reconecta (cabeçalho Last-Event-ID) receba o que perdeu. Quem ficou para
+    trás do histórico, ou vem de outra instância, recebe 'recarregar'.
+    """
+
+    def __init__(self, capacidade=1000):
+        self.instancia = uuid.uuid4().hex
+        self._eventos = deque(maxlen=capacidade)
+        self._ultimo = 0
+        self._condicao = threading.Condition()
+        self._assinantes = set()
+
+    def publicar(self, evento):
+        """Numera e guarda o evento (dict) e acorda quem está esperando. Retorna o número."""
+        dados = codificar(evento, ordenar=True)
+        with self._condicao:
+            self._ultimo += 1
+            self._eventos.append((self._ultimo, evento.get('versao'), dados))
+            self._condicao.notify_all()
+            numero = self._ultimo
+            assinantes = list(self._assinantes)
+        for avisar in assinantes:
+            avisar()
+        return numero
+
+    def ultimo(self):
+        with self._condicao:
+            return self._ultimo
+
+    def desde(self, numero):
+        """Eventos (numero, versao, dados) publicados depois de `numero`; None se parte deles já saiu do histórico"""
+        with self._condicao:
+            if numero > self._ultimo:
+                return None
+            if not self._eventos or numero >= self._ultimo:
+                return []
+            primeiro = self._eventos[0][0]
+            if numero < primeiro - 1:
+                return None
+            # Números consecutivos: a posição no deque sai do próprio número
+            return list(self._eventos)[numero - primeiro + 1:]
+
+    def esperar(self, numero, timeout):
+        """Bloqueia até existir evento depois de `numero`. False se o tempo acabou."""
+        with self._condicao:
+            return self._condicao.wait_for(lambda: self._ultimo > numero, timeout)
+
+    def assinar(self, avisar):
+        """avisar() é chamado (na thread de quem publica) a cada evento"""
+        with self._condicao:
+            self._assinantes.add(avisar)
+
+    def cancelar(self, avisar):
+        with self._condicao:
+            self._assinantes.discard(avisar)
+
+
+class Leitor:
+    """Um cliente do /api/stream: o que ele já recebeu e o corpo SSE que falta enviar.
+
+    `versao` é a função que devolve a versão atual dos dados (repositorio.versao).
+    Se ela mudou sem um evento correspondente (gravação de outro processo ou
+    worker), o cliente recebe 'recarregar' e busca tudo de novo.
+    """
+
+    def __init__(self, canal, versao, ultimo_id=None):
+        self._canal = canal
+        self._versao = versao
+        self._posicao = None
+        self._versao_vista = None
+        self._recarregar = False
+        # id dos eventos: instância:número:versão (ver _id)
+        partes = (ultimo_id or '').split(':')
+        if len(partes) == 3 and partes[0] == canal.instancia and partes[1].isdigit():
+            self._posicao = int(partes[1])
+            self._versao_vista = partes[2]
+        elif ultimo_id:
+            # Reconexão vinda de outra execução ou de outro worker
+            self._recarregar = True
+        if self._posicao is None:
+            self._posicao = canal.ultimo()
+            self._versao_vista = str(versao())
+
+    def _id(self):
+        return f"{self._canal.instancia}:{self._posicao}:{self._versao_vista}".encode('utf-8')
+
+    def _recarga(self):
+        return b'id: ' + self._id() + b'\nevent: recarregar\ndata: {}\n\n'
+
+    def proximos(self):
+        """Corpo SSE com o que ainda não foi enviado (b'' se nada mudou)"""
+        eventos = self._canal.desde(self._posicao)
+        if eventos is None:
+            self._posicao = self._canal.ultimo()
+            self._recarregar = True
+            eventos = []
+        atual = str(self._versao())
+        partes = []
+        for numero, versao, dados in eventos:
+            self._posicao = numero
+            self._versao_vista = str(versao)
+            partes.append(b'id: ' + self._id() + b'\nevent: alteracao\ndata: ' + dados + b'\n\n')
+        # Uma gravação local ainda não publicada também cai aqui: o cliente
+        # recarrega a mais, mas não perde nada
+        if atual != self._versao_vista:
+            self._versao_vista = atual
+            self._recarregar = True
+        if self._recarregar:
+            self._recarregar = False
+            partes.append(self._recarga())
+        return b''.join(partes)
+
+    def __iter__(self):
+        """Fluxo para servidores WSGI: a thread fica presa enquanto o cliente estiver conectado"""
+        yield f'retry: {RECONEXAO_MS}\n\n'.encode('utf-8')
+        while True:
+            posicao = self._posicao
+            pedaco = self.proximos()
+            if pedaco:
+                yield pedaco
+            elif not self._canal.esperar(posicao, INTERVALO):
+                yield PULSO
+
+    async def aiter(self, executor=None):
+        """O mesmo fluxo sem prender thread enquanto espera (ver asgi.py).
+
+        proximos() consulta o repositório e roda em `executor`.
+        """
+        # Só o servidor ASGI usa este caminho: no WSGI o asyncio nem é importado
+        import asyncio
+        loop = asyncio.get_running_loop()
+        aviso = asyncio.Event()
+
+        def avisar():
+            loop.call_soon_threadsafe(aviso.set)
+
+        self._canal.assinar(avisar)
+        try:
+            yield f'retry: {RECONEXAO_MS}\n\n'.encode('utf-8')
+            while True:
+                aviso.clear()
+                pedaco = await loop.run_in_executor(executor, self.proximos)
+                if pedaco:
+                    yield pedaco
+                    continue
+                try:
+                    await asyncio.wait_for(aviso.wait(), INTERVALO)
+                except asyncio.TimeoutError:
+                    yield PULSO
+        finally:
+            self._canal.cancelar(avisar)
@@ -0,0 +1,162 @@
+# frotas.py - FROTAS (CENTROS DE CUSTO) COM DADOS SEPARADOS
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from agregados import AgregadosFrota
+from eventos import CanalEventos
+
+FROTA_PADRAO = 'padrao'
+# Nomes que viram pasta: minúsculas, números, '-' e '_'
+NOME_VALIDO = re.compile(r'^[a-z0-9][a-z0-9_-]{0,63}$')
+# /api/frotas/dashboard é o dashboard consolidado, não uma frota
+NOMES_RESERVADOS = {'dashboard'}
+
+
+def nome_valido(nome):
+    return bool(NOME_VALIDO.match(nome)) and nome not in NOMES_RESERVADOS
+
+
+class Frota:
+    """Dados de uma frota: o repositório (com seu cache e sua trava) e o canal do /api/stream"""
+
+    def __init__(self, nome, repositorio):
+        self.nome = nome
+        self.repositorio = repositorio
+        self.canal = CanalEventos()
+
+
+class Frotas:
+    """Frotas conhecidas, cada uma aberta na primeira vez que é usada.
+
+    A frota padrão usa os arquivos configurados em app.py, como antes das
+    frotas existirem. As outras ficam em pasta/<nome>/ e são criadas com
+    criar(). Uma frota grande só ocupa a própria trava: as outras continuam
+    respondendo enquanto ela grava ou carrega.
+
+    criar_repositorio(nome) abre o backend da frota; ao_abrir(frota), se
+    informado, roda logo depois (ex: renovar as garantias).
+    """
+
+    def __init__(self, pasta, criar_repositorio, ao_abrir=None, threads=8):
+        self.pasta = pasta
+        self._criar_repositorio = criar_repositorio
+        self.ao_abrir = ao_abrir
+        self._abertas = {}
+        self._travas = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='frotas')
+        # Consolidado: soma dos resumos de cada frota, na versão em que foram lidos
+        self._consolidado = AgregadosFrota()
+        self._resumos = {}
+        self._lock_consolidado = threading.Lock()
+
+    def caminho(self, nome, arquivo):
+        """Onde fica `arquivo` (um caminho configurado para a frota padrão) na frota `nome`"""
+        if nome == FROTA_PADRAO:
+            return arquivo
+        return os.path.join(self.pasta, nome, os.path.basename(arquivo))
+
+    def nomes(self):
+        """A frota padrão e as pastas de frota, em ordem"""
+        try:
+            pastas = [nome for nome in os.listdir(self.pasta)
+                      if nome_valido(nome) and os.path.isdir(os.path.join(self.pasta, nome))]
+        except FileNotFoundError:
+            pastas = []
+        return [FROTA_PADRAO] + sorted(set(pastas) - {FROTA_PADRAO})
+
+    def existe(self, nome):
+        return nome in self._abertas or nome == FROTA_PADRAO or (
+            nome_valido(nome) and os.path.isdir(os.path.join(self.pasta, nome)))
+
+    def criar(self, nome):
+        """Cria a pasta de uma frota nova. ValueError se o nome não serve."""
+        if not nome_valido(nome):
+            raise ValueError(f"Nome de frota inválido: {nome}. Use letras minúsculas, números, '-' e '_'")
+        if nome != FROTA_PADRAO:
+            os.makedirs(os.path.join(self.pasta, nome), exist_ok=True)
+
+    def obter(self, nome):
+        """Frota aberta (abre na primeira vez); None se ela não existe"""
+        frota = self._abertas.get(nome)
+        if frota is not None:
+            return frota
+        if not self.existe(nome):
+            return None
+        with self._lock:
+            trava = self._travas.setdefault(nome, threading.Lock())
+        # Uma trava por frota: abrir uma frota grande não segura a abertura das outras
+        with trava:
+            frota = self._abertas.get(nome)
+            if frota is None:
+                frota = Frota(nome, self._criar_repositorio(nome))
+                self._abertas[nome] = frota
+                if self.ao_abrir is not None:
+                    self.ao_abrir(frota)
+        return frota
+
+    def abertas(self):
+        return list(self._abertas.values())
+
+    # ------------------------------------
+    # Consolidado
+    # ------------------------------------
+    def _resumo_se_mudou(self, frota):
+        """(versão, resumo) da frota, ou None se ela está na versão já somada"""
+        anterior = self._resumos.get(frota.nome)
+        if anterior is not None and anterior[0] == frota.repositorio.versao():
+            return None
+        # O índice de garantias fica de fora (vencidas é uma contagem, somada por
+        # frota), assim como as séries por veículo, que o dashboard não usa
+        return frota.repositorio.exportar_agregados(garantias=False, series=False)
+
+    def _consolidar(self, frotas):
+        """Atualiza a soma com as frotas que mudaram (chamado com _lock_consolidado)"""
+        novos = list(self._executor.map(self._resumo_se_mudou, frotas))
+        for frota, novo in zip(frotas, novos):
+            if novo is None:
+                continue
+            anterior = self._resumos.get(frota.nome)
+            if anterior is not None:
+                self._consolidado.incorporar(anterior[1], -1)
+            self._consolidado.incorporar(novo[1])
+            self._resumos[frota.nome] = novo
+
+    def dashboard_consolidado(self, mes_atual):
+        """resumo_dashboard de todas as frotas juntas e o de cada uma.
+
+        Os resumos (AgregadosFrota.exportar) das frotas que mudaram desde a
+        última consulta são lidos em paralelo, cada um sob a trava da sua
+        frota; o consolidado troca o resumo antigo pelo novo (as somas em
+        ponto fixo continuam exatas), sem percorrer os registros.
+        """
+        frotas = [self.obter(nome) for nome in self.nomes()]
+        with self._lock_consolidado:
+            self._consolidar(frotas)
+            resumo = self._consolidado.resumo_dashboard(mes_atual)
+        por_frota = dict(zip(
+            (frota.nome for frota in frotas),
+            self._executor.map(lambda frota: frota.repositorio.resumo_dashboard(mes_atual), frotas)
+        ))
+        resumo['servicos_vencidos'] = sum(dashboard['servicos_vencidos'] for dashboard in por_frota.values())
+        return resumo, por_frota
+
+
+class PrefixoFrota:
+    """Middleware WSGI: /api/frotas/<nome>/<rota> vira /api/<rota> com environ['frota.nome'] = nome.
+
+    Assim todas as rotas da API valem para cada frota sem serem repetidas;
+    /api/<rota> continua sendo a frota padrão.
+    """
+
+    def __init__(self, wsgi):
+        self.wsgi = wsgi
+
+    def __call__(self, environ, start_response):
+        partes = environ.get('PATH_INFO', '').split('/', 4)
+        if len(partes) == 5 and partes[1] == 'api' and partes[2] == 'frotas' and partes[4]:
+            environ['frota.nome'] = partes[3]
+            environ['PATH_INFO'] = '/api/' + partes[4]
+        return self.wsgi(environ, start_response)
@@ -0,0 +1,118 @@
+# gerador_frota.py - GERADOR DE FROTAS SINTÉTICAS (para benchmark.py e testes de carga)
+import argparse
+import json
+import random
+from datetime import date, datetime, timedelta
+
+TIPOS_GASTO = ['Manutencao', 'Manutenção', 'Combustivel', 'Pedagio', 'Estacionamento', 'Outros']
+PESOS_TIPOS = [25, 5, 45, 10, 5, 10]
+MODELOS = ['Carro', 'Van', 'Caminhão', 'Moto', 'Utilitário']
+NOMES = ['JOÃO', 'MARIA', 'GILVAN', 'DEYSE', 'GUSTAVO', 'ANA', 'PEDRO', 'LUCAS', 'CARLA', 'RAFAEL']
+
+
+def _placa(aleatorio):
+    letras = ''.join(aleatorio.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(3))
+    return f"{letras}-{aleatorio.randint(0, 9999):04d}"
+
+
+def _valor(aleatorio, minimo, maximo):
+    """Valor no formato bagunçado do arquivo real: quase sempre texto, às vezes número"""
+    valor = round(aleatorio.uniform(minimo, maximo), aleatorio.choice([0, 1, 2]))
+    sorteio = aleatorio.random()
+    if sorteio < 0.75:
+        return str(valor)
+    if sorteio < 0.9:
+        return valor
+    return str(int(valor))
+
+
+def gerar_frota(veiculos=20, motoristas=15, anos=2, gastos_por_veiculo_mes=4,
+                diarias_por_motorista_mes=2, semente=42, ate=None):
+    """Gera {'gastos': [...], 'diarias': [...]} no mesmo formato de gastos_veiculos.json.
+
+    Reproduz os casos vistos no arquivo real: valor como texto, serviços sem
+    garantia_validade (campo vazio ou ausente), status_garantia só em parte
+    dos registros e veículos que trocaram de placa.
+    """
+    aleatorio = random.Random(semente)
+    ate = ate or date.today()
+    inicio = ate - timedelta(days=365 * anos)
+    dias_periodo = (ate - inicio).days
+
+    frota = []
+    for i in range(veiculos):
+        placas = [_placa(aleatorio)]
+        if aleatorio.random() < 0.1:
+            placas.append(_placa(aleatorio))
+        frota.append((f"{aleatorio.choice(MODELOS)} {i + 1:03d}", placas))
+    nomes = [f"{aleatorio.choice(NOMES)} {i + 1:03d}" for i in range(motoristas)]
+
+    gastos = []
+    total_gastos = veiculos * gastos_por_veiculo_mes * 12 * anos
+    for _ in range(total_gastos):
+        veiculo, placas = aleatorio.choice(frota)
+        dia = inicio + timedelta(days=aleatorio.randrange(dias_periodo))
+        tipo = aleatorio.choices(TIPOS_GASTO, PESOS_TIPOS)[0]
+        gasto = {
+            'data': dia.isoformat(),
+            'veiculo': veiculo,
+            'placa': aleatorio.choice(placas),
+            'motorista': aleatorio.choice(nomes),
+            'tipo_gasto': tipo,
+            'valor': _valor(aleatorio, 20, 3000 if tipo.startswith('Manuten') else 600),
+            'nf_numero': f"NF{aleatorio.randint(100000, 999999)}" if aleatorio.random() < 0.7 else '',
+            'os_numero': '',
+            'observacoes': '',
+            'id': len(gastos) + 1,
+            'data_registro': datetime.combine(dia, datetime.min.time()).isoformat()
+        }
+        if tipo.startswith('Manuten'):
+            gasto['os_numero'] = f"OS{aleatorio.randint(100000, 999999)}"
+            sorteio = aleatorio.random()
+            if sorteio < 0.7:
+                gasto['garantia_validade'] = (dia + timedelta(days=aleatorio.choice([30, 90, 180, 365]))).isoformat()
+                if aleatorio.random() < 0.5:
+                    gasto['status_garantia'] = 'Vigente'
+            elif sorteio < 0.85:
+                gasto['garantia_validade'] = ''
+            # restante: sem o campo garantia_validade
+        else:
+            gasto['garantia_validade'] = ''
+        gastos.append(gasto)
+
+    diarias = []
+    total_diarias = motoristas * diarias_por_motorista_mes * 12 * anos
+    for i in range(total_diarias):
+        dia = inicio + timedelta(days=aleatorio.randrange(dias_periodo))
+        dias = aleatorio.randint(1, 5)
+        unitario = _valor(aleatorio, 50, 300)
+        diarias.append({
+            'motorista': aleatorio.choice(nomes),
+            'data_inicio': dia.isoformat(),
+            'data_fim': (dia + timedelta(days=dias - 1)).isoformat(),
+            'valor_diaria_unitaria': str(unitario),
+            'observacoes': aleatorio.choice(['', '', 'FRETE', 'VIAGEM']),
+            'dias_uteis': dias,
+            'valor_total': dias * float(unitario),
+            'data_registro': datetime.combine(dia, datetime.min.time()).isoformat(),
+            'id': f"{dia.strftime('%Y%m%d')}{i:06d}"
+        })
+
+    return {'gastos': gastos, 'diarias': diarias}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera um gastos_veiculos.json sintético')
+    parser.add_argument('saida', nargs='?', default='gastos_sinteticos.json')
+    parser.add_argument('--veiculos', type=int, default=20)
+    parser.add_argument('--motoristas', type=int, default=15)
+    parser.add_argument('--anos', type=int, default=2)
+    parser.add_argument('--gastos-por-veiculo-mes', type=int, default=4)
+    parser.add_argument('--diarias-por-motorista-mes', type=int, default=2)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+    dados = gerar_frota(args.veiculos, args.motoristas, args.anos, args.gastos_por_veiculo_mes,
+                        args.diarias_por_motorista_mes, args.semente)
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, indent=2, ensure_ascii=False)
+    print(f"✅ {len(dados['gastos'])} gastos e {len(dados['diarias'])} diárias gravados em {args.saida}")
@@ -0,0 +1,125 @@
+# imagem.py - IMAGEM BINÁRIA DOS DADOS EM MEMÓRIA (INÍCIO RÁPIDO)
+#
+# O backend 'memoria' monta registros, índices e agregados a partir do JSON a
+# cada início. A imagem guarda tudo isso já montado, em pickle, ao lado do
+# JSON (gastos_veiculos.json.imagem); na próxima carga ela é usada no lugar
+# do JSON se ainda corresponder aos arquivos de dados.
+#
+# O JSON (e o journal) continuam sendo a fonte dos dados: a imagem é só um
+# cache local, gravado pelo próprio processo, e é descartada sem erro quando
+# não serve. Como todo pickle, não deve ser lida de origem não confiável.
+import gc
+import hashlib
+import os
+import pickle
+import sys
+
+# Muda quando a estrutura do arquivo muda. Mudanças no código das classes
+# guardadas invalidam a imagem sozinhas (ver versao_codigo).
+FORMATO = 1
+# Módulos cujo código define os objetos guardados e os campos calculados
+MODULOS = ('calculos', 'modelos', 'indices', 'agregados', 'repositorio', 'imagem')
+
+_versao_codigo = None
+
+
+def versao_codigo():
+    """Hash do código-fonte dos MODULOS e da versão do Python"""
+    global _versao_codigo
+    if _versao_codigo is None:
+        resumo = hashlib.blake2b(sys.version.encode('utf-8'), digest_size=16)
+        for nome in MODULOS:
+            __import__(nome)
+            with open(sys.modules[nome].__file__, 'rb') as f:
+                resumo.update(f.read())
+        _versao_codigo = resumo.hexdigest()
+    return _versao_codigo
+
+
+def hash_arquivos(caminhos):
+    """Hash do conteúdo dos arquivos de dados (arquivo inexistente também conta)"""
+    resumo = hashlib.blake2b(digest_size=16)
+    for caminho in caminhos:
+        try:
+            with open(caminho, 'rb') as f:
+                resumo.update(hashlib.file_digest(f, 'blake2b').digest())
+        except FileNotFoundError:
+            resumo.update(b'-')
+    return resumo.hexdigest()
+
+
+def _cabecalho(assinatura, arquivos):
+    return {
+        'formato': FORMATO,
+        'codigo': versao_codigo(),
+        'assinatura': assinatura,
+        'hash': hash_arquivos(arquivos)
+    }
+
+
+def capturar(assinatura, arquivos, registros, estruturas):
+    """Prepara uma imagem; chamado sob as travas, com a memória igual ao disco.
+
+    assinatura/arquivos identificam os arquivos de dados (ver persistencia.py);
+    registros é um dict de dicts id -> registro (copiados aqui: os registros
+    não mudam, só os dicts); estruturas (índices, agregados...) já sai em bytes.
+    O pickle dos registros, a parte demorada, fica para gravar(), fora das travas.
+    """
+    return (
+        _cabecalho(assinatura, arquivos),
+        {nome: dict(por_id) for nome, por_id in registros.items()},
+        pickle.dumps(estruturas, protocol=pickle.HIGHEST_PROTOCOL)
+    )
+
+
+def gravar(caminho, capturado):
+    """Grava o que capturar() preparou (temporário + rename: nunca fica pela metade).
+
+    Se a imagem em disco já é dos mesmos arquivos de dados (ex: outro worker
+    gravou ao encerrar), não grava de novo. Retorna se gravou.
+    """
+    cabecalho, registros, estruturas = capturado
+    try:
+        with open(caminho, 'rb') as f:
+            if pickle.load(f) == cabecalho:
+                return False
+    except Exception:
+        pass
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        with open(temporario, 'wb') as f:
+            pickle.dump(cabecalho, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(registros, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.write(estruturas)
+        os.replace(temporario, caminho)
+        return True
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def ler(caminho, assinatura, arquivos):
+    """(registros, estruturas) se a imagem corresponde aos arquivos de dados; senão None"""
+    try:
+        with open(caminho, 'rb') as f:
+            cabecalho = pickle.load(f)
+            if cabecalho.get('formato') != FORMATO or cabecalho.get('codigo') != versao_codigo():
+                print(f"⚠️ Imagem {caminho} de outra versão do código, lendo o JSON")
+                return None
+            # Desatualizada (o JSON mudou depois dela): lê o JSON, sem aviso
+            if cabecalho['assinatura'] != assinatura or cabecalho['hash'] != hash_arquivos(arquivos):
+                return None
+            # Milhares de objetos novos de uma vez: sem o coletor de ciclos, que
+            # rodaria várias vezes à toa durante a leitura
+            coletor = gc.isenabled()
+            gc.disable()
+            try:
+                return pickle.load(f), pickle.load(f)
+            finally:
+                if coletor:
+                    gc.enable()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️ Imagem {caminho} ignorada: {e}")
+        return None
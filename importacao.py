@@ -0,0 +1,99 @@
+# importacao.py - IMPORTAÇÃO E EXPORTAÇÃO EM LOTE (CSV e JSON-lines)
+import csv
+import io
+
+from codificacao import codificar, decodificar
+from modelos import Registro, como_dict
+
+FORMATOS = ('csv', 'ndjson')
+TIPOS_CONTEUDO = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+# Linhas acumuladas antes de cada envio na exportação
+LINHAS_POR_BLOCO = 500
+
+
+def detectar_formato(formato, tipo_conteudo):
+    """?formato= tem prioridade; senão decide pelo Content-Type (padrão: ndjson)"""
+    if formato:
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato inválido: {formato}. Use: {', '.join(FORMATOS)}")
+        return formato
+    return 'csv' if 'csv' in (tipo_conteudo or '') else 'ndjson'
+
+
+def ler_registros(fluxo, formato):
+    """Lê o corpo aos poucos e gera (número da linha, registro ou mensagem de erro)"""
+    texto = io.TextIOWrapper(fluxo, encoding='utf-8-sig', newline='')
+    if formato == 'csv':
+        leitor = csv.DictReader(texto)
+        for registro in leitor:
+            # Colunas a mais na linha ficam sob a chave None
+            registro.pop(None, None)
+            yield leitor.line_num, registro
+        return
+    for numero, linha in enumerate(texto, start=1):
+        if not linha.strip():
+            continue
+        try:
+            registro = decodificar(linha)
+        except ValueError as e:
+            yield numero, f'JSON inválido: {e}'
+            continue
+        if not isinstance(registro, dict):
+            yield numero, 'Cada linha deve ser um objeto JSON'
+            continue
+        yield numero, registro
+
+
+def colunas_csv(registros):
+    """Colunas do CSV: os CAMPOS de cada modelo e depois as outras chaves, na ordem em que aparecem.
+
+    Só as chaves de 'extras' são percorridas (e as de registros que já são
+    dicionários): nenhum registro vira dicionário para montar o cabeçalho.
+    """
+    modelos = {}
+    outras = {}
+    for registro in registros:
+        if isinstance(registro, Registro):
+            modelos[type(registro)] = None
+            if registro.extras:
+                outras.update(dict.fromkeys(registro.extras))
+        else:
+            outras.update(dict.fromkeys(registro))
+    colunas = dict.fromkeys(campo for modelo in modelos for campo in modelo.CAMPOS)
+    colunas.update(outras)
+    return list(colunas)
+
+
+def gerar_csv(registros):
+    """Gera o CSV em blocos, uma linha por vez (registros é percorrido duas vezes: use uma lista)"""
+    colunas = colunas_csv(registros)
+    saida = io.StringIO()
+    # As linhas são montadas direto (o DictWriter conferia as chaves de cada
+    # linha, que já estão nas colunas)
+    escritor = csv.writer(saida)
+    escritor.writerow(colunas)
+    for posicao, registro in enumerate(registros, start=1):
+        dados = como_dict(registro)
+        escritor.writerow([dados.get(coluna, '') for coluna in colunas])
+        if posicao % LINHAS_POR_BLOCO == 0:
+            yield saida.getvalue()
+            saida.seek(0)
+            saida.truncate(0)
+    yield saida.getvalue()
+
+
+def gerar_ndjson(registros):
+    """Gera um objeto JSON por linha, em blocos (com o JSON que cada registro já guarda)"""
+    bloco = []
+    for registro in registros:
+        bloco.append(registro.json() if isinstance(registro, Registro) else codificar(registro))
+        if len(bloco) == LINHAS_POR_BLOCO:
+            yield b'\n'.join(bloco) + b'\n'
+            bloco = []
+    if bloco:
+        yield b'\n'.join(bloco) + b'\n'
+
+
+def exportar(registros, formato):
+    """Gerador do conteúdo exportado no formato pedido"""
+    return gerar_csv(registros) if formato == 'csv' else gerar_ndjson(registros)
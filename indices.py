@@ -0,0 +1,220 @@
+# indices.py - ÍNDICES EM MEMÓRIA PARA OS FILTROS DA ANÁLISE E AS GARANTIAS
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from calculos import normalizar_filtros
+from modelos import AUSENTE
+
+
+def _incluir(postagens, valor, chave):
+    postagens.setdefault(valor, set()).add(chave)
+
+
+def _remover(postagens, valor, chave):
+    chaves = postagens.get(valor)
+    if chaves is not None:
+        chaves.discard(chave)
+        if not chaves:
+            del postagens[valor]
+
+
+class IndiceGastos:
+    """Índices secundários dos gastos (valor -> conjunto de chaves).
+
+    - veiculo, placa e motorista: um conjunto por valor
+    - ano, mês e ano+mês da data: um conjunto por período
+    - ordem: posição de cada gasto, para devolver os filtrados na ordem de registro
+
+    Os filtros viram interseções desses conjuntos, começando pelo menor.
+    Os gastos são do modelo (ver modelos.Gasto), com ano e mês já separados.
+    """
+
+    CAMPOS = ('veiculo', 'placa', 'motorista')
+
+    def __init__(self):
+        self.limpar()
+
+    def limpar(self):
+        self.por_campo = {campo: {} for campo in self.CAMPOS}
+        self.por_ano = {}
+        self.por_mes = {}
+        self.por_ano_mes = {}
+        # Gastos sem data passam pelos filtros de ano/mês (ver aplicar_filtros)
+        self.sem_data = set()
+        self.ordem = {}
+        self._sequencia = 0
+
+    def _postagens(self, gasto):
+        """Pares (índice, valor) em que o gasto aparece, exceto os de data"""
+        for campo in self.CAMPOS:
+            valor = getattr(gasto, campo)
+            if valor is not None and valor is not AUSENTE:
+                yield self.por_campo[campo], valor
+        if gasto.ano is not None:
+            yield self.por_ano, gasto.ano
+            yield self.por_mes, gasto.mes
+            yield self.por_ano_mes, (gasto.ano, gasto.mes)
+
+    def adicionar(self, chave, gasto):
+        if chave not in self.ordem:
+            self.ordem[chave] = self._sequencia
+            self._sequencia += 1
+        for postagens, valor in self._postagens(gasto):
+            _incluir(postagens, valor, chave)
+        if gasto.ano is None:
+            self.sem_data.add(chave)
+
+    def remover(self, chave, gasto, manter_ordem=False):
+        for postagens, valor in self._postagens(gasto):
+            _remover(postagens, valor, chave)
+        self.sem_data.discard(chave)
+        if not manter_ordem:
+            self.ordem.pop(chave, None)
+
+    def substituir(self, chave, antigo, novo):
+        """Reindexa um gasto alterado mantendo sua posição"""
+        self.remover(chave, antigo, manter_ordem=True)
+        self.adicionar(chave, novo)
+
+    def buscar(self, filtros):
+        """Chaves dos gastos que passam nos filtros (None quando não há filtros)"""
+        filtros = normalizar_filtros(filtros)
+        if not filtros:
+            return None
+
+        conjuntos = [
+            self.por_campo[campo].get(filtros[campo], set())
+            for campo in self.CAMPOS if filtros.get(campo)
+        ]
+
+        ano, mes = filtros.get('ano'), filtros.get('mes')
+        if ano or mes:
+            if ano and mes:
+                periodo = self.por_ano_mes.get((ano, mes), set())
+            elif ano:
+                periodo = self.por_ano.get(ano, set())
+            else:
+                periodo = self.por_mes.get(mes, set())
+            conjuntos.append(periodo | self.sem_data if self.sem_data else periodo)
+
+        conjuntos.sort(key=len)
+        resultado = set(conjuntos[0])
+        for conjunto in conjuntos[1:]:
+            if not resultado:
+                break
+            resultado &= conjunto
+        return resultado
+
+    def ordenar(self, chaves):
+        return sorted(chaves, key=self.ordem.__getitem__)
+
+
+class IndiceGarantias:
+    """Datas de garantia dos serviços em ordem, com a chave de cada serviço.
+
+    As datas ficam como 'AAAA-MM-DD', então comparar texto é comparar datas:
+    as vencidas são as anteriores a hoje (um bisect) e as que vencem nos
+    próximos N dias são uma fatia da lista. Garantias vazias ou inválidas
+    ficam de fora.
+    """
+
+    def __init__(self):
+        self.limpar()
+
+    def limpar(self):
+        self.datas = []
+        self.chaves = []  # chaves[i] é o serviço com garantia em datas[i]
+
+    @staticmethod
+    def _data(gasto):
+        # A validade já vem normalizada no modelo (ver modelos.Gasto)
+        if gasto is None or not gasto.servico:
+            return None
+        return gasto.garantia
+
+    def reconstruir(self, pares):
+        """Monta o índice de uma vez a partir de pares (chave, gasto)"""
+        self.reconstruir_datas((chave, self._data(gasto)) for chave, gasto in pares)
+
+    def reconstruir_datas(self, pares):
+        """Monta o índice a partir de pares (chave, data da garantia ou None)"""
+        entradas = []
+        for posicao, (chave, data) in enumerate(pares):
+            if data is not None:
+                entradas.append((data, posicao, chave))
+        # A posição desempata datas iguais sem comparar chaves de tipos diferentes
+        entradas.sort(key=lambda entrada: entrada[:2])
+        self.datas = [data for data, _, _ in entradas]
+        self.chaves = [chave for _, _, chave in entradas]
+
+    def adicionar(self, chave, gasto):
+        data = self._data(gasto)
+        if data is not None:
+            self._inserir(data, chave)
+
+    def remover(self, chave, gasto):
+        data = self._data(gasto)
+        if data is not None:
+            self._retirar(data, chave)
+
+    def _inserir(self, data, chave):
+        posicao = bisect_right(self.datas, data)
+        self.datas.insert(posicao, data)
+        self.chaves.insert(posicao, chave)
+
+    def _retirar(self, data, chave):
+        for posicao in range(bisect_left(self.datas, data), bisect_right(self.datas, data)):
+            if self.chaves[posicao] == chave:
+                del self.datas[posicao]
+                del self.chaves[posicao]
+                return
+
+    def exportar(self):
+        """Pares [data, chave] em ordem (para gravar em JSON)"""
+        return [[data, chave] for data, chave in zip(self.datas, self.chaves)]
+
+    def incorporar(self, pares, sinal=1):
+        """Soma (sinal 1) ou retira (sinal -1) os pares de outro índice exportado"""
+        if len(pares) < 16:
+            for data, chave in pares:
+                if sinal < 0:
+                    self._retirar(data, chave)
+                else:
+                    self._inserir(data, chave)
+            return
+        if sinal < 0:
+            # Muitos pares: uma passada retirando cada par uma vez, sem deslocar a lista a cada um
+            retirar = Counter(map(tuple, pares))
+            entradas = []
+            for entrada in zip(self.datas, self.chaves):
+                if retirar[entrada]:
+                    retirar[entrada] -= 1
+                else:
+                    entradas.append(entrada)
+            self.datas = [data for data, _ in entradas]
+            self.chaves = [chave for _, chave in entradas]
+            return
+        # Muitos pares: junta e ordena de uma vez (sort estável, os atuais vêm antes nos empates)
+        entradas = sorted([*zip(self.datas, self.chaves), *map(tuple, pares)], key=lambda entrada: entrada[0])
+        self.datas = [data for data, _ in entradas]
+        self.chaves = [chave for _, chave in entradas]
+
+    def substituir(self, chave, antigo, novo):
+        if self._data(antigo) != self._data(novo):
+            self.remover(chave, antigo)
+            self.adicionar(chave, novo)
+
+    def vencidas(self, hoje):
+        """Quantidade de garantias anteriores a hoje ('AAAA-MM-DD')"""
+        return bisect_left(self.datas, hoje)
+
+    def vigentes(self, hoje):
+        return len(self.datas) - self.vencidas(hoje)
+
+    def entre(self, inicio, fim):
+        """Pares (data, chave) com garantia de inicio até fim (inclusive), por data"""
+        primeiro, ultimo = bisect_left(self.datas, inicio), bisect_right(self.datas, fim)
+        return list(zip(self.datas[primeiro:ultimo], self.chaves[primeiro:ultimo]))
+
+    def __len__(self):
+        return len(self.datas)
@@ -0,0 +1,184 @@
+# metricas.py - CONTADORES, HISTOGRAMAS E PERFIL DAS REQUISIÇÕES
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+# Limites dos baldes (segundos), no estilo do cliente Prometheus
+BALDES = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histograma:
+    """Contagem por balde, soma e total de observações"""
+
+    def __init__(self):
+        self.baldes = [0] * len(BALDES)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        for posicao, limite in enumerate(BALDES):
+            if valor <= limite:
+                self.baldes[posicao] += 1
+                break
+        self.soma += valor
+        self.total += 1
+
+
+def _rotulos(rotulos):
+    def escapar(valor):
+        return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{nome}="{escapar(valor)}"' for nome, valor in rotulos)
+
+
+class Metricas:
+    """Registro das métricas do processo, exportadas em formato texto do Prometheus.
+
+    - frota_requisicoes_total: contador por método, rota e status
+    - frota_requisicao_duracao_segundos: histograma por método e rota
+    - frota_secao_duracao_segundos: histograma por seção (carregar, filtrar,
+      agregar, serializar, gravar)
+    - frota_escrita_lotes_total / frota_escrita_alteracoes_total: lotes da
+      fila de escrita e alterações gravadas neles (a razão é o tamanho médio)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        self.requisicoes = {}
+        self.duracoes = {}
+        self.secoes = {}
+        self.lotes_escrita = 0
+        self.alteracoes_escrita = 0
+
+    def registrar_requisicao(self, metodo, rota, status, duracao):
+        with self._lock:
+            chave = (metodo, rota, status)
+            self.requisicoes[chave] = self.requisicoes.get(chave, 0) + 1
+            self.duracoes.setdefault((metodo, rota), Histograma()).observar(duracao)
+
+    def registrar_secao(self, secao, duracao):
+        with self._lock:
+            self.secoes.setdefault((secao,), Histograma()).observar(duracao)
+
+    def registrar_lote_escrita(self, alteracoes):
+        with self._lock:
+            self.lotes_escrita += 1
+            self.alteracoes_escrita += alteracoes
+
+    def _histogramas(self, nome, ajuda, histogramas, nomes_rotulos):
+        linhas = [f'# HELP {nome} {ajuda}', f'# TYPE {nome} histogram']
+        for chave, histograma in sorted(histogramas.items()):
+            rotulos = list(zip(nomes_rotulos, chave))
+            acumulado = 0
+            for limite, quantidade in zip(BALDES, histograma.baldes):
+                acumulado += quantidade
+                linhas.append(f'{nome}_bucket{{{_rotulos(rotulos + [("le", limite)])}}} {acumulado}')
+            linhas.append(f'{nome}_bucket{{{_rotulos(rotulos + [("le", "+Inf")])}}} {histograma.total}')
+            linhas.append(f'{nome}_sum{{{_rotulos(rotulos)}}} {histograma.soma}')
+            linhas.append(f'{nome}_count{{{_rotulos(rotulos)}}} {histograma.total}')
+        return linhas
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+        with self._lock:
+            linhas = [
+                '# HELP frota_requisicoes_total Requisições atendidas por método, rota e status',
+                '# TYPE frota_requisicoes_total counter'
+            ]
+            for (metodo, rota, status), quantidade in sorted(self.requisicoes.items()):
+                rotulos = _rotulos([('metodo', metodo), ('rota', rota), ('status', status)])
+                linhas.append(f'frota_requisicoes_total{{{rotulos}}} {quantidade}')
+            linhas += self._histogramas('frota_requisicao_duracao_segundos', 'Duração das requisições',
+                                        self.duracoes, ('metodo', 'rota'))
+            linhas += self._histogramas('frota_secao_duracao_segundos',
+                                        'Duração das seções internas (carregar, filtrar, agregar, serializar, gravar)',
+                                        self.secoes, ('secao',))
+            linhas += [
+                '# HELP frota_escrita_lotes_total Lotes gravados pela fila de escrita',
+                '# TYPE frota_escrita_lotes_total counter',
+                f'frota_escrita_lotes_total {self.lotes_escrita}',
+                '# HELP frota_escrita_alteracoes_total Alterações gravadas pela fila de escrita',
+                '# TYPE frota_escrita_alteracoes_total counter',
+                f'frota_escrita_alteracoes_total {self.alteracoes_escrita}'
+            ]
+        return '\n'.join(linhas) + '\n'
+
+
+# Instância única usada pelo app e pelos repositórios
+metricas = Metricas()
+
+
+@contextmanager
+def medir(secao):
+    """Cronometra um trecho: with medir('filtrar'): ..."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        metricas.registrar_secao(secao, time.perf_counter() - inicio)
+
+
+def medido(secao):
+    """Decorador equivalente a medir() para o método inteiro"""
+    def decorador(funcao):
+        @wraps(funcao)
+        def cronometrada(*args, **kwargs):
+            with medir(secao):
+                return funcao(*args, **kwargs)
+        return cronometrada
+    return decorador
+
+
+class Perfilador:
+    """cProfile opcional por requisição.
+
+    Só um perfil roda por vez (o cProfile não aceita dois ativos); as demais
+    requisições seguem sem perfil. O resultado é gravado em .pstats e as
+    funções mais caras vão para o stderr (não para a saída do app) quando a
+    requisição passa do limite.
+    """
+
+    def __init__(self, pasta, limite_ms=500, amostra=1.0):
+        self.pasta = pasta
+        self.limite = limite_ms / 1000
+        self.amostra = amostra
+        self._ocupado = threading.Lock()
+
+    def iniciar(self):
+        """Devolve o profiler ativo, ou None se já houver outro rodando"""
+        if not self._ocupado.acquire(blocking=False):
+            return None
+        # Importado só com o perfil ligado (FROTA_PERFIL=1): não pesa no início do app
+        import cProfile
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Outra ferramenta de profiling já está ativa
+            self._ocupado.release()
+            return None
+        return perfil
+
+    def finalizar(self, perfil, rota, duracao, forcar=False):
+        """Para o profiler; grava o .pstats se a requisição foi lenta (ou forçada)"""
+        perfil.disable()
+        try:
+            if not forcar and duracao < self.limite:
+                return None
+            os.makedirs(self.pasta, exist_ok=True)
+            nome = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}{re.sub(r'[^A-Za-z0-9]+', '_', rota)}.pstats"
+            caminho = os.path.join(self.pasta, nome)
+            perfil.dump_stats(caminho)
+            print(f"🐢 {rota} levou {duracao * 1000:.1f} ms, perfil gravado em {caminho}", file=sys.stderr)
+            import pstats
+            pstats.Stats(perfil, stream=sys.stderr).sort_stats('cumulative').print_stats(15)
+            return caminho
+        finally:
+            self._ocupado.release()
@@ -0,0 +1,258 @@
+# modelos.py - MODELO DOS REGISTROS EM MEMÓRIA (Gasto e Diaria)
+import math
+import sys
+from collections.abc import Mapping
+from operator import attrgetter
+
+from calculos import TIPOS_MANUTENCAO, normalizar_data_garantia
+from codificacao import codificar
+
+
+class _Ausente:
+    """Marca um campo que não existe no registro (diferente de um campo null)"""
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return 'AUSENTE'
+
+    def __reduce__(self):
+        # No pickle (ver imagem.py) volta como o mesmo objeto: compara-se com `is`
+        return 'AUSENTE'
+
+
+AUSENTE = _Ausente()
+
+
+def presente_ou(valor, padrao):
+    """Valor lido direto do slot, ou padrao se o campo não existe (como dict.get)"""
+    return padrao if valor is AUSENTE else valor
+
+
+def _texto(valor):
+    """Textos que se repetem (veículo, placa, tipo...) ficam em uma cópia só na memória"""
+    return sys.intern(valor) if type(valor) is str else valor
+
+
+def _numero(valor):
+    """float de um valor numérico ou texto numérico ('350.5'); None se não for"""
+    if type(valor) is float:
+        return valor if math.isfinite(valor) else None
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return numero if math.isfinite(numero) else None
+
+
+class Registro(Mapping):
+    """Base de Gasto e Diaria: os campos conhecidos ficam em slots, o resto em 'extras'.
+
+    Lido como um dicionário somente leitura com as chaves do JSON (get, [],
+    in, items, {**registro}), então rotas, filtros e exportação continuam
+    iguais; para_dict() devolve o formato gravado. Como os dicionários de
+    antes, um registro nunca é alterado: alterar() cria outro.
+
+    Os valores (valor, valor_total) viram float na criação. Um valor que não
+    é número conta como 0.0 nos cálculos, mas o original continua em 'extras'
+    e volta assim no JSON.
+
+    Sendo imutável, o registro guarda o próprio JSON depois da primeira
+    codificação (ver json()): listagens e a gravação do arquivo inteiro só
+    codificam os registros novos ou alterados.
+    """
+
+    __slots__ = ('extras', '_json')
+    CAMPOS = ()
+    _CAMPOS = frozenset()
+    _ler_campos = staticmethod(lambda registro: ())
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._CAMPOS = frozenset(cls.CAMPOS)
+        cls._ler_campos = attrgetter(*cls.CAMPOS)
+        cls._SLOTS = tuple(slot for classe in reversed(cls.__mro__) for slot in classe.__dict__.get('__slots__', ()))
+
+    def __init__(self, dados):
+        self.extras = None
+        self._json = None
+        if not self._CAMPOS.issuperset(dados):
+            self.extras = {campo: valor for campo, valor in dados.items() if campo not in self._CAMPOS}
+        self._preencher(dados.get)
+
+    def _preencher(self, obter):
+        """Preenche os slots (obter: dados.get) e os campos calculados uma vez só"""
+
+    def _numero(self, campo, original):
+        numero = _numero(original)
+        if numero is None:
+            # Ausente ou inválido: o original (ou a ausência) fica registrado em extras
+            if self.extras is None:
+                self.extras = {}
+            self.extras[campo] = original
+            return 0.0
+        return numero
+
+    # ------------------------------------
+    # Leitura como dicionário
+    # ------------------------------------
+    def get(self, campo, padrao=None):
+        extras = self.extras
+        if extras is not None and campo in extras:
+            valor = extras[campo]
+        elif campo in self._CAMPOS:
+            valor = getattr(self, campo)
+        else:
+            return padrao
+        return padrao if valor is AUSENTE else valor
+
+    def __getitem__(self, campo):
+        valor = self.get(campo, AUSENTE)
+        if valor is AUSENTE:
+            raise KeyError(campo)
+        return valor
+
+    def __contains__(self, campo):
+        return self.get(campo, AUSENTE) is not AUSENTE
+
+    def __iter__(self):
+        return iter(self.para_dict())
+
+    # Mais rápidos que as visões genéricas de Mapping (ex: csv.DictWriter usa keys())
+    def keys(self):
+        return self.para_dict().keys()
+
+    def items(self):
+        return self.para_dict().items()
+
+    def values(self):
+        return self.para_dict().values()
+
+    def __len__(self):
+        return len(self.para_dict())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.para_dict()!r})"
+
+    def para_dict(self):
+        """O registro no formato do JSON (campos conhecidos primeiro, depois os extras)"""
+        dados = {campo: valor for campo, valor in zip(self.CAMPOS, self._ler_campos(self)) if valor is not AUSENTE}
+        if self.extras:
+            for campo, valor in self.extras.items():
+                if valor is AUSENTE:
+                    dados.pop(campo, None)
+                else:
+                    dados[campo] = valor
+        return dados
+
+    def json(self):
+        """JSON do registro em bytes (chaves em ordem, como nas respostas da API)"""
+        if self._json is None:
+            self._json = codificar(self.para_dict(), ordenar=True)
+        return self._json
+
+    def __getstate__(self):
+        # Imagem (ver imagem.py): o JSON guardado fica de fora e é refeito quando pedido
+        estado = {slot: getattr(self, slot) for slot in self._SLOTS}
+        estado['_json'] = None
+        return None, estado
+
+    def alterar(self, atualizacoes):
+        """Novo registro com as atualizações mescladas (este não muda)"""
+        return type(self)({**self.para_dict(), **atualizacoes})
+
+
+def _periodo(data):
+    """(ano, mês, ano-mês) de 'AAAA-MM-DD'; None para data vazia ou que não é texto"""
+    if not data or type(data) is not str:
+        return None, None, None
+    return _texto(data[:4]), _texto(data[5:7]), _texto(data[:7])
+
+
+class Gasto(Registro):
+    """Gasto da frota.
+
+    Calculados na criação: ano, mes e ano_mes da data; garantia (validade
+    normalizada 'AAAA-MM-DD' ou None) e servico (tipo de manutenção).
+    """
+
+    CAMPOS = ('id', 'data', 'veiculo', 'placa', 'motorista', 'tipo_gasto', 'valor', 'nf_numero',
+              'os_numero', 'garantia_validade', 'status_garantia', 'observacoes', 'data_registro')
+    __slots__ = CAMPOS + ('ano', 'mes', 'ano_mes', 'garantia', 'servico')
+
+    def _preencher(self, obter):
+        self.id = obter('id', AUSENTE)
+        self.data = data = obter('data', AUSENTE)
+        self.veiculo = _texto(obter('veiculo', AUSENTE))
+        self.placa = _texto(obter('placa', AUSENTE))
+        self.motorista = _texto(obter('motorista', AUSENTE))
+        self.tipo_gasto = tipo = _texto(obter('tipo_gasto', AUSENTE))
+        self.valor = self._numero('valor', obter('valor', AUSENTE))
+        self.nf_numero = obter('nf_numero', AUSENTE)
+        self.os_numero = obter('os_numero', AUSENTE)
+        self.garantia_validade = validade = _texto(obter('garantia_validade', AUSENTE))
+        self.status_garantia = _texto(obter('status_garantia', AUSENTE))
+        self.observacoes = obter('observacoes', AUSENTE)
+        self.data_registro = obter('data_registro', AUSENTE)
+        self.ano, self.mes, self.ano_mes = _periodo(data)
+        self.servico = type(tipo) is str and tipo.lower() in TIPOS_MANUTENCAO
+        self.garantia = normalizar_data_garantia(validade) if validade else None
+
+    def status_garantia_em(self, hoje):
+        """Mesmo resultado de calcular_status_garantia(garantia_validade, hoje), sem reler a data"""
+        if not self.garantia_validade:
+            return 'Sem Data'
+        if self.garantia is None:
+            return 'Data Inválida'
+        return 'Vencida' if self.garantia < hoje else 'Vigente'
+
+
+class Diaria(Registro):
+    """Diária de motorista. Calculado na criação: ano_mes de data_inicio."""
+
+    CAMPOS = ('id', 'motorista', 'data_inicio', 'data_fim', 'dias_uteis', 'valor_diaria_unitaria',
+              'valor_total', 'observacoes', 'data_registro')
+    __slots__ = CAMPOS + ('ano_mes',)
+
+    def _preencher(self, obter):
+        self.id = obter('id', AUSENTE)
+        self.motorista = _texto(obter('motorista', AUSENTE))
+        self.data_inicio = data_inicio = obter('data_inicio', AUSENTE)
+        self.data_fim = obter('data_fim', AUSENTE)
+        self.dias_uteis = obter('dias_uteis', AUSENTE)
+        self.valor_diaria_unitaria = obter('valor_diaria_unitaria', AUSENTE)
+        self.valor_total = self._numero('valor_total', obter('valor_total', AUSENTE))
+        self.observacoes = obter('observacoes', AUSENTE)
+        self.data_registro = obter('data_registro', AUSENTE)
+        self.ano_mes = _periodo(data_inicio)[2]
+
+
+def como_gasto(registro):
+    """Gasto a partir de um dicionário (um Gasto volta como está)"""
+    return registro if isinstance(registro, Gasto) else Gasto(registro)
+
+
+def como_diaria(registro):
+    return registro if isinstance(registro, Diaria) else Diaria(registro)
+
+
+def como_dict(registro):
+    """Dicionário comum com os campos do registro (um dicionário volta como está)"""
+    return registro.para_dict() if isinstance(registro, Registro) else registro
+
+
+def json_registros(registros):
+    """JSON de cada registro (bytes), para montar listas sem recodificar os já codificados.
+
+    Cópias em dicionário (ex: serviços com o status completado pela rota)
+    são codificadas na hora.
+    """
+    return [r.json() if isinstance(r, Registro) else codificar(r, ordenar=True) for r in registros]
+
+
+def json_dados(gastos, diarias):
+    """O arquivo de dados inteiro ({"gastos": [...], "diarias": [...]}) em bytes"""
+    return b''.join((b'{"gastos":[', b','.join(json_registros(gastos)),
+                     b'],"diarias":[', b','.join(json_registros(diarias)), b']}'))
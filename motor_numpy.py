@@ -0,0 +1,176 @@
+# motor_numpy.py - ANÁLISE COLUNAR COM NUMPY (opcional)
+import numpy as np
+
+from calculos import aplicar_filtros, arredondar_valores, calcular_analise_gastos, normalizar_filtros
+from modelos import AUSENTE, presente_ou
+
+# Agrupamentos da análise: campo -> rótulo usado quando o campo não existe
+# (os mesmos padrões de calcular_analise_gastos)
+AGRUPAMENTOS = {'tipo_gasto': 'Outros', 'veiculo': 'Não Informado', 'placa': 'Sem Placa'}
+CAMPOS_FILTRO = ('veiculo', 'placa', 'motorista')
+
+
+class Categorias:
+    """Valor -> código inteiro, na ordem em que os valores aparecem"""
+
+    def __init__(self):
+        self.codigos = {}
+        self.valores = []
+
+    def codigo(self, valor):
+        codigo = self.codigos.get(valor)
+        if codigo is None:
+            codigo = self.codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+
+class MotorNumpy:
+    """Motor 'numpy': gastos em colunas para a análise com filtros.
+
+    - valor: float64
+    - tipo_gasto, veiculo, placa, motorista, ano, mês e ano-mês: códigos int32
+      de categorias (-1 quando o gasto não tem data)
+
+    Filtros viram máscaras booleanas e os agrupamentos usam np.bincount, que
+    soma na ordem das linhas. Como as linhas seguem a ordem de registro (a
+    alteração reescreve a própria linha), os totais são os mesmos floats de
+    calcular_analise_gastos. Registros que as colunas não representam (ex:
+    um campo com uma lista) fazem as consultas voltarem ao cálculo em Python.
+    """
+
+    CAPACIDADE_INICIAL = 1024
+
+    def __init__(self):
+        self.reconstruir([])
+
+    # ------------------------------------
+    # Montagem das colunas
+    # ------------------------------------
+    def reconstruir(self, itens):
+        """Recria as colunas a partir de pares (chave, gasto), na ordem de registro"""
+        itens = list(itens)
+        self._categorias = {
+            campo: Categorias()
+            for campo in ('tipo_gasto', 'veiculo', 'placa', 'motorista', 'ano', 'mes', 'ano_mes')
+        }
+        self._linhas = {}
+        self._registros = []
+        self._tamanho = 0
+        self._removidas = 0
+        self._colunas = {}
+        self._alocar(max(self.CAPACIDADE_INICIAL, len(itens)))
+        for chave, gasto in itens:
+            self.adicionar(chave, gasto)
+
+    def _alocar(self, capacidade):
+        tipos = {'valor': np.float64, 'vivo': np.bool_, 'irregular': np.bool_}
+        tipos.update({campo: np.int32 for campo in self._categorias})
+        tipos.update({f'ausente_{campo}': np.bool_ for campo in CAMPOS_FILTRO})
+        colunas = {}
+        for nome, tipo in tipos.items():
+            coluna = np.zeros(capacidade, dtype=tipo)
+            if nome in self._colunas:
+                coluna[:self._tamanho] = self._colunas[nome][:self._tamanho]
+            colunas[nome] = coluna
+        self._colunas = colunas
+        self._capacidade = capacidade
+
+    def _preencher(self, linha, gasto):
+        colunas = self._colunas
+        irregular = False
+        # Valor já em float e data já separada no modelo (ver modelos.Gasto)
+        colunas['valor'][linha] = gasto.valor
+        try:
+            for campo, padrao in AGRUPAMENTOS.items():
+                colunas[campo][linha] = self._categorias[campo].codigo(presente_ou(getattr(gasto, campo), padrao))
+            colunas['motorista'][linha] = self._categorias['motorista'].codigo(presente_ou(gasto.motorista, None))
+            if gasto.ano is not None:
+                colunas['ano'][linha] = self._categorias['ano'].codigo(gasto.ano)
+                colunas['mes'][linha] = self._categorias['mes'].codigo(gasto.mes)
+                colunas['ano_mes'][linha] = self._categorias['ano_mes'].codigo(gasto.ano_mes)
+            else:
+                colunas['ano'][linha] = colunas['mes'][linha] = colunas['ano_mes'][linha] = -1
+        except TypeError:
+            # Campo com valor não hashable (ex: lista)
+            irregular = True
+        for campo in CAMPOS_FILTRO:
+            valor = getattr(gasto, campo)
+            colunas[f'ausente_{campo}'][linha] = valor is None or valor is AUSENTE
+        colunas['irregular'][linha] = irregular
+        colunas['vivo'][linha] = True
+        self._registros[linha] = gasto
+
+    def adicionar(self, chave, gasto):
+        if self._tamanho == self._capacidade:
+            self._alocar(self._capacidade * 2)
+        linha = self._tamanho
+        self._tamanho += 1
+        self._registros.append(None)
+        self._linhas[chave] = linha
+        self._preencher(linha, gasto)
+
+    def atualizar(self, chave, gasto):
+        """Reescreve a linha do gasto, que mantém sua posição"""
+        self._preencher(self._linhas[chave], gasto)
+
+    def remover(self, chave):
+        linha = self._linhas.pop(chave)
+        self._colunas['vivo'][linha] = False
+        self._registros[linha] = None
+        self._removidas += 1
+        # Muitas linhas mortas: reescreve as colunas só com as vivas
+        if self._removidas * 2 > self._tamanho > self.CAPACIDADE_INICIAL:
+            vivas = sorted(self._linhas.items(), key=lambda item: item[1])
+            self.reconstruir((chave, self._registros[linha]) for chave, linha in vivas)
+
+    # ------------------------------------
+    # Consulta
+    # ------------------------------------
+    def _codigo(self, campo, valor):
+        return self._categorias[campo].codigos.get(valor, -2)
+
+    def _mascara(self, filtros):
+        n = self._tamanho
+        colunas = self._colunas
+        mascara = colunas['vivo'][:n].copy()
+        for campo in CAMPOS_FILTRO:
+            if filtros.get(campo):
+                # Gastos sem o campo não passam (o rótulo padrão só vale no agrupamento)
+                mascara &= colunas[campo][:n] == self._codigo(campo, filtros[campo])
+                mascara &= ~colunas[f'ausente_{campo}'][:n]
+        if filtros.get('ano') or filtros.get('mes'):
+            periodo = np.ones(n, dtype=np.bool_)
+            for campo in ('ano', 'mes'):
+                if filtros.get(campo):
+                    periodo &= colunas[campo][:n] == self._codigo(campo, filtros[campo])
+            # Gastos sem data passam pelos filtros de ano/mês (ver aplicar_filtros)
+            mascara &= periodo | (colunas['ano_mes'][:n] < 0)
+        return mascara
+
+    def _agrupar(self, campo, linhas, valores):
+        codigos = self._colunas[campo][linhas]
+        if campo == 'ano_mes':
+            com_data = codigos >= 0
+            codigos, valores = codigos[com_data], valores[com_data]
+        if not len(codigos):
+            return {}
+        somas = np.bincount(codigos, weights=valores)
+        presentes = np.flatnonzero(np.bincount(codigos))
+        rotulos = self._categorias[campo].valores
+        return {rotulos[codigo]: float(somas[codigo]) for codigo in presentes}
+
+    def analise(self, filtros):
+        """Mesmo resultado de calcular_analise_gastos(aplicar_filtros(gastos, filtros))"""
+        n = self._tamanho
+        if (self._colunas['irregular'][:n] & self._colunas['vivo'][:n]).any():
+            gastos = [self._registros[linha] for linha in np.flatnonzero(self._colunas['vivo'][:n])]
+            return calcular_analise_gastos(aplicar_filtros(gastos, filtros))
+        linhas = np.flatnonzero(self._mascara(normalizar_filtros(filtros)))
+        valores = self._colunas['valor'][linhas]
+        return {
+            'por_tipo': arredondar_valores(self._agrupar('tipo_gasto', linhas, valores)),
+            'por_veiculo': arredondar_valores(self._agrupar('veiculo', linhas, valores)),
+            'por_placa': arredondar_valores(self._agrupar('placa', linhas, valores)),
+            'mensal': arredondar_valores(self._agrupar('ano_mes', linhas, valores), ordenar=True)
+        }
@@ -0,0 +1,344 @@
+# persistencia.py - ESTRATÉGIAS DE GRAVAÇÃO EM DISCO
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from codificacao import codificar, decodificar
+
+
+def _assinatura(caminho):
+    """Identifica a versão de um arquivo em disco (mtime + tamanho)"""
+    try:
+        info = os.stat(caminho)
+        return (info.st_mtime_ns, info.st_size)
+    except OSError:
+        return None
+
+
+class TravaArquivo:
+    """Trava exclusiva entre processos, sobre um arquivo <dados>.lock.
+
+    Usa flock (Linux/macOS) ou msvcrt.locking (Windows). Dentro do processo é
+    reentrante: a mesma thread pode entrar de novo sem travar a si mesma.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.RLock()
+        self._profundidade = 0
+        self._arquivo = None
+
+    def _travar(self):
+        if self._arquivo is None:
+            self._arquivo = open(self.caminho, 'a+')
+        if fcntl is not None:
+            fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_EX)
+            return
+        self._arquivo.seek(0)
+        while True:
+            try:
+                msvcrt.locking(self._arquivo.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK desiste depois de ~10 s; continua esperando
+                continue
+
+    def _destravar(self):
+        if fcntl is not None:
+            fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_UN)
+        else:
+            self._arquivo.seek(0)
+            msvcrt.locking(self._arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._profundidade == 0:
+            try:
+                self._travar()
+            except BaseException:
+                self._lock.release()
+                raise
+        self._profundidade += 1
+        return self
+
+    def __exit__(self, *erro):
+        self._profundidade -= 1
+        try:
+            if self._profundidade == 0:
+                self._destravar()
+        finally:
+            self._lock.release()
+
+
+def gravar_json_atomico(caminho, dados):
+    """Grava o JSON em um arquivo temporário e troca pelo definitivo com rename.
+
+    Uma queda no meio da gravação deixa o arquivo antigo intacto. O JSON é
+    compacto (sem indentação): com dezenas de milhares de registros, a
+    indentação dobrava o tamanho do arquivo e o tempo de cada gravação.
+    dados pode vir já codificado em bytes (ver repositorio._json_dados).
+    """
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'wb') as f:
+        f.write(dados if isinstance(dados, bytes) else codificar(dados))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+
+def reaplicar_journal(dados, mutacoes):
+    """Aplica os registros do journal sobre os dados.
+
+    As operações são idempotentes ('gravar' substitui o registro inteiro pelo id,
+    'excluir' ignora ids inexistentes), então reaplicar o journal sobre um
+    snapshot que já o contém não duplica nada.
+    """
+    # dict preserva a ordem de inserção: atualizar mantém a posição do registro
+    por_entidade = {}
+    for entidade in ('gastos', 'diarias'):
+        lista = dados.get(entidade, [])
+        por_entidade[entidade] = {r.get('id', ('sem-id', i)): r for i, r in enumerate(lista)}
+    for mutacao in mutacoes:
+        registros = por_entidade.setdefault(mutacao['entidade'], {})
+        if mutacao['op'] == 'gravar':
+            registros[mutacao['registro'].get('id')] = mutacao['registro']
+        elif mutacao['op'] == 'excluir':
+            registros.pop(mutacao['id'], None)
+    for entidade, registros in por_entidade.items():
+        dados[entidade] = list(registros.values())
+    return dados
+
+
+class PersistenciaArquivo:
+    """Modo padrão: regrava o documento JSON inteiro a cada alteração"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        # Quem grava (o repositório ou a compactação) segura a trava entre processos
+        self.trava = TravaArquivo(f"{caminho}.lock")
+
+    def assinatura(self):
+        return _assinatura(self.caminho)
+
+    def arquivos(self):
+        """Arquivos de onde os dados são lidos (ver imagem.py)"""
+        return [self.caminho]
+
+    def carregar(self):
+        """Lê o snapshot. Retorna None se o arquivo não existir."""
+        if not os.path.exists(self.caminho):
+            return None
+        with open(self.caminho, 'rb') as f:
+            return decodificar(f.read())
+
+    def iniciar(self, lock, obter_dados, ao_compactar):
+        """Chamado pelo repositório depois da carga inicial"""
+
+    def registrar(self, mutacoes, obter_dados):
+        """Grava uma lista de alterações (uma única escrita para o lote todo)"""
+        gravar_json_atomico(self.caminho, obter_dados())
+
+    def gravar_snapshot(self, dados):
+        gravar_json_atomico(self.caminho, dados)
+
+    def fechar(self):
+        pass
+
+
+class PersistenciaJournal(PersistenciaArquivo):
+    """Acrescenta cada alteração como uma linha JSON em um journal.
+
+    - O fsync é feito em lote: a cada LOTE_FSYNC registros ou INTERVALO_FSYNC
+      segundos, o que vier primeiro.
+    - Na carga, o journal é reaplicado sobre o último snapshot.
+    - Uma thread de compactação grava um novo snapshot (temp + rename) quando o
+      journal passa de LIMITE_COMPACTACAO registros e então o descarta.
+    """
+
+    LOTE_FSYNC = 32
+    INTERVALO_FSYNC = 0.2
+    LIMITE_COMPACTACAO = 1000
+
+    def __init__(self, caminho):
+        super().__init__(caminho)
+        self.caminho_journal = f"{caminho}.journal"
+        # Journal antigo, congelado enquanto a compactação grava o snapshot
+        self.caminho_compactando = f"{caminho}.journal.compactando"
+        self._lock_arquivo = threading.Lock()
+        self._arquivo = None
+        self._registros = 0
+        self._pendentes_fsync = 0
+        self._sinal = threading.Event()
+        self._parar = threading.Event()
+        self._lock_repositorio = None
+        self._obter_dados = None
+        self._ao_compactar = None
+        self._thread = None
+
+    def assinatura(self):
+        return (_assinatura(self.caminho), _assinatura(self.caminho_journal))
+
+    def arquivos(self):
+        return [self.caminho, self.caminho_compactando, self.caminho_journal]
+
+    def _ler_journal(self, caminho):
+        """Lê os registros de um journal (vazio se o arquivo não existir)"""
+        mutacoes = []
+        if not os.path.exists(caminho):
+            return mutacoes
+        with open(caminho, 'rb') as f:
+            for linha in f:
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    mutacao = decodificar(linha)
+                except json.JSONDecodeError:
+                    # Última linha truncada por uma queda: o resto é descartado
+                    print(f"⚠️ Registro incompleto ignorado no journal {caminho}")
+                    break
+                mutacoes.append(mutacao)
+        return mutacoes
+
+    def carregar(self):
+        dados = super().carregar()
+        possui_journal = os.path.exists(self.caminho_journal) or os.path.exists(self.caminho_compactando)
+        if dados is None and not possui_journal:
+            return None
+        dados = dados or {'gastos': [], 'diarias': []}
+        with self._lock_arquivo:
+            congeladas = self._ler_journal(self.caminho_compactando)
+            mutacoes = self._ler_journal(self.caminho_journal)
+            reaplicar_journal(dados, congeladas + mutacoes)
+            self._registros = len(mutacoes)
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+        return dados
+
+    def iniciar(self, lock, obter_dados, ao_compactar):
+        self._lock_repositorio = lock
+        self._obter_dados = obter_dados
+        self._ao_compactar = ao_compactar
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name='journal-frota', daemon=True)
+            self._thread.start()
+            atexit.register(self.fechar)
+        if self._precisa_compactar():
+            self._sinal.set()
+
+    def _precisa_compactar(self):
+        return self._registros >= self.LIMITE_COMPACTACAO or os.path.exists(self.caminho_compactando)
+
+    def registrar(self, mutacoes, obter_dados):
+        linhas = b''.join(codificar(mutacao) + b'\n' for mutacao in mutacoes)
+        with self._lock_arquivo:
+            if self._arquivo is None:
+                self._arquivo = open(self.caminho_journal, 'ab')
+            self._arquivo.write(linhas)
+            self._arquivo.flush()
+            self._registros += len(mutacoes)
+            self._pendentes_fsync += len(mutacoes)
+            if self._pendentes_fsync >= self.LOTE_FSYNC:
+                self._fsync()
+        if self._pendentes_fsync or self._registros >= self.LIMITE_COMPACTACAO:
+            self._sinal.set()
+
+    def _fsync(self):
+        if self._arquivo is not None and self._pendentes_fsync:
+            os.fsync(self._arquivo.fileno())
+            self._pendentes_fsync = 0
+
+    def _executar(self):
+        """Thread de fundo: fsync em lote e compactação periódica"""
+        while not self._parar.is_set():
+            self._sinal.wait(self.INTERVALO_FSYNC)
+            self._sinal.clear()
+            # Pequena espera para agrupar as alterações que chegarem juntas
+            time.sleep(self.INTERVALO_FSYNC)
+            with self._lock_arquivo:
+                self._fsync()
+            if self._precisa_compactar():
+                try:
+                    self.compactar()
+                except Exception as e:
+                    print(f"Erro ao compactar journal: {e}")
+
+    def compactar(self):
+        """Incorpora o journal em um novo snapshot gravado atomicamente"""
+        # A trava entre processos fica com a compactação até o fim: nenhum outro
+        # processo grava no journal enquanto o snapshot novo é montado
+        with self.trava:
+            self._compactar()
+
+    def _compactar(self):
+        # Sob o lock do repositório: monta o JSON dos dados (já sincronizados com o
+        # disco) e congela o journal atual. Novas alterações deste processo
+        # passam a ir para um journal novo.
+        with self._lock_repositorio:
+            dados = self._obter_dados()
+            with self._lock_arquivo:
+                self._fsync()
+                if self._arquivo is not None:
+                    self._arquivo.close()
+                    self._arquivo = None
+                if os.path.exists(self.caminho_journal):
+                    if os.path.exists(self.caminho_compactando):
+                        # Sobra de uma compactação interrompida: junta os dois journals
+                        with open(self.caminho_compactando, 'ab') as destino, \
+                                open(self.caminho_journal, 'rb') as origem:
+                            shutil.copyfileobj(origem, destino)
+                        os.remove(self.caminho_journal)
+                    else:
+                        os.replace(self.caminho_journal, self.caminho_compactando)
+                self._registros = 0
+        gravar_json_atomico(self.caminho, dados)
+        if os.path.exists(self.caminho_compactando):
+            os.remove(self.caminho_compactando)
+        # O snapshot novo foi gravado por este processo: não é alteração externa
+        with self._lock_repositorio:
+            self._ao_compactar()
+        print(f"🗜️ Journal compactado em {self.caminho}")
+
+    def gravar_snapshot(self, dados):
+        with self._lock_arquivo:
+            gravar_json_atomico(self.caminho, dados)
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+            for caminho in (self.caminho_journal, self.caminho_compactando):
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+            self._registros = 0
+            self._pendentes_fsync = 0
+
+    def fechar(self):
+        self._parar.set()
+        self._sinal.set()
+        with self._lock_arquivo:
+            self._fsync()
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+
+
+MODOS_PERSISTENCIA = {
+    'arquivo': PersistenciaArquivo,
+    'journal': PersistenciaJournal,
+}
+
+
+def criar_persistencia(modo, caminho):
+    """Cria a estratégia de persistência configurada ('arquivo' ou 'journal')"""
+    if modo not in MODOS_PERSISTENCIA:
+        raise ValueError(f"Modo de persistência inválido: {modo}")
+    return MODOS_PERSISTENCIA[modo](caminho)
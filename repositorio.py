@@ -0,0 +1,543 @@
+# repositorio.py - CAMADA DE DADOS EM MEMÓRIA
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+
+import imagem
+from agregados import AgregadosFrota
+from cache_analise import CacheAnalise, chave_filtros
+from calculos import calcular_analise_gastos, ordenar_registros
+from escritor import EscritorUnico
+from indices import IndiceGastos
+from metricas import medir
+from modelos import Diaria, Gasto, como_diaria, como_gasto, json_dados
+from persistencia import PersistenciaArquivo
+from tendencias import calcular_tendencias
+
+
+MOTORES_ANALISE = ('python', 'numpy')
+
+
+def criar_motor_analise(nome):
+    """Motor da análise com filtros: 'python' (None) ou 'numpy' (colunar, opcional)"""
+    if nome not in MOTORES_ANALISE:
+        raise ValueError(f"Motor de análise inválido: {nome}. Use: {', '.join(MOTORES_ANALISE)}")
+    if nome == 'python':
+        return None
+    try:
+        from motor_numpy import MotorNumpy
+    except ImportError:
+        print("⚠️ NumPy não está instalado, usando o motor de análise 'python'")
+        return None
+    return MotorNumpy()
+
+
+def _indexar_por_id(registros):
+    """Monta o dicionário id -> registro, preservando a ordem da lista.
+
+    Registros sem id ou com id repetido continuam guardados (e gravados), só
+    que sob uma chave própria, inacessível pelas rotas de id.
+    """
+    por_id = {}
+    for posicao, registro in enumerate(registros):
+        chave = registro.get('id')
+        if chave is None or chave in por_id:
+            print(f"⚠️ Registro sem id ou com id repetido na posição {posicao}: {chave}")
+            chave = ('sem-id', posicao)
+        por_id[chave] = registro
+    return por_id
+
+
+class RepositorioDados:
+    """Backend 'memoria': mantém gastos e diárias em memória e grava cada alteração em disco.
+
+    O arquivo é lido uma única vez na criação do repositório. As leituras são
+    servidas da memória e só voltam ao disco quando o arquivo é alterado por
+    fora do processo (mudança de mtime/tamanho). A forma de gravar fica a cargo
+    da estratégia de persistência (ver persistencia.py).
+
+    Os registros ficam em dicionários id -> registro (na ordem de registro),
+    com índices secundários para os filtros (ver indices.py). Cada registro é
+    um Gasto ou Diaria (ver modelos.py), com valor e datas convertidos uma
+    vez só, na carga ou na gravação; as rotas os leem como dicionários.
+
+    As alterações passam por uma fila com uma única thread gravadora (ver
+    escritor.py): cada lote é aplicado sob a trava entre processos, depois de
+    sincronizar com o disco, e gravado uma vez só. Assim dois workers não
+    perdem as alterações um do outro nem repetem ids.
+
+    Com `caminho_imagem`, registros, índices e agregados já montados são
+    gravados em uma imagem binária ao encerrar o processo e depois de cada
+    compactação do journal; a carga usa a imagem no lugar do JSON enquanto
+    ela corresponder aos arquivos de dados (ver imagem.py).
+
+    Os outros backends (ver repositorio_sqlite.py) expõem os mesmos métodos
+    públicos, então as rotas não sabem onde os dados estão guardados.
+    """
+
+    def __init__(self, caminho, persistencia=None, motor=None, caminho_imagem=None):
+        self.caminho = caminho
+        # Opcional: motor colunar para a análise com filtros (ver motor_numpy.py)
+        self._motor = motor
+        self._caminho_imagem = caminho_imagem
+        # Versão dos dados gravada (ou lida) na imagem: sem mudanças, não regrava
+        self._versao_imagem = None
+        self._persistencia = persistencia or PersistenciaArquivo(caminho)
+        self._lock = threading.RLock()
+        self._gastos = {}
+        self._diarias = {}
+        self._indice = IndiceGastos()
+        self._agregados = AgregadosFrota()
+        self._cache = CacheAnalise()
+        self._proximo_id = 1
+        self._assinatura = None
+        # Aumenta a cada alteração ou recarga (usado nos ETags das rotas)
+        self._versao = 0
+        # Alterações do lote em andamento, gravadas juntas no fim da transação
+        self._pendentes = []
+        with self._persistencia.trava:
+            self.carregar()
+        self._persistencia.iniciar(self._lock, self._dados_sincronizados, self._compactado)
+        self._escritor = EscritorUnico(self._transacao)
+        if caminho_imagem is not None:
+            atexit.register(self.salvar_imagem)
+
+    # ------------------------------------
+    # Leitura e gravação do arquivo
+    # ------------------------------------
+    def carregar(self):
+        """Carrega dados do disco e garante as chaves necessárias"""
+        with self._lock, medir('carregar'):
+            assinatura = self._persistencia.assinatura()
+            if self._caminho_imagem is not None and self._carregar_imagem(assinatura):
+                self._assinatura = assinatura
+                return True
+            try:
+                dados = self._persistencia.carregar() or {}
+            except Exception as e:
+                # Mantém os dados atuais em memória se o arquivo estiver corrompido
+                print(f"Erro ao carregar dados: {e}")
+                self._assinatura = assinatura
+                return False
+            self._montar(dados.get('gastos', []), dados.get('diarias', []))
+            self._assinatura = assinatura
+            return True
+
+    def _montar(self, gastos, diarias):
+        """Reconstrói armazenamento, índices e agregados a partir das listas"""
+        gastos = [como_gasto(gasto) for gasto in gastos]
+        diarias = [como_diaria(diaria) for diaria in diarias]
+        self._gastos = _indexar_por_id(gastos)
+        self._diarias = _indexar_por_id(diarias)
+        self._indice.limpar()
+        for chave, gasto in self._gastos.items():
+            self._indice.adicionar(chave, gasto)
+        self._agregados.reconstruir(gastos, diarias)
+        self._cache.limpar()
+        if self._motor is not None:
+            self._motor.reconstruir(self._gastos.items())
+        ids = [g.get('id') for g in gastos if isinstance(g.get('id'), int)]
+        self._proximo_id = max(ids + [0]) + 1
+        self._versao += 1
+
+    def _carregar_imagem(self, assinatura):
+        """Usa a imagem binária no lugar do JSON, se ela ainda valer para os arquivos de dados"""
+        lida = imagem.ler(self._caminho_imagem, assinatura, self._persistencia.arquivos())
+        if lida is None:
+            return False
+        registros, (self._indice, self._agregados, self._proximo_id) = lida
+        self._gastos = registros['gastos']
+        self._diarias = registros['diarias']
+        self._cache.limpar()
+        if self._motor is not None:
+            self._motor.reconstruir(self._gastos.items())
+        self._versao += 1
+        self._versao_imagem = self._versao
+        print(f"⚡ {len(self._gastos)} gastos e {len(self._diarias)} diárias carregados da imagem {self._caminho_imagem}")
+        return True
+
+    def salvar_imagem(self):
+        """Grava a imagem binária dos dados (ver imagem.py) se eles mudaram desde a última.
+
+        Os dados são copiados sob as travas, já sincronizados com o disco; o
+        pickle dos registros é gravado depois, sem segurar as requisições.
+        """
+        if self._caminho_imagem is None:
+            return False
+        try:
+            with self._persistencia.trava, self._lock:
+                self._sincronizar()
+                arquivos = self._persistencia.arquivos()
+                if self._versao == self._versao_imagem or not any(os.path.exists(a) for a in arquivos):
+                    return False
+                capturado = imagem.capturar(self._assinatura, arquivos,
+                                            {'gastos': self._gastos, 'diarias': self._diarias},
+                                            (self._indice, self._agregados, self._proximo_id))
+                versao = self._versao
+            with medir('gravar'):
+                imagem.gravar(self._caminho_imagem, capturado)
+            self._versao_imagem = versao
+            return True
+        except Exception as e:
+            print(f"Erro ao gravar a imagem dos dados: {e}")
+            return False
+
+    def _compactado(self):
+        """Depois de cada compactação do journal (chamado sob o lock)"""
+        self._atualizar_assinatura()
+        if self._caminho_imagem is not None:
+            # Espera a compactação soltar a trava entre processos
+            threading.Thread(target=self.salvar_imagem, name='imagem-frota', daemon=True).start()
+
+    def _json_dados(self):
+        """Os dados em JSON, reaproveitando o JSON já guardado em cada registro"""
+        return json_dados(self._gastos.values(), self._diarias.values())
+
+    def _dados_sincronizados(self):
+        """JSON dos dados depois de incorporar o que outros processos gravaram"""
+        self._sincronizar()
+        return self._json_dados()
+
+    def _atualizar_assinatura(self):
+        self._assinatura = self._persistencia.assinatura()
+
+    def _persistir(self, entidade, op, registro=None, id=None):
+        """Entrega a alteração à estratégia de persistência"""
+        if op == 'gravar':
+            mutacao = {'entidade': entidade, 'op': op, 'registro': registro}
+        else:
+            mutacao = {'entidade': entidade, 'op': op, 'id': id}
+        return self._persistir_lote([mutacao])
+
+    def _persistir_lote(self, mutacoes):
+        """Junta as alterações às do lote em andamento (gravadas no fim da transação)"""
+        self._versao += 1
+        self._pendentes.extend(mutacoes)
+
+    @contextmanager
+    def _transacao(self):
+        """Um lote da fila de escrita: trava, sincroniza, aplica e grava uma vez"""
+        with self._persistencia.trava, self._lock:
+            self._sincronizar()
+            try:
+                yield
+            finally:
+                self._gravar_pendentes()
+
+    def _gravar_pendentes(self):
+        """Grava as alterações do lote.
+
+        Se a gravação falhar, a memória volta a ser o que está no disco e o erro
+        segue para a fila de escrita, que o entrega a todos os pedidos do lote.
+        """
+        if not self._pendentes:
+            return
+        mutacoes, self._pendentes = self._pendentes, []
+        try:
+            with medir('gravar'):
+                self._persistencia.registrar(mutacoes, self._json_dados)
+        except Exception:
+            self.carregar()
+            raise
+        self._atualizar_assinatura()
+
+    def _sincronizar(self):
+        """Recarrega o arquivo se ele foi alterado fora deste processo"""
+        if self._persistencia.assinatura() != self._assinatura:
+            print("🔄 Arquivo de dados alterado externamente, recarregando...")
+            self.carregar()
+
+    def substituir(self, dados):
+        """Substitui todo o conteúdo (usado para gravar os dados iniciais)"""
+        return self._escritor.executar(lambda: self._substituir(dados))
+
+    def _substituir(self, dados):
+        self._montar(list(dados.get('gastos', [])), list(dados.get('diarias', [])))
+        try:
+            with medir('gravar'):
+                self._persistencia.gravar_snapshot(self._json_dados())
+        except Exception as e:
+            print(f"Erro ao salvar dados: {e}")
+            # Os dados montados acima não chegaram ao disco
+            self.carregar()
+            return False
+        self._atualizar_assinatura()
+        return True
+
+    # ------------------------------------
+    # Consultas (servidas da memória)
+    # ------------------------------------
+    def versao(self):
+        """Número que muda sempre que os dados mudam"""
+        with self._lock:
+            self._sincronizar()
+            return self._versao
+
+    def listar_gastos(self):
+        with self._lock:
+            self._sincronizar()
+            return list(self._gastos.values())
+
+    def listar_diarias(self):
+        with self._lock:
+            self._sincronizar()
+            return list(self._diarias.values())
+
+    def obter_gasto(self, id):
+        with self._lock:
+            self._sincronizar()
+            return self._gastos.get(id)
+
+    def obter_diaria(self, id):
+        with self._lock:
+            self._sincronizar()
+            return self._diarias.get(id)
+
+    def esta_vazio(self):
+        with self._lock:
+            self._sincronizar()
+            return not self._gastos and not self._diarias
+
+    def listar_servicos(self):
+        """Gastos de manutenção, na ordem de registro"""
+        return [g for g in self.listar_gastos() if g.servico]
+
+    def pagina(self, entidade, ordenar=None, limite=None, offset=0):
+        """Uma página de 'gastos', 'diarias' ou 'servicos'. Retorna (total, registros)."""
+        listar = {
+            'gastos': self.listar_gastos,
+            'diarias': self.listar_diarias,
+            'servicos': self.listar_servicos
+        }[entidade]
+        registros = listar()
+        if ordenar:
+            registros = ordenar_registros(registros, entidade, ordenar)
+        fim = None if limite is None else offset + limite
+        return len(registros), registros[offset:fim]
+
+    def _filtrar(self, filtros):
+        with medir('filtrar'):
+            return self._filtrar_indice(filtros)
+
+    def _filtrar_indice(self, filtros):
+        chaves = self._indice.buscar(filtros)
+        if chaves is None:
+            return list(self._gastos.values())
+        # Resultado grande: percorrer tudo sai mais barato do que ordenar as chaves
+        if len(chaves) * 8 > len(self._gastos):
+            return [g for chave, g in self._gastos.items() if chave in chaves]
+        return [self._gastos[chave] for chave in self._indice.ordenar(chaves)]
+
+    def filtrar_gastos(self, filtros):
+        with self._lock:
+            self._sincronizar()
+            return self._filtrar(filtros)
+
+    def analise(self, filtros):
+        """Agrupamentos usados nos gráficos (gastos filtrados, diárias completas)"""
+        with self._lock:
+            self._sincronizar()
+            # Sem filtros, os totais já estão prontos nos agregados
+            chave = chave_filtros(filtros)
+            if not chave:
+                with medir('agregar'):
+                    return {'gastos': self._agregados.analise_gastos(), 'diarias': self._agregados.analise_diarias()}
+            gastos = self._cache.obter(chave)
+            if gastos is None:
+                if self._motor is not None:
+                    with medir('agregar'):
+                        gastos = self._motor.analise(filtros)
+                else:
+                    filtrados = self._filtrar(filtros)
+                    with medir('agregar'):
+                        gastos = calcular_analise_gastos(filtrados)
+                self._cache.guardar(chave, gastos)
+            return {'gastos': gastos, 'diarias': self._agregados.analise_diarias()}
+
+    def estatisticas_cache(self):
+        with self._lock:
+            return self._cache.estatisticas()
+
+    def renovar_status_garantia(self, hoje):
+        """Regrava o status_garantia que mudou com a data. Retorna quantos gastos mudaram."""
+        return self._escritor.executar(lambda: self._renovar_status_garantia(hoje))
+
+    def _renovar_status_garantia(self, hoje):
+        renovados = 0
+        for chave, gasto in list(self._gastos.items()):
+            # Só o status já gravado; registros sem id não são regravados
+            if 'status_garantia' not in gasto or chave != gasto.get('id'):
+                continue
+            status = gasto.status_garantia_em(hoje)
+            if status != gasto['status_garantia']:
+                self._atualizar_gasto(chave, {'status_garantia': status})
+                renovados += 1
+        return renovados
+
+    def resumo_dashboard(self, mes_atual):
+        with self._lock:
+            self._sincronizar()
+            with medir('agregar'):
+                return self._agregados.resumo_dashboard(mes_atual)
+
+    def tendencias(self, **parametros):
+        """Séries mensais com médias móveis e outliers (ver tendencias.calcular_tendencias)"""
+        with self._lock:
+            self._sincronizar()
+            with medir('agregar'):
+                return calcular_tendencias(self._agregados, **parametros)
+
+    def exportar_agregados(self, garantias=True, series=True):
+        """(versão, AgregadosFrota.exportar()) lidos juntos, para somar com outras frotas (ver frotas.py)"""
+        with self._lock:
+            self._sincronizar()
+            return self._versao, self._agregados.exportar(garantias, series)
+
+    def opcoes_filtros(self):
+        with self._lock:
+            self._sincronizar()
+            return self._agregados.opcoes_filtros()
+
+    def resumo_garantias(self, hoje):
+        with self._lock:
+            self._sincronizar()
+            return self._agregados.resumo_garantias(hoje)
+
+    def servicos_vencendo(self, inicio, fim):
+        """Serviços com garantia de inicio até fim ('AAAA-MM-DD'), por data e depois por registro"""
+        with self._lock:
+            self._sincronizar()
+            # O índice dos agregados guarda o id; ids repetidos aparecem uma vez só
+            pares = {id: data for data, id in self._agregados.garantias.entre(inicio, fim) if id in self._gastos}
+            ordem = self._indice.ordem
+            return [self._gastos[id] for id in sorted(pares, key=lambda id: (pares[id], ordem[id]))]
+
+    # ------------------------------------
+    # Alterações (pela fila de escrita, ver escritor.py)
+    # ------------------------------------
+    # Os métodos públicos enfileiram a alteração e esperam o lote ser gravado;
+    # os privados rodam na thread gravadora, já dentro da transação.
+    #
+    # Os registros em memória nunca são modificados no lugar: cada alteração
+    # cria um novo registro, assim listas já entregues às rotas continuam
+    # consistentes.
+    def inserir_gasto(self, gasto):
+        """Atribui um novo id ao gasto, adiciona e salva. Retorna o id."""
+        return self.inserir_gastos([gasto])[0]
+
+    def inserir_gastos(self, gastos):
+        """Insere um lote com ids consecutivos e uma única gravação. Retorna os ids."""
+        return self._escritor.executar(lambda: self._inserir_gastos(gastos))
+
+    def _inserir_gastos(self, gastos):
+        novos = [Gasto({**gasto, 'id': self._proximo_id + i}) for i, gasto in enumerate(gastos)]
+        # Valida o lote inteiro antes de alterar qualquer coisa
+        for novo_gasto in novos:
+            float(novo_gasto.get('valor', 0))
+        for novo_gasto in novos:
+            novo_id = novo_gasto['id']
+            self._agregados.aplicar_gasto(None, novo_gasto)
+            self._gastos[novo_id] = novo_gasto
+            self._indice.adicionar(novo_id, novo_gasto)
+            if self._motor is not None:
+                self._motor.adicionar(novo_id, novo_gasto)
+        self._cache.invalidar(*novos)
+        self._proximo_id += len(novos)
+        self._persistir_lote([{'entidade': 'gastos', 'op': 'gravar', 'registro': g} for g in novos])
+        return [g['id'] for g in novos]
+
+    def atualizar_gasto(self, id, atualizacoes):
+        """Mescla as atualizações no gasto. Retorna o gasto atualizado ou None."""
+        return self._escritor.executar(lambda: self._atualizar_gasto(id, atualizacoes))
+
+    def _atualizar_gasto(self, id, atualizacoes):
+        antigo = self._gastos.get(id)
+        if antigo is None:
+            return None
+        # Só o valor enviado é validado: um registro antigo com valor inválido continua editável
+        if 'valor' in atualizacoes:
+            float(atualizacoes['valor'])
+        atualizado = antigo.alterar(atualizacoes)
+        self._agregados.aplicar_gasto(antigo, atualizado)
+        self._gastos[id] = atualizado
+        self._indice.substituir(id, antigo, atualizado)
+        self._cache.invalidar(antigo, atualizado)
+        if self._motor is not None:
+            self._motor.atualizar(id, atualizado)
+        self._persistir('gastos', 'gravar', atualizado)
+        return atualizado
+
+    def excluir_gasto(self, id):
+        return self._escritor.executar(lambda: self._excluir_gasto(id))
+
+    def _excluir_gasto(self, id):
+        antigo = self._gastos.pop(id, None)
+        if antigo is None:
+            return False
+        self._agregados.aplicar_gasto(antigo, None)
+        self._indice.remover(id, antigo)
+        self._cache.invalidar(antigo)
+        if self._motor is not None:
+            self._motor.remover(id)
+        self._persistir('gastos', 'excluir', id=id)
+        return True
+
+    def inserir_diaria(self, diaria):
+        """Adiciona a diária e salva. Retorna a diária gravada.
+
+        O id (data/hora em segundos) ganha um sufixo se já existir outra diária
+        registrada no mesmo segundo, inclusive por outro processo.
+        """
+        return self.inserir_diarias([diaria])[0]
+
+    def inserir_diarias(self, diarias):
+        """Insere um lote de diárias com uma única gravação. Retorna as diárias gravadas."""
+        return self._escritor.executar(lambda: self._inserir_diarias(diarias))
+
+    def _inserir_diarias(self, diarias):
+        for diaria in diarias:
+            float(diaria.get('valor_total', 0))
+        gravadas = []
+        sufixos = {}  # id base -> próximo sufixo a tentar (lotes no mesmo segundo)
+        for diaria in diarias:
+            base = novo_id = diaria['id']
+            sufixo = sufixos.get(base, 2)
+            while novo_id in self._diarias:
+                novo_id = f"{base}-{sufixo}"
+                sufixo += 1
+            sufixos[base] = sufixo
+            diaria = Diaria({**diaria, 'id': novo_id})
+            self._agregados.aplicar_diaria(None, diaria)
+            self._diarias[novo_id] = diaria
+            gravadas.append(diaria)
+        self._persistir_lote([{'entidade': 'diarias', 'op': 'gravar', 'registro': d} for d in gravadas])
+        return gravadas
+
+    def atualizar_diaria(self, id, atualizacoes):
+        """Mescla as atualizações na diária. Retorna a diária atualizada ou None."""
+        return self._escritor.executar(lambda: self._atualizar_diaria(id, atualizacoes))
+
+    def _atualizar_diaria(self, id, atualizacoes):
+        antiga = self._diarias.get(id)
+        if antiga is None:
+            return None
+        if 'valor_total' in atualizacoes:
+            float(atualizacoes['valor_total'])
+        atualizada = antiga.alterar(atualizacoes)
+        self._agregados.aplicar_diaria(antiga, atualizada)
+        self._diarias[id] = atualizada
+        self._persistir('diarias', 'gravar', atualizada)
+        return atualizada
+
+    def excluir_diaria(self, id):
+        """Remove a diária. Retorna False se ela não existir (nada é gravado)."""
+        return self._escritor.executar(lambda: self._excluir_diaria(id))
+
+    def _excluir_diaria(self, id):
+        antiga = self._diarias.pop(id, None)
+        if antiga is None:
+            return False
+        self._agregados.aplicar_diaria(antiga, None)
+        self._persistir('diarias', 'excluir', id=id)
+        return True
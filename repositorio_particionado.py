@@ -0,0 +1,957 @@
+# repositorio_particionado.py - BACKEND PARTICIONADO POR MÊS
+import hashlib
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from agregados import AgregadosFrota
+from cache_analise import CacheAnalise, chave_filtros
+from calculos import aplicar_filtros, calcular_analise_gastos, normalizar_filtros, ordenar_registros
+from codificacao import codificar, decodificar
+from escritor import EscritorUnico
+from metricas import medir
+from modelos import Diaria, Gasto, como_diaria, como_gasto, json_dados
+from persistencia import TravaArquivo, gravar_json_atomico
+from repositorio import _indexar_por_id
+from tendencias import calcular_tendencias, meses_lidos
+
+MANIFESTO = 'manifesto.json'
+# Partição dos registros sem data 'AAAA-MM-...' (passam pelos filtros de ano/mês)
+SEM_DATA = 'sem-data'
+# Registros (gastos + diárias) das partições mantidas em memória
+LIMITE_PADRAO = 100000
+# O índice é regravado inteiro quando passa de duas linhas por registro (e deste mínimo)
+MINIMO_COMPACTAR = 1000
+
+_ANO_MES = re.compile(r'\d{4}-\d{2}')
+
+
+def chave_particao(registro):
+    """'AAAA-MM' da data do gasto (ou do início da diária); SEM_DATA se não houver"""
+    ano_mes = registro.ano_mes
+    return ano_mes if ano_mes is not None and _ANO_MES.fullmatch(ano_mes) else SEM_DATA
+
+
+def _ordem(chave):
+    """Ordem de registro: ids inteiros em ordem numérica, os demais como texto depois"""
+    return (0, chave, '') if type(chave) is int else (1, 0, str(chave))
+
+
+def _assinatura(caminho):
+    try:
+        info = os.stat(caminho)
+        return (info.st_mtime_ns, info.st_size)
+    except OSError:
+        return None
+
+
+def _hash(dados):
+    """Identifica o conteúdo gravado de uma partição"""
+    return hashlib.blake2b(dados, digest_size=8).hexdigest()
+
+
+def _linha_indice(entidade, registro, chave):
+    """Linha do índice que põe o registro na partição `chave` (gastos: com a data da garantia)"""
+    if entidade == 'gastos':
+        return [entidade, registro.get('id'), chave, registro.garantia if registro.servico else None]
+    return [entidade, registro.get('id'), chave]
+
+
+def _status_garantias(gastos):
+    """Em que datas o status_garantia gravado dos gastos deixa de valer (ver _renovar).
+
+    - vigente: a menor garantia com status 'Vigente' (vira 'Vencida' depois dela)
+    - vencida: a maior garantia com status 'Vencida' (seria 'Vigente' até ela)
+    - incorreto: algum status que não vale em data nenhuma
+    """
+    vigente = vencida = None
+    incorreto = False
+    for chave, gasto in gastos.items():
+        # Mesmos gastos que _renovar_status_garantia considera
+        if 'status_garantia' not in gasto or chave != gasto.get('id'):
+            continue
+        status = gasto['status_garantia']
+        if gasto.garantia is None or status not in ('Vigente', 'Vencida'):
+            incorreto = incorreto or status != gasto.status_garantia_em('')
+        elif status == 'Vigente':
+            vigente = gasto.garantia if vigente is None else min(vigente, gasto.garantia)
+        else:
+            vencida = gasto.garantia if vencida is None else max(vencida, gasto.garantia)
+    return {'vigente': vigente, 'vencida': vencida, 'incorreto': incorreto}
+
+
+def _precisa_renovar(status, hoje):
+    return (status['incorreto'] or (status['vigente'] is not None and status['vigente'] < hoje)
+            or (status['vencida'] is not None and status['vencida'] >= hoje))
+
+
+class Particao:
+    """Gastos e diárias de um mês (id -> registro), com os totais do mês"""
+
+    def __init__(self, chave, gastos, diarias):
+        self.chave = chave
+        self.gastos = _indexar_por_id(gastos)
+        self.diarias = _indexar_por_id(diarias)
+        self.agregados = AgregadosFrota()
+        self.agregados.reconstruir(self.gastos.values(), self.diarias.values())
+
+    def registros(self, entidade):
+        return self.gastos if entidade == 'gastos' else self.diarias
+
+    def resumo(self):
+        return self.agregados.exportar(garantias=False, series=False)
+
+    def entrada(self, hash):
+        """Entrada do manifesto: totais e contagens do mês, datas dos status de garantia e
+        o hash do arquivo gravado (para reconhecer uma partição gravada sem o manifesto)"""
+        return {
+            'hash': hash,
+            'totais': self.resumo()['totais'],
+            'status_garantias': _status_garantias(self.gastos)
+        }
+
+    def __len__(self):
+        return len(self.gastos) + len(self.diarias)
+
+
+class RepositorioParticionado:
+    """Backend 'particionado': um arquivo JSON por mês, lido só quando necessário.
+
+    Os gastos ficam na partição do mês de 'data' e as diárias na do mês de
+    'data_inicio' (AAAA-MM.json; sem data válida, sem-data.json). Ao lado delas:
+
+    - manifesto.json: o próximo id, os totais e contagens de cada partição e
+      o resumo da frota inteira (por tipo, veículo, placa, motorista e mês; ver
+      AgregadosFrota.exportar), mantido a cada alteração. O tamanho depende de
+      meses, veículos e motoristas, não do número de registros. Dashboard,
+      análise sem filtros e opções de filtros saem do resumo, sem abrir as
+      partições.
+    - indice-N.log: uma linha JSON por alteração, sempre acrescentada no fim,
+      com o id, a partição e a garantia do registro. A ordem das linhas é a
+      de registro (a das listagens, como nos outros backends). O índice é
+      lido na primeira consulta que precisa dele (busca por id, listagens,
+      garantias) e, depois disso, só o trecho novo; com linhas demais, é
+      regravado inteiro em uma geração nova (N + 1).
+
+    As séries mensais de cada veículo (ver tendencias.py) vêm das partições
+    dos meses pedidos, uma vez por mês.
+
+    Cada consulta abre só as partições de que precisa: a busca por id e as
+    páginas sem ordenação, as dos registros pedidos; os filtros de ano/mês,
+    as do período (mais a 'sem-data'); as listagens completas, todas. Quando
+    os registros em memória passam do limite, as partições usadas há mais
+    tempo são descartadas (e relidas se voltarem a ser pedidas).
+
+    Tem os mesmos métodos públicos de RepositorioDados. As alterações passam
+    pela fila de escrita (ver escritor.py): no fim de cada lote são regravadas
+    só as partições alteradas, depois o índice recebe as linhas do lote e por
+    fim vem o manifesto, que guarda até onde o índice vale (linhas de um lote
+    que não chegou ao manifesto são ignoradas). Tudo sob a trava entre
+    processos; alterações de outro processo aparecem como um manifesto novo.
+    """
+
+    def __init__(self, pasta, limite=LIMITE_PADRAO):
+        self.caminho = pasta
+        self.limite = limite
+        os.makedirs(pasta, exist_ok=True)
+        self.caminho_manifesto = os.path.join(pasta, MANIFESTO)
+        self.trava = TravaArquivo(f"{self.caminho_manifesto}.lock")
+        self._lock = threading.RLock()
+        self._manifesto = {}
+        # Geração e tamanho válido do índice, gravados no manifesto (None: ainda sem índice)
+        self._indice = None
+        # Manifesto anterior ao índice, com os ids de cada partição (ver _montar_indice)
+        self._legado = None
+        # Partições em memória, da usada há mais tempo para a mais recente
+        self._carregadas = OrderedDict()
+        # Partições alteradas no lote em andamento (gravadas no fim da transação)
+        self._alteradas = set()
+        self._agregados = AgregadosFrota()
+        self._cache = CacheAnalise()
+        # Vindos do índice (None: ainda não lido): id -> partição, em ordem de
+        # registro, e id do serviço -> data da garantia
+        self._onde = None
+        self._garantia_de = {}
+        # (geração, bytes) do índice já aplicados em _onde, e quantas linhas ele tem
+        self._lido = None
+        self._linhas_indice = 0
+        # Linhas do lote em andamento, acrescentadas ao índice no fim da transação
+        self._linhas = []
+        # _onde foi corrigido por uma partição: o próximo lote regrava o índice inteiro
+        self._indice_corrigido = False
+        # Meses cujas séries (ver tendencias.py) já foram lidas das partições
+        self._meses_series = set()
+        # Cópia em lista dos ids de _onde, para as páginas sem ordenação
+        self._ids_ordenados = {}
+        self._proximo_id = 1
+        self._assinatura = None
+        self._versao = 0
+        with self.trava:
+            self.carregar()
+        self._escritor = EscritorUnico(self._transacao)
+
+    # ------------------------------------
+    # Manifesto, índice e partições
+    # ------------------------------------
+    def carregar(self):
+        """Lê o manifesto e o resumo da frota; índice e partições só são lidos quando pedidos"""
+        with self._lock, medir('carregar'):
+            assinatura = _assinatura(self.caminho_manifesto)
+            try:
+                manifesto = {}
+                if assinatura is not None:
+                    with open(self.caminho_manifesto, 'rb') as f:
+                        manifesto = decodificar(f.read())
+            except Exception as e:
+                print(f"Erro ao carregar manifesto: {e}")
+                self._assinatura = assinatura
+                return False
+            indice = manifesto.get('indice')
+            # O índice já lido continua valendo se de lá para cá só recebeu linhas novas
+            manter = (self._lido is not None and indice is not None and indice['geracao'] == self._lido[0]
+                      and indice['tamanho'] >= self._lido[1])
+            garantias = self._agregados.garantias
+            self._agregados = AgregadosFrota()
+            self._manifesto = {}
+            if 'resumo' in manifesto:
+                self._agregados.incorporar(manifesto['resumo'])
+            for chave, entrada in manifesto.get('particoes', {}).items():
+                if 'resumo' in entrada:
+                    # Manifesto anterior ao índice: um resumo completo (com ids, garantias e
+                    # séries) por partição; o da frota é a soma deles
+                    resumo = {nome: entrada['resumo'][nome] for nome in ('totais', 'somas', 'contagens')}
+                    self._agregados.incorporar(resumo)
+                    entrada = {'hash': None, 'totais': resumo['totais'],
+                               'status_garantias': entrada['status_garantias']}
+                self._manifesto[chave] = entrada
+            if manter:
+                self._agregados.garantias = garantias
+            else:
+                self._onde = None
+                self._lido = None
+                self._indice_corrigido = False
+            self._indice = indice
+            self._legado = manifesto if indice is None else None
+            self._proximo_id = manifesto.get('proximo_id', 1)
+            self._linhas = []
+            self._meses_series.clear()
+            self._ids_ordenados.clear()
+            self._carregadas.clear()
+            self._alteradas.clear()
+            self._cache.limpar()
+            self._assinatura = assinatura
+            self._versao += 1
+            return True
+
+    def _sincronizar(self, indice=False):
+        """Relê o manifesto se outro processo gravou na pasta (indice=True: lê também o índice)"""
+        if _assinatura(self.caminho_manifesto) != self._assinatura:
+            print("🔄 Partições alteradas externamente, recarregando...")
+            self.carregar()
+        if not indice:
+            return
+        try:
+            self._ler_indice()
+        except FileNotFoundError:
+            # Outro processo regravou o índice depois que este leu o manifesto
+            self.carregar()
+            try:
+                self._ler_indice()
+            except FileNotFoundError:
+                print(f"⚠️ Índice {self._caminho_indice(self._indice['geracao'])} não encontrado, "
+                      f"refazendo pelas partições")
+                self._montar_indice()
+
+    def _caminho_particao(self, chave):
+        return os.path.join(self.caminho, f"{chave}.json")
+
+    def _caminho_indice(self, geracao):
+        return os.path.join(self.caminho, f"indice-{geracao}.log")
+
+    def _ler_indice(self):
+        """Aplica em _onde o trecho do índice que falta (na primeira vez, o índice inteiro)"""
+        if self._indice is None:
+            if self._onde is None:
+                self._montar_indice()
+            return
+        geracao, tamanho = self._indice['geracao'], self._indice['tamanho']
+        if self._onde is None:
+            self._onde = {'gastos': {}, 'diarias': {}}
+            self._garantia_de = {}
+            self._lido = (geracao, 0)
+            self._linhas_indice = 0
+        inicio = self._lido[1]
+        if inicio < tamanho:
+            with medir('carregar'):
+                with open(self._caminho_indice(geracao), 'rb') as f:
+                    f.seek(inicio)
+                    linhas = f.read(tamanho - inicio).splitlines()
+                # Lido inteiro, o índice de garantias é montado de uma vez no fim
+                garantias = self._agregados.garantias if inicio else None
+                for linha in linhas:
+                    self._aplicar_linha(decodificar(linha), garantias)
+                if garantias is None:
+                    self._agregados.garantias.reconstruir_datas(self._garantia_de.items())
+            self._linhas_indice += len(linhas)
+            self._ids_ordenados.clear()
+        self._lido = (geracao, tamanho)
+
+    def _montar_indice(self):
+        """_onde sem o arquivo de índice: do manifesto anterior a ele ou, sem isso, das partições.
+
+        O próximo lote grava o índice montado.
+        """
+        onde = {'gastos': {}, 'diarias': {}}
+        garantia_de = {}
+        particoes = (self._legado or {}).get('particoes', {})
+        if self._manifesto and particoes and all('gastos' in entrada for entrada in particoes.values()):
+            ordem = self._legado.get('ordem', {})
+            for entidade, por_id in onde.items():
+                particao_de = {id: chave for chave, entrada in particoes.items()
+                               for id in entrada[entidade] if id is not None}
+                por_id.update((id, particao_de[id]) for id in ordem.get(entidade, []) if id in particao_de)
+                # Manifestos anteriores à ordem gravada: os ids que faltam entram no fim, pela chave
+                faltando = sorted((id for id in particao_de if id not in por_id), key=_ordem)
+                por_id.update((id, particao_de[id]) for id in faltando)
+            for entrada in particoes.values():
+                garantia_de.update((id, data) for data, id in entrada['resumo'].get('garantias', []))
+        else:
+            for chave in sorted(self._manifesto):
+                particao = self._ler_particao(chave)[0]
+                for entidade, por_id in onde.items():
+                    for id, registro in particao.registros(entidade).items():
+                        if id == registro.get('id'):
+                            linha = _linha_indice(entidade, registro, chave)
+                            por_id[id] = chave
+                            if entidade == 'gastos' and linha[3] is not None:
+                                garantia_de[id] = linha[3]
+            for entidade, por_id in onde.items():
+                onde[entidade] = dict(sorted(por_id.items(), key=lambda par: _ordem(par[0])))
+        self._onde, self._garantia_de = onde, garantia_de
+        self._agregados.garantias.reconstruir_datas(garantia_de.items())
+        self._lido = None if self._indice is None else (self._indice['geracao'], self._indice['tamanho'])
+        self._linhas_indice = 0
+        self._indice_corrigido = True
+        self._ids_ordenados.clear()
+
+    def _aplicar_linha(self, linha, garantias=None):
+        """Aplica uma linha do índice: [entidade, id, partição(, garantia)] grava, [entidade, id] exclui.
+
+        Gravar um id já conhecido mantém o lugar dele na ordem. Com `garantias`
+        (IndiceGarantias), a data da garantia muda também lá.
+        """
+        entidade, id = linha[0], linha[1]
+        if len(linha) == 2:
+            self._onde[entidade].pop(id, None)
+        else:
+            self._onde[entidade][id] = linha[2]
+        if entidade != 'gastos':
+            return
+        antiga = self._garantia_de.get(id)
+        nova = linha[3] if len(linha) == 4 else None
+        if nova is None:
+            self._garantia_de.pop(id, None)
+        else:
+            self._garantia_de[id] = nova
+        if garantias is not None and antiga != nova:
+            if antiga is not None:
+                garantias.incorporar([[antiga, id]], -1)
+            if nova is not None:
+                garantias.incorporar([[nova, id]])
+
+    def _particao(self, chave):
+        """A partição em memória, lida do disco se preciso (partição nova: vazia)"""
+        particao = self._carregadas.get(chave)
+        if particao is not None:
+            self._carregadas.move_to_end(chave)
+            return particao
+        entrada = self._manifesto.get(chave)
+        if entrada is None:
+            particao = Particao(chave, [], [])
+        else:
+            particao, hash = self._ler_particao(chave)
+            if entrada['hash'] is None and hash is not None:
+                # Manifesto anterior ao hash: passa a valer o da partição lida
+                entrada['hash'] = hash
+            elif hash != entrada['hash']:
+                print(f"⚠️ Partição {chave} diferente do manifesto, recalculando os totais")
+                self._acertar_indice(particao, hash)
+                self._recalcular_totais(particao)
+        self._carregadas[chave] = particao
+        self._liberar()
+        return particao
+
+    def _ler_particao(self, chave):
+        """(partição, hash do arquivo) lidos do disco; sem arquivo, partição vazia e hash None"""
+        with medir('carregar'):
+            try:
+                with open(self._caminho_particao(chave), 'rb') as f:
+                    dados = f.read()
+            except FileNotFoundError:
+                # Partição esvaziada e removida antes de o manifesto ser gravado
+                return Particao(chave, [], []), None
+            registros = decodificar(dados)
+            particao = Particao(chave, [como_gasto(g) for g in registros.get('gastos', [])],
+                                [como_diaria(d) for d in registros.get('diarias', [])])
+            return particao, _hash(dados)
+
+    def _acertar_indice(self, particao, hash):
+        """Gravação interrompida entre a partição e o manifesto: entrada e índice passam a seguir a partição"""
+        chave = particao.chave
+        if len(particao):
+            self._manifesto[chave] = particao.entrada(hash)
+        else:
+            self._manifesto.pop(chave, None)
+        self._ler_indice()
+        for entidade, onde in self._onde.items():
+            registros = particao.registros(entidade)
+            for id in [id for id, onde_id in onde.items() if onde_id == chave and id not in registros]:
+                self._aplicar_linha([entidade, id])
+            for id, registro in registros.items():
+                if id == registro.get('id'):
+                    self._aplicar_linha(_linha_indice(entidade, registro, chave))
+        # O proximo_id do manifesto anterior não conhece os gastos da partição
+        ids = [id for id in particao.registros('gastos') if isinstance(id, int)]
+        self._proximo_id = max(ids + [self._proximo_id - 1]) + 1
+        self._agregados.garantias.reconstruir_datas(self._garantia_de.items())
+        self._indice_corrigido = True
+        self._ids_ordenados.clear()
+
+    def _recalcular_totais(self, acertada):
+        """Refaz o resumo da frota a partir de todas as partições (depois de _acertar_indice).
+
+        O manifesto não guarda quanto cada partição somava por veículo ou
+        motorista, então não dá para trocar só a parte da partição acertada.
+        As partições em memória entram como estão, com as alterações do lote.
+        """
+        agregados = AgregadosFrota()
+        for chave in sorted(self._manifesto):
+            particao = acertada if chave == acertada.chave else self._carregadas.get(chave)
+            if particao is None:
+                particao, hash = self._ler_particao(chave)
+                if hash is None or hash != self._manifesto[chave]['hash']:
+                    self._acertar_indice(particao, hash)
+            agregados.incorporar(particao.resumo())
+        agregados.garantias = self._agregados.garantias
+        self._agregados = agregados
+        self._meses_series.clear()
+        self._cache.limpar()
+        self._versao += 1
+
+    def _liberar(self):
+        """Descarta as partições usadas há mais tempo até caber no limite (a última lida fica)"""
+        total = sum(len(particao) for particao in self._carregadas.values())
+        for chave in list(self._carregadas)[:-1]:
+            if total <= self.limite:
+                break
+            if chave in self._alteradas:
+                continue
+            total -= len(self._carregadas.pop(chave))
+
+    def _chaves_periodo(self, filtros):
+        """Partições que podem ter gastos dentro dos filtros de ano/mês"""
+        filtros = normalizar_filtros(filtros)
+        ano, mes = filtros.get('ano'), filtros.get('mes')
+        return [
+            chave for chave in self._manifesto
+            if chave == SEM_DATA or ((not ano or chave[:4] == ano) and (not mes or chave[5:7] == mes))
+        ]
+
+    def _ids_em_ordem(self, entidade):
+        """Ids do índice em ordem de registro; None se algum registro não tem id próprio"""
+        if entidade not in self._ids_ordenados:
+            ids = None
+            quantidade = (self._agregados.quantidade_gastos if entidade == 'gastos'
+                          else self._agregados.quantidade_diarias)
+            if quantidade == len(self._onde[entidade]):
+                ids = list(self._onde[entidade])
+            self._ids_ordenados[entidade] = ids
+        return self._ids_ordenados[entidade]
+
+    def _registros(self, entidade, chaves=None):
+        """Registros das partições (todas por padrão), na ordem de registro"""
+        particoes = {
+            chave: self._particao(chave).registros(entidade)
+            for chave in sorted(self._manifesto if chaves is None else chaves)
+        }
+        ids = self._ids_em_ordem(entidade)
+        if ids is not None:
+            onde = self._onde[entidade]
+            return [particoes[chave][id] for id in ids if (chave := onde[id]) in particoes]
+        # Ids repetidos ou ausentes: ordena os registros pela chave de cada partição
+        pares = [par for registros in particoes.values() for par in registros.items()]
+        pares.sort(key=lambda par: _ordem(par[0]))
+        return [registro for _, registro in pares]
+
+    def _obter(self, entidade, id):
+        chave = self._onde[entidade].get(id)
+        if chave is None:
+            return None
+        return self._particao(chave).registros(entidade).get(id)
+
+    def _completar_series(self, ano_mes):
+        """Traz da partição as séries do mês (ver tendencias.py), na primeira vez que são pedidas.
+
+        Até lá os totais do mês têm só as alterações feitas por este processo;
+        depois, as alterações continuam sendo somadas aos totais lidos.
+        """
+        if ano_mes in self._meses_series:
+            return
+        series = self._agregados.gastos_mensal_detalhado
+        series.descartar(ano_mes)
+        if ano_mes in self._manifesto:
+            lidas = self._particao(ano_mes).agregados.gastos_mensal_detalhado
+            series.incorporar(item for item in lidas.exportar() if item[0] == ano_mes)
+        self._meses_series.add(ano_mes)
+
+    # ------------------------------------
+    # Consultas
+    # ------------------------------------
+    def versao(self):
+        """Número que muda sempre que os dados mudam"""
+        with self._lock:
+            self._sincronizar()
+            return self._versao
+
+    def listar_gastos(self):
+        with self._lock:
+            self._sincronizar(indice=True)
+            return self._registros('gastos')
+
+    def listar_diarias(self):
+        with self._lock:
+            self._sincronizar(indice=True)
+            return self._registros('diarias')
+
+    def obter_gasto(self, id):
+        with self._lock:
+            self._sincronizar(indice=True)
+            return self._obter('gastos', id)
+
+    def obter_diaria(self, id):
+        with self._lock:
+            self._sincronizar(indice=True)
+            return self._obter('diarias', id)
+
+    def esta_vazio(self):
+        with self._lock:
+            self._sincronizar()
+            return not self._manifesto
+
+    def listar_servicos(self):
+        """Gastos de manutenção, na ordem de registro"""
+        return [g for g in self.listar_gastos() if g.servico]
+
+    def pagina(self, entidade, ordenar=None, limite=None, offset=0):
+        """Uma página de 'gastos', 'diarias' ou 'servicos'. Retorna (total, registros)."""
+        with self._lock:
+            self._sincronizar(indice=True)
+            fim = None if limite is None else offset + limite
+            if entidade != 'servicos' and not ordenar:
+                # A página sai dos ids do índice: só as partições desses registros são lidas
+                ids = self._ids_em_ordem(entidade)
+                if ids is not None:
+                    return len(ids), [self._obter(entidade, id) for id in ids[offset:fim]]
+            registros = self.listar_servicos() if entidade == 'servicos' else self._registros(entidade)
+            if ordenar:
+                registros = ordenar_registros(registros, entidade, ordenar)
+            return len(registros), registros[offset:fim]
+
+    def _filtrar(self, filtros):
+        with medir('filtrar'):
+            return aplicar_filtros(self._registros('gastos', self._chaves_periodo(filtros)), filtros)
+
+    def filtrar_gastos(self, filtros):
+        with self._lock:
+            self._sincronizar(indice=True)
+            return self._filtrar(filtros)
+
+    def analise(self, filtros):
+        """Agrupamentos usados nos gráficos (gastos filtrados, diárias completas)"""
+        with self._lock:
+            self._sincronizar()
+            chave = chave_filtros(filtros)
+            if not chave:
+                with medir('agregar'):
+                    return {'gastos': self._agregados.analise_gastos(), 'diarias': self._agregados.analise_diarias()}
+            gastos = self._cache.obter(chave)
+            if gastos is None:
+                self._sincronizar(indice=True)
+                filtrados = self._filtrar(filtros)
+                with medir('agregar'):
+                    gastos = calcular_analise_gastos(filtrados)
+                self._cache.guardar(chave, gastos)
+            return {'gastos': gastos, 'diarias': self._agregados.analise_diarias()}
+
+    def estatisticas_cache(self):
+        with self._lock:
+            return self._cache.estatisticas()
+
+    def resumo_dashboard(self, mes_atual):
+        with self._lock:
+            # Serviços vencidos: índice de garantias
+            self._sincronizar(indice=True)
+            with medir('agregar'):
+                return self._agregados.resumo_dashboard(mes_atual)
+
+    def tendencias(self, **parametros):
+        """Séries mensais com médias móveis e outliers (ver tendencias.calcular_tendencias)"""
+        with self._lock:
+            self._sincronizar()
+            with medir('agregar'):
+                for ano_mes in meses_lidos(self._agregados, **parametros):
+                    self._completar_series(ano_mes)
+                return calcular_tendencias(self._agregados, **parametros)
+
+    def exportar_agregados(self, garantias=True, series=True):
+        """(versão, AgregadosFrota.exportar()) lidos juntos, para somar com outras frotas (ver frotas.py)"""
+        with self._lock:
+            self._sincronizar(indice=garantias)
+            resumo = self._agregados.exportar(garantias, series=False)
+            if series:
+                # Os totais por mês só estão completos nas partições
+                resumo['series'] = {
+                    nome: [item for chave in sorted(self._manifesto)
+                           for item in getattr(self._particao(chave).agregados, nome).exportar()]
+                    for nome in AgregadosFrota.SERIES
+                }
+            return self._versao, resumo
+
+    def opcoes_filtros(self):
+        with self._lock:
+            self._sincronizar()
+            return self._agregados.opcoes_filtros()
+
+    def resumo_garantias(self, hoje):
+        with self._lock:
+            self._sincronizar(indice=True)
+            return self._agregados.resumo_garantias(hoje)
+
+    def servicos_vencendo(self, inicio, fim):
+        """Serviços com garantia de inicio até fim ('AAAA-MM-DD'), por data e depois por registro"""
+        with self._lock:
+            self._sincronizar(indice=True)
+            pares = {id: data for data, id in self._agregados.garantias.entre(inicio, fim)
+                     if id in self._onde['gastos']}
+            ids = sorted(pares, key=lambda id: (pares[id], _ordem(id)))
+            return [gasto for gasto in map(lambda id: self._obter('gastos', id), ids) if gasto is not None]
+
+    # ------------------------------------
+    # Alterações (pela fila de escrita, ver escritor.py)
+    # ------------------------------------
+    @contextmanager
+    def _transacao(self):
+        """Um lote da fila de escrita: trava, sincroniza, aplica e grava uma vez"""
+        with self.trava, self._lock:
+            self._sincronizar(indice=True)
+            try:
+                yield
+            finally:
+                self._gravar_pendentes()
+
+    def _gravar_pendentes(self):
+        """Regrava as partições alteradas, acrescenta as linhas do lote ao índice e grava o manifesto.
+
+        Se a gravação falhar, o manifesto é relido do disco (o índice e as
+        partições, quando pedidos) e o erro segue para a fila de escrita, que
+        o entrega a todo o lote.
+        """
+        if not self._alteradas:
+            return
+        alteradas, self._alteradas = sorted(self._alteradas), set()
+        try:
+            with medir('gravar'):
+                for chave in alteradas:
+                    particao = self._carregadas[chave]
+                    caminho = self._caminho_particao(chave)
+                    if len(particao):
+                        dados = json_dados(particao.gastos.values(), particao.diarias.values())
+                        gravar_json_atomico(caminho, dados)
+                        self._manifesto[chave] = particao.entrada(_hash(dados))
+                    else:
+                        self._manifesto.pop(chave, None)
+                        if os.path.exists(caminho):
+                            os.remove(caminho)
+                self._gravar_indice_e_manifesto()
+        except Exception:
+            # O que está em memória pode ter alterações que não chegaram ao disco
+            self._lido = None
+            self.carregar()
+            raise
+        finally:
+            self._liberar()
+
+    def _gravar_indice_e_manifesto(self):
+        """Acrescenta ao índice as linhas do lote e grava o manifesto que aponta para elas.
+
+        Sem índice ainda, com _onde corrigido por uma partição ou com mais de
+        duas linhas por registro, o índice inteiro vai para uma geração nova,
+        e a anterior é apagada depois do manifesto.
+        """
+        linhas, self._linhas = self._linhas, []
+        registros = sum(len(onde) for onde in self._onde.values())
+        anterior = self._indice
+        geracao = anterior['geracao'] if anterior is not None else 0
+        if (anterior is None or self._indice_corrigido
+                or self._linhas_indice + len(linhas) > max(2 * registros, MINIMO_COMPACTAR)):
+            geracao += 1
+            dados = b''.join(codificar(linha) + b'\n' for linha in self._linhas_atuais())
+            gravar_json_atomico(self._caminho_indice(geracao), dados)
+            self._indice = {'geracao': geracao, 'tamanho': len(dados)}
+            self._linhas_indice = registros
+        else:
+            dados = b''.join(codificar(linha) + b'\n' for linha in linhas)
+            with open(self._caminho_indice(geracao), 'ab') as f:
+                # Linhas de um lote que não chegou ao manifesto são descartadas
+                f.truncate(anterior['tamanho'])
+                f.write(dados)
+                f.flush()
+                os.fsync(f.fileno())
+            self._indice = {'geracao': geracao, 'tamanho': anterior['tamanho'] + len(dados)}
+            self._linhas_indice += len(linhas)
+        manifesto = {
+            'proximo_id': self._proximo_id,
+            'indice': self._indice,
+            'resumo': self._agregados.exportar(garantias=False, series=False),
+            'particoes': self._manifesto
+        }
+        gravar_json_atomico(self.caminho_manifesto, codificar(manifesto))
+        self._assinatura = _assinatura(self.caminho_manifesto)
+        self._lido = (geracao, self._indice['tamanho'])
+        self._indice_corrigido = False
+        self._legado = None
+        if anterior is not None and anterior['geracao'] != geracao:
+            caminho_anterior = self._caminho_indice(anterior['geracao'])
+            if os.path.exists(caminho_anterior):
+                os.remove(caminho_anterior)
+
+    def _linhas_atuais(self):
+        """O índice inteiro, uma linha por registro, na ordem de registro"""
+        for entidade, onde in self._onde.items():
+            for id, chave in onde.items():
+                if entidade == 'gastos':
+                    yield [entidade, id, chave, self._garantia_de.get(id)]
+                else:
+                    yield [entidade, id, chave]
+
+    def _alterar(self, entidade, antigo, novo):
+        """Troca antigo por novo (qualquer um pode ser None) nas partições, nos totais e no índice.
+
+        Uma data nova em outro mês leva o registro para a outra partição.
+        """
+        aplicar = 'aplicar_gasto' if entidade == 'gastos' else 'aplicar_diaria'
+        # As partições são lidas antes de mexer nos totais: uma partição que não bate com o
+        # manifesto refaz os totais da frota a partir delas (ver _recalcular_totais)
+        if antigo is not None:
+            id = antigo.get('id')
+            de = self._particao_alterada(self._onde[entidade].get(id) or chave_particao(antigo))
+        if novo is not None:
+            para = self._particao_alterada(chave_particao(novo))
+        getattr(self._agregados, aplicar)(antigo, novo)
+        if antigo is not None:
+            getattr(de.agregados, aplicar)(antigo, None)
+            de.registros(entidade).pop(id, None)
+        if novo is not None:
+            getattr(para.agregados, aplicar)(None, novo)
+            para.registros(entidade)[novo.get('id')] = novo
+            linha = _linha_indice(entidade, novo, para.chave)
+        else:
+            linha = [entidade, antigo.get('id')]
+        # Uma alteração (mesmo mudando de partição) mantém o lugar do registro; o
+        # índice de garantias já foi atualizado pelos agregados
+        self._aplicar_linha(linha)
+        self._linhas.append(linha)
+        self._ids_ordenados.pop(entidade, None)
+        self._versao += 1
+
+    def _particao_alterada(self, chave):
+        # Marcada antes de ser lida: uma partição alterada não é descartada
+        self._alteradas.add(chave)
+        return self._particao(chave)
+
+    def substituir(self, dados):
+        """Substitui todo o conteúdo (usado para gravar os dados iniciais e na migração)"""
+        return self._escritor.executar(lambda: self._substituir(dados))
+
+    def _substituir(self, dados):
+        por_chave = {}
+        modelos = {'gastos': [], 'diarias': []}
+        for gasto in dados.get('gastos', []):
+            gasto = como_gasto(gasto)
+            modelos['gastos'].append(gasto)
+            por_chave.setdefault(chave_particao(gasto), ([], []))[0].append(gasto)
+        for diaria in dados.get('diarias', []):
+            diaria = como_diaria(diaria)
+            modelos['diarias'].append(diaria)
+            por_chave.setdefault(chave_particao(diaria), ([], []))[1].append(diaria)
+        try:
+            with medir('gravar'):
+                particoes = {}
+                agregados = AgregadosFrota()
+                for chave, (gastos, diarias) in sorted(por_chave.items()):
+                    dados_particao = json_dados(gastos, diarias)
+                    gravar_json_atomico(self._caminho_particao(chave), dados_particao)
+                    particao = Particao(chave, gastos, diarias)
+                    particoes[chave] = particao.entrada(_hash(dados_particao))
+                    agregados.incorporar(particao.resumo())
+                for chave in set(self._manifesto) - set(particoes):
+                    if os.path.exists(self._caminho_particao(chave)):
+                        os.remove(self._caminho_particao(chave))
+                self._manifesto = particoes
+                # Índice novo, na ordem da lista recebida
+                self._onde = {'gastos': {}, 'diarias': {}}
+                self._garantia_de = {}
+                for entidade, registros in modelos.items():
+                    for registro in registros:
+                        if registro.get('id') is not None and registro.get('id') not in self._onde[entidade]:
+                            self._aplicar_linha(_linha_indice(entidade, registro, chave_particao(registro)))
+                agregados.garantias.reconstruir_datas(self._garantia_de.items())
+                self._agregados = agregados
+                self._linhas = []
+                self._indice_corrigido = True
+                ids = [g.get('id') for g in dados.get('gastos', []) if isinstance(g.get('id'), int)]
+                self._proximo_id = max(ids + [0]) + 1
+                self._gravar_indice_e_manifesto()
+        except Exception as e:
+            print(f"Erro ao salvar dados: {e}")
+            self._lido = None
+            self.carregar()
+            return False
+        self.carregar()
+        return True
+
+    def renovar_status_garantia(self, hoje):
+        """Regrava o status_garantia que mudou com a data. Retorna quantos gastos mudaram."""
+        return self._escritor.executar(lambda: self._renovar_status_garantia(hoje))
+
+    def _renovar_status_garantia(self, hoje):
+        # Só as partições com algum status que não vale mais hoje
+        chaves = [
+            chave for chave, entrada in self._manifesto.items()
+            if _precisa_renovar(entrada['status_garantias'], hoje)
+        ]
+        renovados = 0
+        for chave in chaves:
+            for id, gasto in list(self._particao(chave).gastos.items()):
+                if 'status_garantia' not in gasto or id != gasto.get('id'):
+                    continue
+                status = gasto.status_garantia_em(hoje)
+                if status != gasto['status_garantia']:
+                    self._atualizar_gasto(id, {'status_garantia': status})
+                    renovados += 1
+        return renovados
+
+    def inserir_gasto(self, gasto):
+        """Atribui um novo id ao gasto, adiciona e salva. Retorna o id."""
+        return self.inserir_gastos([gasto])[0]
+
+    def inserir_gastos(self, gastos):
+        """Insere um lote com ids consecutivos e uma única gravação. Retorna os ids."""
+        return self._escritor.executar(lambda: self._inserir_gastos(gastos))
+
+    def _inserir_gastos(self, gastos):
+        novos = [Gasto({**gasto, 'id': self._proximo_id + i}) for i, gasto in enumerate(gastos)]
+        # Valida o lote inteiro antes de alterar qualquer coisa
+        for novo_gasto in novos:
+            float(novo_gasto.get('valor', 0))
+        for novo_gasto in novos:
+            self._alterar('gastos', None, novo_gasto)
+        self._cache.invalidar(*novos)
+        self._proximo_id += len(novos)
+        return [g['id'] for g in novos]
+
+    def atualizar_gasto(self, id, atualizacoes):
+        """Mescla as atualizações no gasto. Retorna o gasto atualizado ou None."""
+        return self._escritor.executar(lambda: self._atualizar_gasto(id, atualizacoes))
+
+    def _atualizar_gasto(self, id, atualizacoes):
+        antigo = self._obter('gastos', id)
+        if antigo is None:
+            return None
+        # Só o valor enviado é validado: um registro antigo com valor inválido continua editável
+        if 'valor' in atualizacoes:
+            float(atualizacoes['valor'])
+        atualizado = antigo.alterar(atualizacoes)
+        self._alterar('gastos', antigo, atualizado)
+        self._cache.invalidar(antigo, atualizado)
+        return atualizado
+
+    def excluir_gasto(self, id):
+        return self._escritor.executar(lambda: self._excluir_gasto(id))
+
+    def _excluir_gasto(self, id):
+        antigo = self._obter('gastos', id)
+        if antigo is None:
+            return False
+        self._alterar('gastos', antigo, None)
+        self._cache.invalidar(antigo)
+        return True
+
+    def inserir_diaria(self, diaria):
+        return self.inserir_diarias([diaria])[0]
+
+    def inserir_diarias(self, diarias):
+        """Insere um lote de diárias com uma única gravação. Retorna as diárias gravadas."""
+        return self._escritor.executar(lambda: self._inserir_diarias(diarias))
+
+    def _inserir_diarias(self, diarias):
+        for diaria in diarias:
+            float(diaria.get('valor_total', 0))
+        gravadas = []
+        sufixos = {}  # id base -> próximo sufixo a tentar (lotes no mesmo segundo)
+        for diaria in diarias:
+            base = novo_id = diaria['id']
+            sufixo = sufixos.get(base, 2)
+            while novo_id in self._onde['diarias']:
+                novo_id = f"{base}-{sufixo}"
+                sufixo += 1
+            sufixos[base] = sufixo
+            diaria = Diaria({**diaria, 'id': novo_id})
+            self._alterar('diarias', None, diaria)
+            gravadas.append(diaria)
+        return gravadas
+
+    def atualizar_diaria(self, id, atualizacoes):
+        return self._escritor.executar(lambda: self._atualizar_diaria(id, atualizacoes))
+
+    def _atualizar_diaria(self, id, atualizacoes):
+        antiga = self._obter('diarias', id)
+        if antiga is None:
+            return None
+        if 'valor_total' in atualizacoes:
+            float(atualizacoes['valor_total'])
+        atualizada = antiga.alterar(atualizacoes)
+        self._alterar('diarias', antiga, atualizada)
+        return atualizada
+
+    def excluir_diaria(self, id):
+        return self._escritor.executar(lambda: self._excluir_diaria(id))
+
+    def _excluir_diaria(self, id):
+        antiga = self._obter('diarias', id)
+        if antiga is None:
+            return False
+        self._alterar('diarias', antiga, None)
+        return True
+
+
+
+def migrar_json(caminho_json, pasta, limite=LIMITE_PADRAO):
+    """Divide um gastos_veiculos.json em partições por mês"""
+    with open(caminho_json, 'rb') as f:
+        dados = decodificar(f.read())
+    repositorio = RepositorioParticionado(pasta, limite)
+    repositorio.substituir(dados)
+    print(f"📦 {len(dados.get('gastos', []))} gastos e {len(dados.get('diarias', []))} diárias "
+          f"migrados de {caminho_json} para {len(repositorio._manifesto)} partições em {pasta}")
+    return repositorio
+
+
+if __name__ == '__main__':
+    # Uso: python repositorio_particionado.py [gastos_veiculos.json] [gastos_veiculos.particoes]
+    origem = sys.argv[1] if len(sys.argv) > 1 else 'gastos_veiculos.json'
+    destino = sys.argv[2] if len(sys.argv) > 2 else 'gastos_veiculos.particoes'
+    migrar_json(origem, destino)
@@ -0,0 +1,485 @@
+# repositorio_sqlite.py - BACKEND SQLITE
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from agregados import AgregadosFrota
+from cache_analise import CacheAnalise, chave_filtros
+from codificacao import codificar, decodificar
+from escritor import EscritorUnico
+from metricas import medir, medido
+from modelos import Diaria, Gasto, como_diaria, como_gasto
+from calculos import CAMPOS_NUMERICOS, arredondar_valores, interpretar_ordenacao, normalizar_filtros
+from tendencias import calcular_tendencias
+
+# As colunas indexadas são extraídas do registro; o registro completo fica em
+# 'registro' (JSON) para que a API devolva exatamente o que foi gravado.
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS gastos (
+    id INTEGER UNIQUE,
+    data TEXT,
+    ano TEXT,
+    mes TEXT,
+    veiculo TEXT,
+    placa TEXT,
+    motorista TEXT,
+    tipo_gasto TEXT,
+    valor REAL NOT NULL DEFAULT 0,
+    garantia_validade TEXT,
+    servico INTEGER NOT NULL DEFAULT 0,
+    registro TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_gastos_placa ON gastos(placa);
+CREATE INDEX IF NOT EXISTS idx_gastos_motorista ON gastos(motorista);
+CREATE INDEX IF NOT EXISTS idx_gastos_veiculo ON gastos(veiculo);
+CREATE INDEX IF NOT EXISTS idx_gastos_tipo_gasto ON gastos(tipo_gasto);
+CREATE INDEX IF NOT EXISTS idx_gastos_data ON gastos(data);
+CREATE INDEX IF NOT EXISTS idx_gastos_ano_mes ON gastos(ano, mes);
+CREATE INDEX IF NOT EXISTS idx_gastos_servico ON gastos(servico) WHERE servico = 1;
+CREATE INDEX IF NOT EXISTS idx_gastos_garantia ON gastos(garantia_validade) WHERE servico = 1;
+
+CREATE TABLE IF NOT EXISTS diarias (
+    id TEXT UNIQUE,
+    motorista TEXT,
+    data_inicio TEXT,
+    valor_total REAL NOT NULL DEFAULT 0,
+    registro TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_diarias_motorista ON diarias(motorista);
+CREATE INDEX IF NOT EXISTS idx_diarias_data_inicio ON diarias(data_inicio);
+"""
+
+
+def _colunas_gasto(gasto):
+    """Valores das colunas indexadas de um gasto (ver modelos.Gasto)"""
+    return {
+        'id': gasto.get('id'),
+        'data': gasto.get('data') or None,
+        'ano': gasto.ano,
+        'mes': gasto.mes,
+        'veiculo': gasto.get('veiculo'),
+        'placa': gasto.get('placa'),
+        'motorista': gasto.get('motorista'),
+        'tipo_gasto': gasto.get('tipo_gasto'),
+        # Já convertido pelo modelo (texto inválido conta como 0, como nos outros backends)
+        'valor': gasto.valor,
+        # Normalizada (AAAA-MM-DD) para a busca por intervalo; inválida vira NULL
+        'garantia_validade': gasto.garantia,
+        'servico': 1 if gasto.servico else 0,
+        'registro': codificar(gasto).decode('utf-8')
+    }
+
+
+def _colunas_diaria(diaria):
+    return {
+        'id': diaria.get('id'),
+        'motorista': diaria.get('motorista'),
+        'data_inicio': diaria.get('data_inicio') or None,
+        'valor_total': diaria.valor_total,
+        'registro': codificar(diaria).decode('utf-8')
+    }
+
+
+def _where_filtros(filtros):
+    """Traduz os filtros da análise para uma cláusula WHERE com parâmetros"""
+    filtros = normalizar_filtros(filtros)
+    condicoes = []
+    parametros = []
+    for campo in ('veiculo', 'placa', 'motorista'):
+        if filtros.get(campo):
+            condicoes.append(f"{campo} = ?")
+            parametros.append(filtros[campo])
+    # Gastos sem data passam pelos filtros de ano/mês, como em aplicar_filtros
+    for campo in ('ano', 'mes'):
+        if filtros.get(campo):
+            condicoes.append(f"({campo} IS NULL OR {campo} = ?)")
+            parametros.append(filtros[campo])
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    return where, parametros
+
+
+class RepositorioSQLite:
+    """Backend 'sqlite': gastos e diárias em um banco SQLite com índices.
+
+    Tem os mesmos métodos públicos de RepositorioDados; filtros e agrupamentos
+    da análise com filtros são executados pelo próprio SQLite. Os totais sem
+    filtros vêm de AgregadosFrota, recalculados apenas quando outra conexão
+    grava no banco (PRAGMA data_version).
+
+    As alterações passam pela mesma fila de escrita do backend em memória (ver
+    escritor.py): cada lote vira uma transação BEGIN IMMEDIATE, que já trava
+    o banco para os outros processos, com um SAVEPOINT por alteração.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.RLock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.execute('PRAGMA journal_mode=WAL')
+        self._conexao.executescript(ESQUEMA)
+        self._agregados = AgregadosFrota()
+        self._cache = CacheAnalise()
+        self._versao_banco = None
+        # Aumenta a cada alteração deste processo ou de outra conexão (ETags)
+        self._versao = 0
+        self._agregados_em_dia()
+        self._escritor = EscritorUnico(self._transacao)
+
+    def _agregados_em_dia(self):
+        """Devolve os agregados, reconstruindo-os se outro processo alterou o banco"""
+        with self._lock:
+            [(versao,)] = self._conexao.execute('PRAGMA data_version').fetchall()
+            if versao != self._versao_banco:
+                with medir('carregar'):
+                    self._agregados.reconstruir(self.listar_gastos(), self.listar_diarias())
+                self._versao_banco = versao
+                self._cache.limpar()
+                self._versao += 1
+            return self._agregados
+
+    def _consultar(self, sql, parametros=()):
+        with self._lock:
+            return self._conexao.execute(sql, parametros).fetchall()
+
+    def _registros(self, sql, parametros=(), modelo=Gasto):
+        return [modelo(decodificar(linha[0])) for linha in self._consultar(sql, parametros)]
+
+    def _gravar_gasto(self, gasto):
+        colunas = _colunas_gasto(gasto)
+        nomes = ', '.join(colunas)
+        marcadores = ', '.join(f":{nome}" for nome in colunas)
+        atualizacao = ', '.join(f"{nome} = excluded.{nome}" for nome in colunas if nome != 'id')
+        self._conexao.execute(
+            f"INSERT INTO gastos ({nomes}) VALUES ({marcadores}) ON CONFLICT(id) DO UPDATE SET {atualizacao}",
+            colunas
+        )
+
+    def _gravar_diaria(self, diaria):
+        colunas = _colunas_diaria(diaria)
+        nomes = ', '.join(colunas)
+        marcadores = ', '.join(f":{nome}" for nome in colunas)
+        atualizacao = ', '.join(f"{nome} = excluded.{nome}" for nome in colunas if nome != 'id')
+        self._conexao.execute(
+            f"INSERT INTO diarias ({nomes}) VALUES ({marcadores}) ON CONFLICT(id) DO UPDATE SET {atualizacao}",
+            colunas
+        )
+
+    @contextmanager
+    def _transacao(self):
+        """Um lote da fila de escrita: uma transação, com commit no final"""
+        with self._lock:
+            self._conexao.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+                with medir('gravar'):
+                    self._conexao.commit()
+            except BaseException:
+                self._conexao.rollback()
+                # Os agregados em memória podem ter recebido alterações desfeitas
+                self._versao_banco = None
+                raise
+
+    @contextmanager
+    def _alteracao(self):
+        """SAVEPOINT de uma alteração: se ela falhar, as outras do lote seguem"""
+        self._conexao.execute('SAVEPOINT alteracao')
+        try:
+            yield
+        except BaseException:
+            self._conexao.execute('ROLLBACK TO alteracao')
+            raise
+        finally:
+            self._conexao.execute('RELEASE alteracao')
+
+    def substituir(self, dados):
+        """Substitui todo o conteúdo do banco em uma única transação"""
+        return self._escritor.executar(lambda: self._substituir(dados))
+
+    def _substituir(self, dados):
+        gastos = [como_gasto(gasto) for gasto in dados.get('gastos', [])]
+        diarias = [como_diaria(diaria) for diaria in dados.get('diarias', [])]
+        with self._alteracao():
+            self._conexao.execute('DELETE FROM gastos')
+            self._conexao.execute('DELETE FROM diarias')
+            for gasto in gastos:
+                self._gravar_gasto(gasto)
+            for diaria in diarias:
+                self._gravar_diaria(diaria)
+        self._agregados.reconstruir(gastos, diarias)
+        self._cache.limpar()
+        self._versao += 1
+        return True
+
+    # ------------------------------------
+    # Consultas
+    # ------------------------------------
+    def versao(self):
+        """Número que muda sempre que os dados mudam"""
+        with self._lock:
+            self._agregados_em_dia()
+            return self._versao
+
+    def listar_gastos(self):
+        return self._registros('SELECT registro FROM gastos ORDER BY rowid')
+
+    def listar_diarias(self):
+        return self._registros('SELECT registro FROM diarias ORDER BY rowid', modelo=Diaria)
+
+    def obter_gasto(self, id):
+        registros = self._registros('SELECT registro FROM gastos WHERE id = ?', (id,))
+        return registros[0] if registros else None
+
+    def obter_diaria(self, id):
+        registros = self._registros('SELECT registro FROM diarias WHERE id = ?', (id,), Diaria)
+        return registros[0] if registros else None
+
+    def esta_vazio(self):
+        return not self._consultar('SELECT 1 FROM gastos UNION ALL SELECT 1 FROM diarias LIMIT 1')
+
+    def listar_servicos(self):
+        return self._registros('SELECT registro FROM gastos WHERE servico = 1 ORDER BY rowid')
+
+    def pagina(self, entidade, ordenar=None, limite=None, offset=0):
+        """Uma página de 'gastos', 'diarias' ou 'servicos'. Retorna (total, registros)."""
+        tabela = 'diarias' if entidade == 'diarias' else 'gastos'
+        where = 'WHERE servico = 1' if entidade == 'servicos' else ''
+        ordem = 'rowid'
+        if ordenar:
+            # O campo vem de CAMPOS_ORDENACAO, nunca direto da requisição
+            campo, decrescente = interpretar_ordenacao(entidade, ordenar)
+            expressao = campo if campo in CAMPOS_NUMERICOS else f"COALESCE({campo}, '')"
+            ordem = f"{expressao} {'DESC' if decrescente else 'ASC'}, rowid"
+        with self._lock:
+            [(total,)] = self._consultar(f"SELECT COUNT(*) FROM {tabela} {where}")
+            registros = self._registros(
+                f"SELECT registro FROM {tabela} {where} ORDER BY {ordem} LIMIT ? OFFSET ?",
+                (-1 if limite is None else limite, offset),
+                Diaria if tabela == 'diarias' else Gasto
+            )
+        return total, registros
+
+    @medido('filtrar')
+    def filtrar_gastos(self, filtros):
+        where, parametros = _where_filtros(filtros)
+        return self._registros(f"SELECT registro FROM gastos {where} ORDER BY rowid", parametros)
+
+    def _somar_por(self, expressao, where, parametros):
+        linhas = self._consultar(f"SELECT {expressao}, SUM(valor) FROM gastos {where} GROUP BY 1", parametros)
+        return dict(linhas)
+
+    def analise(self, filtros):
+        with self._lock:
+            agregados = self._agregados_em_dia()
+            chave = chave_filtros(filtros)
+            if not chave:
+                return {'gastos': agregados.analise_gastos(), 'diarias': agregados.analise_diarias()}
+            gastos = self._cache.obter(chave)
+            if gastos is None:
+                gastos = self._analise_filtrada(filtros)
+                self._cache.guardar(chave, gastos)
+            return {'gastos': gastos, 'diarias': agregados.analise_diarias()}
+
+    @medido('agregar')
+    def _analise_filtrada(self, filtros):
+        """Agrupamentos dos gastos filtrados, calculados pelo SQLite"""
+        where, parametros = _where_filtros(filtros)
+        return {
+            'por_tipo': arredondar_valores(self._somar_por("COALESCE(tipo_gasto, 'Outros')", where, parametros)),
+            'por_veiculo': arredondar_valores(self._somar_por("COALESCE(veiculo, 'Não Informado')", where, parametros)),
+            'por_placa': arredondar_valores(self._somar_por("COALESCE(placa, 'Sem Placa')", where, parametros)),
+            'mensal': arredondar_valores(
+                self._somar_por('substr(data, 1, 7)', f"{where} AND data IS NOT NULL", parametros), ordenar=True)
+        }
+
+    def estatisticas_cache(self):
+        with self._lock:
+            return self._cache.estatisticas()
+
+    def resumo_dashboard(self, mes_atual):
+        with self._lock:
+            agregados = self._agregados_em_dia()
+            with medir('agregar'):
+                return agregados.resumo_dashboard(mes_atual)
+
+    def tendencias(self, **parametros):
+        """Séries mensais com médias móveis e outliers (ver tendencias.calcular_tendencias)"""
+        with self._lock:
+            agregados = self._agregados_em_dia()
+            with medir('agregar'):
+                return calcular_tendencias(agregados, **parametros)
+
+    def exportar_agregados(self, garantias=True, series=True):
+        """(versão, AgregadosFrota.exportar()) lidos juntos, para somar com outras frotas (ver frotas.py)"""
+        with self._lock:
+            agregados = self._agregados_em_dia()
+            return self._versao, agregados.exportar(garantias, series)
+
+    def opcoes_filtros(self):
+        with self._lock:
+            return self._agregados_em_dia().opcoes_filtros()
+
+    def resumo_garantias(self, hoje):
+        with self._lock:
+            return self._agregados_em_dia().resumo_garantias(hoje)
+
+    def servicos_vencendo(self, inicio, fim):
+        """Serviços com garantia de inicio até fim ('AAAA-MM-DD'), por data e depois por registro"""
+        return self._registros(
+            'SELECT registro FROM gastos WHERE servico = 1 AND garantia_validade BETWEEN ? AND ? '
+            'ORDER BY garantia_validade, rowid',
+            (inicio, fim)
+        )
+
+    def renovar_status_garantia(self, hoje):
+        """Regrava o status_garantia que mudou com a data. Retorna quantos gastos mudaram."""
+        return self._escritor.executar(lambda: self._renovar_status_garantia(hoje))
+
+    def _renovar_status_garantia(self, hoje):
+        renovados = 0
+        for gasto in self.listar_gastos():
+            if 'status_garantia' not in gasto or gasto.get('id') is None:
+                continue
+            status = gasto.status_garantia_em(hoje)
+            if status != gasto['status_garantia']:
+                self._atualizar_gasto(gasto['id'], {'status_garantia': status})
+                renovados += 1
+        return renovados
+
+    # ------------------------------------
+    # Alterações (pela fila de escrita, ver escritor.py)
+    # ------------------------------------
+    def inserir_gasto(self, gasto):
+        """Atribui um novo id ao gasto, adiciona e salva. Retorna o id."""
+        return self.inserir_gastos([gasto])[0]
+
+    def inserir_gastos(self, gastos):
+        """Insere um lote com ids consecutivos em uma única transação. Retorna os ids."""
+        return self._escritor.executar(lambda: self._inserir_gastos(gastos))
+
+    def _inserir_gastos(self, gastos):
+        # Valida o lote inteiro antes de gravar qualquer coisa (como nos outros backends)
+        for gasto in gastos:
+            float(gasto.get('valor', 0))
+        agregados = self._agregados_em_dia()
+        with self._alteracao():
+            # Sob BEGIN IMMEDIATE nenhum outro processo grava: o MAX(id) não se repete
+            [(primeiro_id,)] = self._conexao.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM gastos').fetchall()
+            novos = [Gasto({**gasto, 'id': primeiro_id + i}) for i, gasto in enumerate(gastos)]
+            for novo_gasto in novos:
+                self._gravar_gasto(novo_gasto)
+        for novo_gasto in novos:
+            agregados.aplicar_gasto(None, novo_gasto)
+        self._cache.invalidar(*novos)
+        self._versao += 1
+        return [g['id'] for g in novos]
+
+    def atualizar_gasto(self, id, atualizacoes):
+        return self._escritor.executar(lambda: self._atualizar_gasto(id, atualizacoes))
+
+    def _atualizar_gasto(self, id, atualizacoes):
+        agregados = self._agregados_em_dia()
+        antigo = self.obter_gasto(id)
+        if antigo is None:
+            return None
+        # Só o valor enviado é validado: um registro antigo com valor inválido continua editável
+        if 'valor' in atualizacoes:
+            float(atualizacoes['valor'])
+        gasto = antigo.alterar(atualizacoes)
+        with self._alteracao():
+            self._gravar_gasto(gasto)
+        agregados.aplicar_gasto(antigo, gasto)
+        self._cache.invalidar(antigo, gasto)
+        self._versao += 1
+        return gasto
+
+    def excluir_gasto(self, id):
+        return self._escritor.executar(lambda: self._excluir_gasto(id))
+
+    def _excluir_gasto(self, id):
+        agregados = self._agregados_em_dia()
+        antigo = self.obter_gasto(id)
+        if antigo is None:
+            return False
+        self._conexao.execute('DELETE FROM gastos WHERE id = ?', (id,))
+        agregados.aplicar_gasto(antigo, None)
+        self._cache.invalidar(antigo)
+        self._versao += 1
+        return True
+
+    def inserir_diaria(self, diaria):
+        return self.inserir_diarias([diaria])[0]
+
+    def inserir_diarias(self, diarias):
+        """Insere um lote de diárias em uma única transação. Retorna as diárias gravadas."""
+        return self._escritor.executar(lambda: self._inserir_diarias(diarias))
+
+    def _inserir_diarias(self, diarias):
+        for diaria in diarias:
+            float(diaria.get('valor_total', 0))
+        agregados = self._agregados_em_dia()
+        gravadas = []
+        sufixos = {}  # id base -> próximo sufixo a tentar (lotes no mesmo segundo)
+        with self._alteracao():
+            for diaria in diarias:
+                base = novo_id = diaria['id']
+                sufixo = sufixos.get(base, 2)
+                while self._conexao.execute('SELECT 1 FROM diarias WHERE id = ?', (novo_id,)).fetchone():
+                    novo_id = f"{base}-{sufixo}"
+                    sufixo += 1
+                sufixos[base] = sufixo
+                diaria = Diaria({**diaria, 'id': novo_id})
+                self._gravar_diaria(diaria)
+                gravadas.append(diaria)
+        for diaria in gravadas:
+            agregados.aplicar_diaria(None, diaria)
+        self._versao += 1
+        return gravadas
+
+    def atualizar_diaria(self, id, atualizacoes):
+        return self._escritor.executar(lambda: self._atualizar_diaria(id, atualizacoes))
+
+    def _atualizar_diaria(self, id, atualizacoes):
+        agregados = self._agregados_em_dia()
+        antiga = self.obter_diaria(id)
+        if antiga is None:
+            return None
+        if 'valor_total' in atualizacoes:
+            float(atualizacoes['valor_total'])
+        diaria = antiga.alterar(atualizacoes)
+        with self._alteracao():
+            self._gravar_diaria(diaria)
+        agregados.aplicar_diaria(antiga, diaria)
+        self._versao += 1
+        return diaria
+
+    def excluir_diaria(self, id):
+        return self._escritor.executar(lambda: self._excluir_diaria(id))
+
+    def _excluir_diaria(self, id):
+        agregados = self._agregados_em_dia()
+        antiga = self.obter_diaria(id)
+        if antiga is None:
+            return False
+        self._conexao.execute('DELETE FROM diarias WHERE id = ?', (id,))
+        agregados.aplicar_diaria(antiga, None)
+        self._versao += 1
+        return True
+
+
+def migrar_json(caminho_json, caminho_db):
+    """Copia o conteúdo de um gastos_veiculos.json para o banco SQLite"""
+    with open(caminho_json, 'rb') as f:
+        dados = decodificar(f.read())
+    repositorio = RepositorioSQLite(caminho_db)
+    repositorio.substituir(dados)
+    print(f"📦 {len(dados.get('gastos', []))} gastos e {len(dados.get('diarias', []))} diárias "
+          f"migrados de {caminho_json} para {caminho_db}")
+    return repositorio
+
+
+if __name__ == '__main__':
+    # Uso: python repositorio_sqlite.py [gastos_veiculos.json] [gastos_veiculos.db]
+    origem = sys.argv[1] if len(sys.argv) > 1 else 'gastos_veiculos.json'
+    destino = sys.argv[2] if len(sys.argv) > 2 else 'gastos_veiculos.db'
+    migrar_json(origem, destino)
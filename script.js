@@ -1,5 +1,9 @@
 // Configuração
-const API_BASE = 'http://127.0.0.1:5000/api';
+// A frota vem da página (index.html?frota=norte); sem ela, a frota padrão
+const FROTA = new URLSearchParams(window.location.search).get('frota');
+const API_BASE = FROTA
+    ? `http://127.0.0.1:5000/api/frotas/${encodeURIComponent(FROTA)}`
+    : 'http://127.0.0.1:5000/api';
 let dadosAnalise = {};
 let graficos = {};
 
@@ -43,12 +47,184 @@ function openTab(event, tabName) {
     }
 }
 
+// ===== CACHE HTTP (ETag) =====
+// Guarda a última resposta de cada URL de leitura. O servidor responde 304
+// (sem corpo e sem recalcular nada) quando os dados não mudaram desde então.
+const cacheRespostas = new Map();
+
+async function buscarComCache(url) {
+    const anterior = cacheRespostas.get(url);
+    const headers = anterior ? { 'If-None-Match': anterior.etag } : {};
+    const response = await fetch(url, { headers });
+    
+    if (response.status === 304 && anterior) {
+        return new Response(anterior.corpo, {
+            status: 200,
+            headers: { 'Content-Type': 'application/json' }
+        });
+    }
+    
+    const etag = response.headers.get('ETag');
+    if (response.ok && etag) {
+        cacheRespostas.set(url, { etag, corpo: await response.clone().text() });
+    }
+    return response;
+}
+
+// ===== ATUALIZAÇÕES EM TEMPO REAL (SSE) =====
+// O servidor avisa por /api/stream cada alteração feita por qualquer aba ou
+// usuário, já com o registro alterado. As linhas da página aberta são
+// corrigidas no lugar; só os totais (dashboard, resumo, análise) são buscados
+// de novo, uma vez por rajada de alterações. Sem o stream conectado, cada
+// tela volta a recarregar tudo depois das próprias alterações.
+let streamConectado = false;
+const recargasPendentes = new Set();
+let temporizadorRecarga = null;
+// Página aberta de cada tabela, como veio do servidor (preenchida ao carregar)
+const estadoTabelas = { servicos: null, diarias: null };
+
+function iniciarStream() {
+    if (!window.EventSource) return;
+    const stream = new EventSource(`${API_BASE}/stream`);
+    stream.onopen = () => { streamConectado = true; };
+    // O navegador reconecta sozinho e o servidor reenvia o que foi perdido
+    stream.onerror = () => { streamConectado = false; };
+    stream.addEventListener('alteracao', (e) => aplicarAlteracao(JSON.parse(e.data)));
+    stream.addEventListener('recarregar', () => {
+        console.log('🔄 Dados alterados fora deste servidor, recarregando...');
+        agendarRecarga('dashboard', 'servicos', 'diarias', 'analise', 'filtros');
+    });
+}
+
+function agendarRecarga(...partes) {
+    partes.forEach(parte => recargasPendentes.add(parte));
+    if (temporizadorRecarga) return;
+    temporizadorRecarga = setTimeout(() => {
+        temporizadorRecarga = null;
+        const partesAgendadas = new Set(recargasPendentes);
+        recargasPendentes.clear();
+        if (partesAgendadas.has('dashboard')) carregarDashboard();
+        // Tabelas ainda não abertas são carregadas ao abrir a aba
+        if (partesAgendadas.has('servicos') && estadoTabelas.servicos) {
+            carregarServicos();
+        } else if (partesAgendadas.has('resumo-servicos') && estadoTabelas.servicos) {
+            atualizarResumoServicos();
+        }
+        if (partesAgendadas.has('diarias') && estadoTabelas.diarias) carregarDiarias();
+        if (document.getElementById('tab-analise').classList.contains('active')) {
+            if (partesAgendadas.has('filtros')) carregarFiltros();
+            if (partesAgendadas.has('analise')) carregarAnalise();
+        }
+    }, 300);
+}
+
+function aplicarAlteracao(evento) {
+    agendarRecarga('dashboard');
+    const emLote = evento.operacao === 'importar' || evento.operacao === 'renovar';
+    if (evento.entidade === 'gastos') {
+        if (emLote) {
+            agendarRecarga('servicos', 'analise', 'filtros');
+            return;
+        }
+        if (evento.servico || evento.operacao !== 'inserir') {
+            corrigirPagina('servicos', evento, Boolean(evento.servico));
+        }
+        agendarRecarga('analise');
+        if (evento.registro && filtrosSemValor(evento.registro)) agendarRecarga('filtros');
+    } else if (emLote) {
+        agendarRecarga('diarias');
+    } else {
+        corrigirPagina('diarias', evento, evento.operacao !== 'excluir');
+    }
+}
+
+// Aplica o evento à página aberta. As listas seguem a ordem dos ids, então um
+// registro novo vai para o fim e uma mudança antes da página a desloca.
+function corrigirPagina(tabela, evento, naLista) {
+    const estado = estadoTabelas[tabela];
+    if (!estado) return;
+    const registros = estado.registros;
+    const paginacao = estado.paginacao;
+    const posicao = registros.findIndex(r => r.id === evento.id);
+    const ultimoId = registros.length ? registros[registros.length - 1].id : undefined;
+
+    if (posicao >= 0 && naLista) {
+        registros[posicao] = projetarCampos(tabela, evento.registro);
+    } else if (posicao < 0 && naLista && evento.operacao === 'inserir') {
+        if (paginacao.offset + registros.length === paginacao.total && registros.length < TAMANHO_PAGINA) {
+            registros.push(projetarCampos(tabela, evento.registro));
+        }
+        paginacao.total += 1;
+    } else if (posicao >= 0 || (ultimoId !== undefined && evento.id < ultimoId)) {
+        // Saiu da página, ou entrou/saiu antes dela: a página inteira muda
+        agendarRecarga(tabela);
+        return;
+    } else if (tabela === 'diarias' && evento.operacao === 'excluir') {
+        paginacao.total -= 1;
+    } else if (tabela === 'diarias') {
+        return;
+    }
+    if (tabela === 'servicos') {
+        // Vigentes/vencidas e total vêm do servidor (sem a lista)
+        agendarRecarga('resumo-servicos');
+    }
+    desenharTabela(tabela);
+}
+
+function projetarCampos(tabela, registro) {
+    const projetado = {};
+    CAMPOS_TABELA[tabela].split(',').forEach(campo => {
+        if (campo in registro) projetado[campo] = registro[campo];
+    });
+    return projetado;
+}
+
+function desenharTabela(tabela) {
+    const estado = estadoTabelas[tabela];
+    if (tabela === 'servicos') {
+        renderizarServicos(estado.registros, estado.resumo, estado.paginacao);
+    } else {
+        renderizarDiarias(estado.registros);
+        const controles = document.getElementById('paginacao-diarias');
+        if (controles) controles.innerHTML = htmlPaginacao('diarias', estado.paginacao);
+    }
+}
+
+async function atualizarResumoServicos() {
+    try {
+        const response = await buscarComCache(`${API_BASE}/servicos?limit=0`);
+        const data = await response.json();
+        const estado = estadoTabelas.servicos;
+        if (data.status !== 'sucesso' || !estado) return;
+        estado.resumo = data.resumo;
+        estado.paginacao.total = data.paginacao.total;
+        desenharTabela('servicos');
+    } catch (error) {
+        console.error('❌ Erro ao atualizar resumo dos serviços:', error);
+    }
+}
+
+// Veículo, placa, motorista ou ano que ainda não está nos filtros da análise
+function filtrosSemValor(gasto) {
+    const valores = {
+        'filtro-veiculo': gasto.veiculo,
+        'filtro-placa': gasto.placa,
+        'filtro-motorista': gasto.motorista,
+        'filtro-ano': (gasto.data || '').slice(0, 4)
+    };
+    return Object.entries(valores).some(([selectId, valor]) => {
+        const select = document.getElementById(selectId);
+        return valor && select && select.options.length > 1 &&
+            !Array.from(select.options).some(opcao => opcao.value === String(valor));
+    });
+}
+
 // ===== DASHBOARD =====
 async function carregarDashboard() {
     try {
         console.log('📊 Iniciando carregamento do dashboard...');
         
-        const response = await fetch(`${API_BASE}/dashboard`);
+        const response = await buscarComCache(`${API_BASE}/dashboard`);
         
         if (!response.ok) {
             throw new Error(`Erro HTTP: ${response.status} ${response.statusText}`);
@@ -153,10 +329,13 @@ async function registrarGasto() {
         if (result.status === 'sucesso') {
             showAlert('success', result.mensagem);
             limparFormGasto();
-            carregarServicos();
-            carregarDashboard();
-            if (document.getElementById('tab-analise').classList.contains('active')) {
-                carregarAnalise();
+            // Com o stream, a alteração volta como evento (ver aplicarAlteracao)
+            if (!streamConectado) {
+                carregarServicos();
+                carregarDashboard();
+                if (document.getElementById('tab-analise').classList.contains('active')) {
+                    carregarAnalise();
+                }
             }
         } else {
             showAlert('error', result.mensagem);
@@ -175,11 +354,11 @@ function limparFormGasto() {
 
 async function editarGasto(id) {
     try {
-        const response = await fetch(`${API_BASE}/gastos`);
+        const response = await buscarComCache(`${API_BASE}/gastos/${id}`);
         const data = await response.json();
         
         if (data.status === 'sucesso') {
-            const gasto = data.gastos.find(g => g.id === id);
+            const gasto = data.gasto;
             if (gasto) {
                 // Preenche o formulário
                 Object.keys(gasto).forEach(key => {
@@ -217,10 +396,12 @@ async function excluirGasto(id) {
             
             if (result.status === 'sucesso') {
                 showAlert('success', result.mensagem);
-                carregarServicos();
-                carregarDashboard();
-                if (document.getElementById('tab-analise').classList.contains('active')) {
-                    carregarAnalise();
+                if (!streamConectado) {
+                    carregarServicos();
+                    carregarDashboard();
+                    if (document.getElementById('tab-analise').classList.contains('active')) {
+                        carregarAnalise();
+                    }
                 }
             } else {
                 showAlert('error', result.mensagem);
@@ -231,11 +412,59 @@ async function excluirGasto(id) {
     }
 }
 
+// ===== PAGINAÇÃO DAS TABELAS =====
+// As listas vêm do servidor uma página por vez, só com as colunas exibidas
+const TAMANHO_PAGINA = 50;
+const paginas = { servicos: 0, diarias: 0 };
+const CAMPOS_TABELA = {
+    servicos: 'id,data,veiculo,placa,motorista,valor,os_numero,garantia_validade,status_garantia',
+    diarias: 'id,motorista,data_inicio,data_fim,dias_uteis,valor_diaria_unitaria,valor_total,observacoes'
+};
+
+function urlPagina(tabela) {
+    const params = new URLSearchParams({
+        limit: TAMANHO_PAGINA,
+        offset: paginas[tabela] * TAMANHO_PAGINA,
+        fields: CAMPOS_TABELA[tabela]
+    });
+    return `${API_BASE}/${tabela}?${params.toString()}`;
+}
+
+function htmlPaginacao(tabela, paginacao) {
+    if (!paginacao || paginacao.total <= TAMANHO_PAGINA) return '';
+    const totalPaginas = Math.ceil(paginacao.total / TAMANHO_PAGINA);
+    const atual = paginas[tabela];
+    return `
+        <div class="paginacao">
+            <button type="button" class="secondary" onclick="mudarPagina('${tabela}', -1)" ${atual === 0 ? 'disabled' : ''}>◀ Anterior</button>
+            <span>Página ${atual + 1} de ${totalPaginas} (${paginacao.total} registros)</span>
+            <button type="button" class="secondary" onclick="mudarPagina('${tabela}', 1)" ${atual + 1 >= totalPaginas ? 'disabled' : ''}>Próxima ▶</button>
+        </div>`;
+}
+
+function mudarPagina(tabela, passo) {
+    paginas[tabela] = Math.max(0, paginas[tabela] + passo);
+    if (tabela === 'servicos') {
+        carregarServicos();
+    } else {
+        carregarDiarias();
+    }
+}
+
+// Se a página atual ficou vazia (ex.: após exclusão), volta para a última com dados
+function paginaForaDoTotal(tabela, paginacao) {
+    if (paginas[tabela] > 0 && paginacao && paginacao.offset >= paginacao.total) {
+        paginas[tabela] = Math.max(0, Math.ceil(paginacao.total / TAMANHO_PAGINA) - 1);
+        return true;
+    }
+    return false;
+}
+
 // ===== GERENCIAMENTO DE SERVIÇOS (Manutenção do código existente) =====
 async function carregarServicos() {
     try {
         console.log('📡 Carregando serviços...');
-        const response = await fetch(`${API_BASE}/servicos`);
+        const response = await buscarComCache(urlPagina('servicos'));
         
         if (!response.ok) {
             throw new Error(`Erro HTTP: ${response.status}`);
@@ -244,7 +473,9 @@ async function carregarServicos() {
         const data = await response.json();
         
         if (data.status === 'sucesso') {
-            renderizarServicos(data.servicos, data.resumo);
+            if (paginaForaDoTotal('servicos', data.paginacao)) return carregarServicos();
+            estadoTabelas.servicos = { registros: data.servicos, resumo: data.resumo, paginacao: data.paginacao };
+            renderizarServicos(data.servicos, data.resumo, data.paginacao);
         } else {
             elements.servicosLista.innerHTML = `<div class="alert alert-error">${data.mensagem}</div>`;
         }
@@ -258,7 +489,7 @@ async function carregarServicos() {
     }
 }
 
-function renderizarServicos(servicos, resumo) {
+function renderizarServicos(servicos, resumo, paginacao) {
     if (!servicos || servicos.length === 0) {
         elements.servicosLista.innerHTML = '<div class="alert alert-info">Nenhum serviço de manutenção registrado.</div>';
         return;
@@ -309,6 +540,7 @@ function renderizarServicos(servicos, resumo) {
     });
 
     html += '</tbody></table></div>';
+    html += htmlPaginacao('servicos', paginacao);
     elements.servicosLista.innerHTML = html;
 }
 
@@ -392,8 +624,10 @@ async function registrarDiaria() {
         if (result.status === 'sucesso') {
             showAlert('success', result.mensagem);
             limparFormDiaria();
-            carregarDiarias();
-            carregarDashboard();
+            if (!streamConectado) {
+                carregarDiarias();
+                carregarDashboard();
+            }
         } else {
             showAlert('error', result.mensagem);
         }
@@ -411,7 +645,7 @@ async function carregarDiarias() {
         const loading = document.querySelector('#lista-diarias .loading');
         if (loading) loading.style.display = 'block';
 
-        const response = await fetch(`${API_BASE}/diarias`);
+        const response = await buscarComCache(urlPagina('diarias'));
         const data = await response.json();
         
         // Esconde loading e mostra tabela
@@ -419,7 +653,11 @@ async function carregarDiarias() {
         if (tabela) tabela.style.display = 'table';
         
         if (data.status === 'sucesso') {
+            if (paginaForaDoTotal('diarias', data.paginacao)) return carregarDiarias();
+            estadoTabelas.diarias = { registros: data.diarias, paginacao: data.paginacao };
             renderizarDiarias(data.diarias);
+            const controles = document.getElementById('paginacao-diarias');
+            if (controles) controles.innerHTML = htmlPaginacao('diarias', data.paginacao);
         } else {
             elements.diariasLista.innerHTML = `<div class="alert alert-error">${data.mensagem}</div>`;
         }
@@ -515,8 +753,10 @@ async function excluirDiaria(id) {
             
             if (result.status === 'sucesso') {
                 showAlert('success', result.mensagem);
-                carregarDiarias();
-                carregarDashboard();
+                if (!streamConectado) {
+                    carregarDiarias();
+                    carregarDashboard();
+                }
             } else {
                 showAlert('error', result.mensagem || `Erro ao excluir diária ID ${id}.`);
             }
@@ -543,7 +783,7 @@ async function carregarAnalise() {
 
     try {
         // Envia a URL com os filtros para o backend
-        const response = await fetch(`${API_BASE}/analise?${queryString}`);
+        const response = await buscarComCache(`${API_BASE}/analise?${queryString}`);
         
         if (!response.ok) {
              throw new Error(`Erro HTTP: ${response.status}`);
@@ -554,6 +794,7 @@ async function carregarAnalise() {
         if (data.status === 'sucesso') {
             dadosAnalise = data.analise;
             atualizarGraficos(); // Atualiza os gráficos com os dados FILTRADOS
+            carregarTendencias();
             // Garante que os filtros sejam carregados se for a primeira vez
             if (document.getElementById('filtro-veiculo').options.length <= 1) {
                  await carregarFiltros();
@@ -703,6 +944,64 @@ function atualizarGrafico(canvasId, tipo, dados, titulo, horizontal = false) {
     });
 }
 
+// Séries, médias móveis e outliers vêm prontos de /api/analise/tendencias
+// (sempre da frota inteira: os filtros da análise não se aplicam)
+async function carregarTendencias() {
+    try {
+        const response = await buscarComCache(`${API_BASE}/analise/tendencias?dimensao=veiculo&meses=12&janelas=3,12&top=5&limite=3`);
+        const data = await response.json();
+        if (data.status !== 'sucesso') throw new Error(data.mensagem || 'Erro ao carregar tendências');
+        atualizarGraficoTendencias(data.tendencias);
+    } catch (error) {
+        console.error('❌ Erro ao carregar tendências:', error);
+    }
+}
+
+function atualizarGraficoTendencias(tendencias) {
+    const ctx = document.getElementById('graficoTendencias').getContext('2d');
+    const outliers = document.getElementById('tendencias-outliers');
+
+    if (graficos['graficoTendencias']) {
+        graficos['graficoTendencias'].destroy();
+    }
+    if (!tendencias.frota) {
+        outliers.innerHTML = '<div class="alert alert-info">Sem gastos para calcular tendências.</div>';
+        return;
+    }
+
+    const cores = ['#dc3545', '#fd7e14', '#6f42c1'];
+    const datasets = [
+        { label: 'Gastos da frota', data: tendencias.frota.valores, borderColor: '#007bff', borderWidth: 2, tension: 0.3 },
+        { label: 'Média 3 meses', data: tendencias.frota.medias['3'], borderColor: '#28a745', borderDash: [6, 4], borderWidth: 2, tension: 0.3 },
+        { label: 'Média 12 meses', data: tendencias.frota.medias['12'], borderColor: '#6c757d', borderDash: [2, 3], borderWidth: 2, tension: 0.3 },
+        ...Object.entries(tendencias.series).map(([veiculo, serie], i) => ({
+            label: veiculo, data: serie.valores, borderColor: cores[i % cores.length], borderWidth: 1, tension: 0.3
+        }))
+    ];
+
+    graficos['graficoTendencias'] = new Chart(ctx, {
+        type: 'line',
+        data: { labels: tendencias.meses.map(mes => formatarMesAno(mes)), datasets },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            plugins: {
+                title: { display: true, text: 'Gastos Mensais, Médias Móveis e Veículos com Maior Gasto' }
+            },
+            scales: {
+                y: { beginAtZero: true, title: { display: true, text: 'Valor (R$)' } }
+            }
+        }
+    });
+
+    outliers.innerHTML = tendencias.outliers.length === 0 ? '' : `
+        <h3>⚠️ Meses Fora do Padrão</h3>
+        <ul>${tendencias.outliers.map(o => `
+            <li><strong>${o.nome}</strong> em ${formatarMesAno(o.mes)}: R$ ${o.valor.toFixed(2)}
+                (média dos meses anteriores R$ ${o.media_anterior.toFixed(2)}${o.percentual === null ? '' : `, ${o.percentual > 0 ? '+' : ''}${o.percentual}%`})</li>`).join('')}
+        </ul>`;
+}
+
 function atualizarGraficoMensal() {
     const ctx = document.getElementById('graficoMensal').getContext('2d');
     
@@ -788,7 +1087,7 @@ function formatarMesAno(mesAno) {
 async function carregarFiltros() {
     try {
         console.log('🔍 Carregando filtros...');
-        const response = await fetch(`${API_BASE}/filtros`);
+        const response = await buscarComCache(`${API_BASE}/filtros`);
         const data = await response.json();
         
         if (data.status === 'sucesso') {
@@ -891,6 +1190,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Carrega dados iniciais
     carregarDashboard();
+    iniciarStream();
     
     console.log('✅ Sistema inicializado!');
 });
@@ -902,4 +1202,5 @@ window.openTab = openTab;
 window.limparFormGasto = limparFormGasto;
 window.limparFormDiaria = limparFormDiaria; 
 window.prepararEdicaoDiaria = prepararEdicaoDiaria; 
+window.mudarPagina = mudarPagina;
 window.excluirDiaria = excluirDiaria;
\ No newline at end of file
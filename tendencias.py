@@ -0,0 +1,173 @@
+# tendencias.py - SÉRIES MENSAIS, MÉDIAS MÓVEIS E OUTLIERS (/api/analise/tendencias)
+import heapq
+import re
+
+from agregados import ESCALA
+
+MES_VALIDO = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+# Posição de cada dimensão na chave de AgregadosFrota.gastos_mensal_detalhado
+DIMENSOES = {'veiculo': 0, 'placa': 1, 'motorista': 2}
+MESES_MAXIMO = 120
+JANELA_MAXIMA = 36
+TOP_MAXIMO = 100
+
+
+def _inteiro(args, nome, padrao, minimo, maximo):
+    try:
+        valor = int(args.get(nome) or padrao)
+    except ValueError:
+        raise ValueError(f'{nome} deve ser um número inteiro')
+    if not minimo <= valor <= maximo:
+        raise ValueError(f'{nome} deve estar entre {minimo} e {maximo}')
+    return valor
+
+
+def ler_parametros(args):
+    """Parâmetros de calcular_tendencias a partir da query string (ValueError se inválidos)"""
+    dimensao = args.get('dimensao') or 'veiculo'
+    if dimensao not in DIMENSOES:
+        raise ValueError(f"dimensao deve ser uma de: {', '.join(DIMENSOES)}")
+    try:
+        janelas = [int(janela) for janela in (args.get('janelas') or '3,6,12').split(',') if janela.strip()]
+    except ValueError:
+        raise ValueError('janelas deve ser uma lista de inteiros separados por vírgula (ex: 3,6,12)')
+    if not janelas or not all(1 <= janela <= JANELA_MAXIMA for janela in janelas):
+        raise ValueError(f'Cada janela deve estar entre 1 e {JANELA_MAXIMA} meses')
+    ate = args.get('ate') or None
+    if ate is not None and not MES_VALIDO.match(ate):
+        raise ValueError('ate deve estar no formato AAAA-MM')
+    return {
+        'dimensao': dimensao,
+        'meses': _inteiro(args, 'meses', 12, 1, MESES_MAXIMO),
+        'janelas': janelas,
+        'top': _inteiro(args, 'top', 10, 0, TOP_MAXIMO),
+        'limite': _inteiro(args, 'limite', 20, 0, 10000),
+        'ate': ate
+    }
+
+
+def meses_ate(ate, quantidade):
+    """Os `quantidade` meses do calendário que terminam em `ate` ('AAAA-MM'), em ordem"""
+    fim = int(ate[:4]) * 12 + int(ate[5:7]) - 1
+    return [f"{indice // 12:04d}-{indice % 12 + 1:02d}" for indice in range(fim - quantidade + 1, fim + 1)]
+
+
+def ultimo_mes(agregados):
+    """Último mês com gastos; None se não há nenhum"""
+    meses = [ano_mes for ano_mes in agregados.gastos_mensal.somas if MES_VALIDO.match(ano_mes)]
+    return max(meses) if meses else None
+
+
+def _reais(fixo):
+    return round(fixo / ESCALA, 2)
+
+
+def _percentual(diferenca, base):
+    return round(diferenca * 100 / base, 2) if base else None
+
+
+def _serie(valores, inicio, janelas):
+    """Valores, médias móveis e variação mês a mês dos meses a partir de `inicio`.
+
+    `valores` são somas em ponto fixo do calendário inteiro; os meses antes de
+    `inicio` só alimentam as médias e a primeira variação. Cada média é uma
+    soma corrente (entra um mês, sai outro): uma passada por janela.
+    """
+    medias = {}
+    for janela in janelas:
+        soma = sum(valores[inicio - janela + 1:inicio + 1])
+        serie = [_reais(soma // janela)]
+        for indice in range(inicio + 1, len(valores)):
+            soma += valores[indice] - valores[indice - janela]
+            serie.append(_reais(soma // janela))
+        medias[str(janela)] = serie
+    variacao = [valores[indice] - valores[indice - 1] for indice in range(inicio, len(valores))]
+    return {
+        'valores': [_reais(valor) for valor in valores[inicio:]],
+        'total': _reais(sum(valores[inicio:])),
+        'medias': medias,
+        'variacao': [_reais(diferenca) for diferenca in variacao],
+        'variacao_percentual': [
+            _percentual(diferenca, valores[indice - 1])
+            for indice, diferenca in zip(range(inicio, len(valores)), variacao)
+        ]
+    }
+
+
+def _desvios(nome, calendario, valores, inicio, janela):
+    """(nome, mês, média dos `janela` meses anteriores, valor) de cada mês exibido"""
+    soma = sum(valores[inicio - janela:inicio])
+    for indice in range(inicio, len(valores)):
+        valor = valores[indice]
+        media = soma // janela
+        if valor or media:
+            yield nome, calendario[indice], media, valor
+        soma += valor - valores[indice - janela]
+
+
+def meses_lidos(agregados, meses=12, janelas=(3, 6, 12), ate=None, **outros):
+    """Meses que calcular_tendencias lê: os pedidos mais os anteriores que as médias usam"""
+    ate = ate or ultimo_mes(agregados)
+    return meses_ate(ate, meses + max(janelas)) if ate is not None else []
+
+
+def calcular_tendencias(agregados, dimensao='veiculo', meses=12, janelas=(3, 6, 12), top=10, limite=20, ate=None):
+    """Séries mensais de gastos da frota e de cada veículo/placa/motorista.
+
+    Lê só os meses pedidos (mais os anteriores que as médias precisam) dos
+    totais por mês de AgregadosFrota, mantidos a cada gravação: o custo
+    depende dos meses pedidos e das chaves com gastos neles, não do tamanho
+    do histórico.
+
+    - series: as `limite` chaves com mais gastos no período (0 = todas)
+    - outliers: os `top` meses que mais se afastaram da média dos min(janelas)
+      meses anteriores, entre todas as chaves
+    """
+    posicao = DIMENSOES[dimensao]
+    janelas = sorted(set(janelas))
+    resultado = {'dimensao': dimensao, 'janelas': janelas, 'meses': [], 'frota': None,
+                 'series': {}, 'outliers': []}
+    # Meses anteriores para a maior janela e para a base dos outliers
+    calendario = meses_lidos(agregados, meses, janelas, ate)
+    if not calendario:
+        return resultado
+    inicio = len(calendario) - meses
+
+    por_chave = {}
+    for indice, ano_mes in enumerate(calendario):
+        for nome, fixo in agregados.gastos_mensal_detalhado.projecao(ano_mes, posicao).items():
+            serie = por_chave.get(nome)
+            if serie is None:
+                serie = por_chave[nome] = [0] * len(calendario)
+            serie[indice] = fixo
+
+    candidatos = []
+    totais = []
+    for nome, serie in por_chave.items():
+        if not any(serie):
+            continue
+        totais.append((sum(serie[inicio:]), nome, serie))
+        if top:
+            candidatos.extend(_desvios(nome, calendario, serie, inicio, janelas[0]))
+
+    totais.sort(key=lambda item: (-item[0], str(item[1])))
+    if limite:
+        totais = totais[:limite]
+    candidatos = heapq.nsmallest(top, candidatos, key=lambda item: (-abs(item[3] - item[2]), item[1], str(item[0])))
+
+    resultado['meses'] = calendario[inicio:]
+    frota = [agregados.gastos_mensal.somas.get(ano_mes, 0) for ano_mes in calendario]
+    resultado['frota'] = _serie(frota, inicio, janelas)
+    resultado['series'] = {nome: _serie(serie, inicio, janelas) for _, nome, serie in totais}
+    resultado['outliers'] = [
+        {
+            'nome': nome,
+            'mes': ano_mes,
+            'valor': _reais(valor),
+            'media_anterior': _reais(media),
+            'desvio': _reais(valor - media),
+            'percentual': _percentual(valor - media, media)
+        }
+        for nome, ano_mes, media, valor in candidatos
+    ]
+    return resultado
@@ -0,0 +1,238 @@
+# teste_carga.py - TESTE DE CARGA: SERVIDOR DE DESENVOLVIMENTO x ASGI
+#
+# Uso:
+#   python teste_carga.py                                   # os dois servidores, escala media
+#   python teste_carga.py --servidores asgi --workers 4 --clientes 1,16,64,256
+#   python teste_carga.py --escala grande --saida carga.json
+#
+# Cada servidor sobe em um processo separado sobre uma cópia da mesma frota
+# sintética (gerador_frota.py). Para cada quantidade de clientes simultâneos
+# (conexões keep-alive), mede vazão e latência de uma mistura de leituras e
+# gravações durante --duracao segundos.
+#
+# - dev: o servidor do Flask (app.run, com threads, sem debug/reloader)
+# - asgi: uvicorn asgi:aplicacao (exige pip install uvicorn)
+#
+# O backend segue as variáveis de ambiente do app (FROTA_BACKEND,
+# FROTA_PERSISTENCIA, FROTA_THREADS...). gastos_veiculos.json não é tocado.
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from urllib.parse import quote
+
+from benchmark import ESCALAS, resumir
+from gerador_frota import gerar_frota
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+SERVIDORES = ('dev', 'asgi')
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def comando_servidor(nome, porta, workers):
+    if nome == 'dev':
+        return [sys.executable, '-c',
+                f"import app; app.iniciar_renovacao_garantias(); "
+                f"app.app.run(host='127.0.0.1', port={porta}, threaded=True)"]
+    return [sys.executable, '-m', 'uvicorn', 'asgi:aplicacao', '--host', '127.0.0.1', '--port', str(porta),
+            '--workers', str(workers), '--log-level', 'warning', '--no-access-log']
+
+
+def esperar_servidor(porta, processo, limite=120):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if processo.poll() is not None:
+            raise RuntimeError('o servidor terminou antes de responder')
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{porta}/api/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('o servidor não respondeu a tempo')
+
+
+def montar_mistura(dados, proporcao_escritas):
+    """Lista de (peso, função que gera (método, caminho, corpo))"""
+    ids = [g['id'] for g in dados['gastos']]
+    veiculos = sorted({g['veiculo'] for g in dados['gastos']})
+    modelo = {k: v for k, v in dados['gastos'][0].items() if k not in ('id', 'data_registro')}
+    corpo_gasto = json.dumps(modelo).encode()
+    leituras = [
+        (20, lambda a: ('GET', '/api/dashboard', None)),
+        (20, lambda a: ('GET', '/api/gastos?limit=50&sort=-valor', None)),
+        (10, lambda a: ('GET', '/api/servicos?limit=50', None)),
+        (15, lambda a: ('GET', f"/api/analise?veiculo={quote(a.choice(veiculos))}", None)),
+        (25, lambda a: ('GET', f"/api/gastos/{a.choice(ids)}", None)),
+    ]
+    peso_leituras = sum(peso for peso, _ in leituras)
+    peso_escritas = peso_leituras * proporcao_escritas / max(1e-9, 1 - proporcao_escritas)
+    return leituras + [(peso_escritas, lambda a: ('POST', '/api/gastos', corpo_gasto))]
+
+
+async def ler_resposta(leitor):
+    """Lê uma resposta HTTP/1.1 inteira. Retorna (status, conexão deve fechar)."""
+    linha = await leitor.readline()
+    if not linha:
+        raise ConnectionError('conexão fechada pelo servidor')
+    status = int(linha.split()[1])
+    tamanho, chunked, fechar = None, False, False
+    while True:
+        linha = await leitor.readline()
+        if linha in (b'\r\n', b''):
+            break
+        nome, _, valor = linha.decode('latin-1').partition(':')
+        nome, valor = nome.strip().lower(), valor.strip().lower()
+        if nome == 'content-length':
+            tamanho = int(valor)
+        elif nome == 'transfer-encoding' and 'chunked' in valor:
+            chunked = True
+        elif nome == 'connection' and valor == 'close':
+            fechar = True
+    if chunked:
+        while True:
+            pedaco = int((await leitor.readline()).split(b';')[0], 16)
+            await leitor.readexactly(pedaco + 2)
+            if pedaco == 0:
+                break
+    elif tamanho is not None:
+        await leitor.readexactly(tamanho)
+    else:
+        await leitor.read()
+        fechar = True
+    return status, fechar
+
+
+async def cliente(porta, mistura, aleatorio, fim, tempos, status):
+    pesos = [peso for peso, _ in mistura]
+    geradores = [gerar for _, gerar in mistura]
+    conexao = None
+    while time.perf_counter() < fim:
+        metodo, caminho, corpo = aleatorio.choices(geradores, pesos)[0](aleatorio)
+        inicio = time.perf_counter()
+        try:
+            if conexao is None:
+                conexao = await asyncio.open_connection('127.0.0.1', porta)
+            leitor, escritor = conexao
+            cabecalho = f"{metodo} {caminho} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+            if corpo is not None:
+                cabecalho += f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n"
+            escritor.write(cabecalho.encode() + b'\r\n' + (corpo or b''))
+            await escritor.drain()
+            codigo, fechar = await ler_resposta(leitor)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            codigo, fechar = 'falha', True
+        tempos.append(time.perf_counter() - inicio)
+        status[str(codigo)] = status.get(str(codigo), 0) + 1
+        if fechar and conexao is not None:
+            conexao[1].close()
+            conexao = None
+    if conexao is not None:
+        conexao[1].close()
+
+
+async def rodar_nivel(porta, mistura, clientes, duracao, semente):
+    tempos, status = [], {}
+    inicio = time.perf_counter()
+    fim = inicio + duracao
+    await asyncio.gather(*[
+        cliente(porta, mistura, random.Random(semente + i), fim, tempos, status) for i in range(clientes)
+    ])
+    total = time.perf_counter() - inicio
+    resultado = resumir(tempos, status)
+    resultado['vazao_rps'] = round(len(tempos) / total, 1)
+    resultado['erros'] = sum(q for codigo, q in status.items() if not codigo.startswith('2'))
+    return resultado
+
+
+def medir_servidor(nome, caminho_dados, dados, args, pasta):
+    # Cada servidor começa da mesma cópia dos dados
+    caminho = os.path.join(pasta, f"{nome}.json")
+    shutil.copyfile(caminho_dados, caminho)
+    porta = porta_livre()
+    ambiente = {**os.environ, 'FROTA_ARQUIVO_JSON': caminho,
+                'FROTA_ARQUIVO_SQLITE': os.path.join(pasta, f"{nome}.db"),
+                'FROTA_PASTA_PARTICOES': os.path.join(pasta, f"{nome}.particoes"),
+                'FROTA_PASTA_FROTAS': os.path.join(pasta, f"{nome}.frotas")}
+    processo = subprocess.Popen(comando_servidor(nome, porta, args.workers), cwd=PASTA, env=ambiente,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        esperar_servidor(porta, processo)
+        mistura = montar_mistura(dados, args.escritas)
+        niveis = {}
+        for clientes in args.clientes:
+            niveis[str(clientes)] = asyncio.run(rodar_nivel(porta, mistura, clientes, args.duracao, clientes))
+            r = niveis[str(clientes)]
+            print(f"{nome:6} {clientes:>8} {r['vazao_rps']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} "
+                  f"{r['p99_ms']:>9} {r['erros']:>7}")
+        return niveis
+    finally:
+        processo.terminate()
+        try:
+            processo.wait(10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga: servidor de desenvolvimento x ASGI')
+    parser.add_argument('--servidores', default=','.join(SERVIDORES), help=f"Lista: {', '.join(SERVIDORES)}")
+    parser.add_argument('--escala', default='media', choices=sorted(ESCALAS))
+    parser.add_argument('--clientes', default='1,8,32,128', help='Clientes simultâneos por rodada')
+    parser.add_argument('--duracao', type=float, default=10, help='Segundos por rodada')
+    parser.add_argument('--escritas', type=float, default=0.05, help='Fração de POST /api/gastos')
+    parser.add_argument('--workers', type=int, default=1, help='Workers do uvicorn')
+    parser.add_argument('--saida', help='Arquivo JSON com os resultados')
+    args = parser.parse_args()
+    args.clientes = [int(c) for c in args.clientes.split(',') if c]
+
+    servidores = [s for s in args.servidores.split(',') if s]
+    for nome in servidores:
+        if nome not in SERVIDORES:
+            parser.error(f"Servidor desconhecido: {nome}")
+    if 'asgi' in servidores:
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            print("⚠️ uvicorn não está instalado (pip install uvicorn); medindo só o servidor dev")
+            servidores.remove('asgi')
+
+    pasta = tempfile.mkdtemp(prefix='carga-frota-')
+    try:
+        dados = gerar_frota(**ESCALAS[args.escala])
+        caminho_dados = os.path.join(pasta, 'frota.json')
+        with open(caminho_dados, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False)
+        print(f"📏 Escala {args.escala}: {len(dados['gastos'])} gastos, {len(dados['diarias'])} diárias; "
+              f"{args.duracao:g}s por rodada, {args.escritas:.0%} de escritas")
+        print(f"{'servidor':6} {'clientes':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erros':>7}")
+        resultado = {
+            'escala': args.escala,
+            'duracao_s': args.duracao,
+            'escritas': args.escritas,
+            'workers_asgi': args.workers,
+            'servidores': {nome: medir_servidor(nome, caminho_dados, dados, args, pasta) for nome in servidores}
+        }
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados gravados em {args.saida}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
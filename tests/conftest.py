@@ -0,0 +1,65 @@
+# conftest.py - FIXTURES COMPARTILHADAS DOS TESTES
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Os módulos do projeto ficam na raiz, sem pacote
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Importar o app abre a frota padrão: nos testes, numa pasta temporária, sem imagem
+_PASTA_APP = tempfile.mkdtemp(prefix='frota-testes-')
+os.environ['FROTA_ARQUIVO_JSON'] = os.path.join(_PASTA_APP, 'gastos_veiculos.json')
+os.environ['FROTA_PASTA_FROTAS'] = os.path.join(_PASTA_APP, 'frotas')
+os.environ['FROTA_IMAGEM'] = '0'
+
+from persistencia import criar_persistencia  # noqa: E402
+from repositorio import RepositorioDados  # noqa: E402
+from repositorio_particionado import RepositorioParticionado  # noqa: E402
+from repositorio_sqlite import RepositorioSQLite  # noqa: E402
+
+BACKENDS = ('memoria', 'journal', 'sqlite', 'particionado')
+
+
+@pytest.fixture
+def abrir(tmp_path):
+    """abrir(backend) cria (ou reabre) o repositório do backend em tmp_path"""
+    def abrir(backend):
+        if backend == 'sqlite':
+            return RepositorioSQLite(str(tmp_path / 'gastos.db'))
+        if backend == 'particionado':
+            return RepositorioParticionado(str(tmp_path / 'particoes'))
+        caminho = str(tmp_path / 'gastos_veiculos.json')
+        modo = 'journal' if backend == 'journal' else 'arquivo'
+        return RepositorioDados(caminho, criar_persistencia(modo, caminho))
+    return abrir
+
+
+@pytest.fixture
+def app_modulo(tmp_path):
+    """O módulo app com a frota padrão (backend 'memoria') num arquivo novo em tmp_path"""
+    import app
+    from frotas import Frotas
+    app.ARQUIVO_JSON = str(tmp_path / 'gastos_veiculos.json')
+    app.ARQUIVO_SQLITE = str(tmp_path / 'gastos_veiculos.db')
+    app.PASTA_PARTICOES = str(tmp_path / 'gastos_veiculos.particoes')
+    app.PASTA_FROTAS = str(tmp_path / 'frotas')
+    app.frotas = Frotas(app.PASTA_FROTAS, app.criar_repositorio)
+    return app
+
+
+@pytest.fixture
+def cliente(app_modulo):
+    return app_modulo.app.test_client()
+
+
+def gasto(data='2024-01-15', veiculo='Caminhão 01', valor=100.0, **campos):
+    return {'data': data, 'veiculo': veiculo, 'placa': 'ABC-1234', 'motorista': 'Ana',
+            'tipo_gasto': 'Combustivel', 'valor': valor, **campos}
+
+
+def diaria(id, data_inicio='2024-01-10', motorista='Ana', valor_total=150.0):
+    return {'id': id, 'motorista': motorista, 'data_inicio': data_inicio, 'data_fim': data_inicio,
+            'dias_uteis': 1, 'valor_diaria_unitaria': valor_total, 'valor_total': valor_total}
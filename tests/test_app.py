@@ -0,0 +1,150 @@
+# test_app.py - ROTAS DA API
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from asgi import AdaptadorWSGI
+from conftest import RAIZ, gasto
+
+
+@pytest.mark.parametrize('valor', ['abc', '', None, 'nan', [1]])
+def test_gasto_com_valor_invalido_retorna_400(cliente, valor):
+    resposta = cliente.post('/api/gastos', json=gasto(valor=valor))
+    assert resposta.status_code == 400
+    assert resposta.get_json()['status'] == 'erro'
+    assert cliente.get('/api/gastos').get_json()['gastos'] == []
+
+
+def test_atualizar_gasto_com_valor_invalido_retorna_400(cliente):
+    id = cliente.post('/api/gastos', json=gasto(valor=80)).get_json()['id']
+    resposta = cliente.put(f'/api/gastos/{id}', json={'valor': 'abc'})
+    assert resposta.status_code == 400
+    assert resposta.get_json()['mensagem'] == 'Campo valor deve ser um número'
+    assert cliente.get('/api/gastos').get_json()['gastos'][0]['valor'] == 80
+
+
+def test_atualizar_gasto_antigo_com_valor_invalido(app_modulo, cliente):
+    app_modulo.repositorio.substituir({'gastos': [gasto(id=7, valor='abc')], 'diarias': []})
+    resposta = cliente.put('/api/gastos/7', json={'motorista': 'z'})
+    assert resposta.status_code == 200
+    assert app_modulo.repositorio.obter_gasto(7)['motorista'] == 'z'
+
+
+def test_diaria_com_valor_invalido_retorna_400(cliente):
+    diaria = {'motorista': 'Ana', 'data_inicio': '2024-01-10', 'data_fim': '2024-01-12',
+              'valor_diaria_unitaria': 'cem'}
+    assert cliente.post('/api/diarias', json=diaria).status_code == 400
+    id = cliente.post('/api/diarias', json={**diaria, 'valor_diaria_unitaria': 100}).get_json()['diaria']['id']
+    assert cliente.put(f'/api/diarias/{id}', json={'valor_diaria_unitaria': 'x'}).status_code == 400
+
+
+def test_importacao_com_valor_invalido_nao_grava_nada(cliente):
+    corpo = 'data,veiculo,placa,motorista,tipo_gasto,valor\n' \
+            '2024-01-10,Caminhão 01,ABC-1234,Ana,Combustivel,100\n' \
+            '2024-01-11,Caminhão 01,ABC-1234,Ana,Combustivel,abc\n'
+    resposta = cliente.post('/api/gastos/bulk', data=corpo, content_type='text/csv')
+    assert resposta.status_code == 400
+    assert resposta.get_json()['erros'] == [{'linha': 3, 'mensagem': 'Campo valor deve ser um número'}]
+    assert cliente.get('/api/gastos').get_json()['gastos'] == []
+
+
+def test_importar_o_app_nao_grava_e_a_renovacao_fica_na_inicializacao(tmp_path):
+    arquivo = tmp_path / 'gastos_veiculos.json'
+    # Garantia já vencida, gravada como 'Vigente'
+    arquivo.write_text(json.dumps({'gastos': [gasto(id=1, tipo_gasto='Manutencao', garantia_validade='2020-01-01',
+                                                    status_garantia='Vigente')], 'diarias': []}))
+    antes = arquivo.read_bytes()
+    ambiente = {**os.environ, 'FROTA_ARQUIVO_JSON': str(arquivo), 'FROTA_PASTA_FROTAS': str(tmp_path / 'frotas')}
+
+    subprocess.run([sys.executable, '-c', 'import app'], cwd=RAIZ, env=ambiente, check=True)
+    assert arquivo.read_bytes() == antes
+
+    subprocess.run([sys.executable, '-c', 'import app; app.iniciar_renovacao_garantias()'],
+                   cwd=RAIZ, env=ambiente, check=True)
+    assert json.loads(arquivo.read_bytes())['gastos'][0]['status_garantia'] == 'Vencida'
+
+
+def test_asgi_renova_as_garantias_ao_iniciar():
+    chamadas = []
+    adaptador = AdaptadorWSGI(None, threads=1, ao_iniciar=lambda: chamadas.append('iniciar'))
+    mensagens = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+    enviadas = []
+
+    async def receive():
+        return next(mensagens)
+
+    async def send(mensagem):
+        enviadas.append(mensagem['type'])
+
+    asyncio.run(adaptador({'type': 'lifespan'}, receive, send))
+    assert chamadas == ['iniciar']
+    assert enviadas == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+
+
+DIARIA = {'motorista': 'Ana', 'data_inicio': '2024-01-10', 'data_fim': '2024-01-12', 'valor_diaria_unitaria': 100}
+
+
+@pytest.mark.parametrize('metodo, rota, corpo', [
+    ('post', '/api/gastos', {**gasto(), 'placa': ''}),
+    ('post', '/api/gastos', {k: v for k, v in gasto().items() if k != 'data'}),
+    ('post', '/api/diarias', {k: v for k, v in DIARIA.items() if k != 'data_fim'}),
+    ('post', '/api/frotas', {'nome': 'Frota Norte'}),
+    ('post', '/api/frotas', {'nome': 'dashboard'}),
+])
+def test_campos_invalidos_retornam_400(cliente, metodo, rota, corpo):
+    resposta = getattr(cliente, metodo)(rota, json=corpo)
+    assert resposta.status_code == 400
+    assert resposta.get_json()['status'] == 'erro'
+
+
+@pytest.mark.parametrize('corpo, tipo', [('x', 'text/plain'), ('{', 'application/json'), ('[1]', 'application/json'),
+                                         ('', 'application/json')])
+def test_corpo_que_nao_e_objeto_json_retorna_400(cliente, corpo, tipo):
+    id_gasto = cliente.post('/api/gastos', json=gasto()).get_json()['id']
+    id_diaria = cliente.post('/api/diarias', json=DIARIA).get_json()['diaria']['id']
+    for metodo, rota in [('post', '/api/gastos'), ('put', f'/api/gastos/{id_gasto}'), ('post', '/api/diarias'),
+                         ('put', f'/api/diarias/{id_diaria}'), ('post', '/api/frotas')]:
+        resposta = getattr(cliente, metodo)(rota, data=corpo, content_type=tipo)
+        assert resposta.status_code == 400, (metodo, rota)
+        assert resposta.get_json()['mensagem'] == 'O corpo da requisição deve ser um objeto JSON'
+
+
+@pytest.mark.parametrize('rota, corpo, tipo', [
+    ('/api/gastos/bulk?formato=xml', 'a', 'text/csv'),
+    ('/api/gastos/bulk', '', 'application/x-ndjson'),
+    ('/api/gastos/bulk', '{"data": "2024-01-01"\n', 'application/x-ndjson'),
+    ('/api/gastos/bulk', '[1]\n', 'application/x-ndjson'),
+    ('/api/diarias/bulk', 'motorista,data_inicio\nAna,2024-01-01\n', 'text/csv'),
+])
+def test_importacao_invalida_retorna_400(cliente, rota, corpo, tipo):
+    resposta = cliente.post(rota, data=corpo, content_type=tipo)
+    assert resposta.status_code == 400
+    assert cliente.get('/api/gastos').get_json()['gastos'] == []
+    assert cliente.get('/api/diarias').get_json()['diarias'] == []
+
+
+def test_alterar_ou_excluir_id_inexistente_retorna_404(cliente):
+    assert cliente.put('/api/gastos/999', json={'valor': 1}).status_code == 404
+    assert cliente.put('/api/diarias/nao-existe', json={'motorista': 'Ana'}).status_code == 404
+    assert cliente.delete('/api/diarias/nao-existe').status_code == 404
+
+
+def test_jsonify_lista_com_campos_extras(app_modulo):
+    from modelos import Gasto
+    registros = [Gasto({**gasto(observacoes='"gastos":[]'), 'id': 1}), {'id': 2, 'valor': 5}]
+    # Campos antes e depois da lista, inclusive textos e objetos com o mesmo nome dela
+    extras = {'aviso': '"gastos":[]', 'zeta': {'gastos': []}, 'a': [1, {'b': None}], 'paginacao': {'total': 2}}
+    with app_modulo.app.test_request_context('/api/gastos'):
+        resposta = app_modulo.jsonify_lista('gastos', registros, **extras)
+        esperado = app_modulo.jsonify({'status': 'sucesso', 'gastos': [r if isinstance(r, dict) else r.para_dict()
+                                                                         for r in registros], **extras})
+    assert json.loads(resposta.get_data()) == json.loads(esperado.get_data())
+    assert list(json.loads(resposta.get_data())) == ['a', 'aviso', 'gastos', 'paginacao', 'status', 'zeta']
+    assert resposta.mimetype == 'application/json'
+    with app_modulo.app.test_request_context('/api/gastos'):
+        vazia = app_modulo.jsonify_lista('gastos', [])
+    assert vazia.get_data() == b'{"gastos":[],"status":"sucesso"}\n'
@@ -0,0 +1,103 @@
+# test_cache_analise.py - CACHE DAS ANÁLISES COM FILTROS
+import pytest
+
+from cache_analise import CacheAnalise, chave_filtros
+from conftest import BACKENDS, gasto
+from modelos import Gasto
+
+
+def _guardar(cache, **filtros):
+    chave = chave_filtros(filtros)
+    cache.guardar(chave, f'resultado {sorted(filtros.items())}')
+    return chave
+
+
+def test_alteracao_descarta_so_as_analises_do_gasto():
+    cache = CacheAnalise()
+    tudo = _guardar(cache)
+    x = _guardar(cache, veiculo='X')
+    y = _guardar(cache, veiculo='Y')
+    x_2023 = _guardar(cache, veiculo='X', ano='2023')
+    x_marco = _guardar(cache, veiculo='X', ano='2024', mes='3')
+    placa = _guardar(cache, placa='OUT-0000')
+
+    cache.invalidar(Gasto(gasto(data='2024-03-10', veiculo='X')))
+    for chave in (tudo, x, x_marco):
+        assert cache.obter(chave) is None
+    for chave in (y, x_2023, placa):
+        assert cache.obter(chave) is not None
+    assert cache.invalidacoes == 3
+
+    # Troca de veículo: sai o que tinha o antigo e o que terá o novo
+    antigo = Gasto(gasto(data='2023-05-01', veiculo='X'))
+    cache.invalidar(antigo, antigo.alterar({'veiculo': 'Y'}))
+    assert cache.obter(x_2023) is None and cache.obter(y) is None
+    assert cache.obter(placa) is not None
+    # None (inserção ou exclusão) é ignorado
+    cache.invalidar(None)
+    assert cache.obter(placa) is not None
+
+
+def test_lote_grande_limpa_tudo():
+    cache = CacheAnalise()
+    chave = _guardar(cache, veiculo='Y')
+    cache.invalidar(*[Gasto(gasto(veiculo='X')) for _ in range(CacheAnalise.LIMITE_LOTE + 1)])
+    assert cache.obter(chave) is None
+    assert cache.estatisticas()['tamanho'] == 0
+
+
+def test_limite_descarta_a_usada_ha_mais_tempo():
+    cache = CacheAnalise(limite=3)
+    a = _guardar(cache, veiculo='A')
+    b = _guardar(cache, veiculo='B')
+    c = _guardar(cache, veiculo='C')
+    # Consultar 'A' a torna a mais recente: quem sai é 'B'
+    assert cache.obter(a) is not None
+    d = _guardar(cache, veiculo='D')
+    assert cache.obter(b) is None
+    assert all(cache.obter(chave) is not None for chave in (a, c, d))
+    _guardar(cache, veiculo='E')
+    assert cache.obter(a) is None
+    assert cache.estatisticas()['tamanho'] == 3
+
+
+def test_contadores_de_acertos_e_falhas():
+    cache = CacheAnalise()
+    chave = chave_filtros({'mes': '3', 'veiculo': 'X', 'placa': ''})
+    # Mês com dois dígitos e filtros vazios fora da chave
+    assert chave == chave_filtros({'veiculo': 'X', 'mes': '03'})
+    assert cache.obter(chave) is None
+    cache.guardar(chave, 'resultado')
+    assert cache.obter(chave) == 'resultado'
+    assert cache.obter(chave) == 'resultado'
+    assert cache.estatisticas() == {'acertos': 2, 'falhas': 1, 'taxa_acerto': 0.6667, 'invalidacoes': 0,
+                                    'tamanho': 1, 'limite': 128}
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_repositorio_so_recalcula_a_analise_afetada(abrir, backend):
+    repositorio = abrir(backend)
+    repositorio.inserir_gastos([gasto(veiculo='X', valor=10), gasto(veiculo='Y', valor=20)])
+    x, y = {'veiculo': 'X'}, {'veiculo': 'Y'}
+    repositorio.analise(x)
+    repositorio.analise(y)
+    repositorio.analise(y)
+    inicio = repositorio.estatisticas_cache()
+    assert (inicio['acertos'], inicio['falhas']) == (1, 2)
+
+    id = repositorio.inserir_gasto(gasto(veiculo='X', valor=5))
+    assert repositorio.analise(y)['gastos']['por_veiculo'] == {'Y': 20}
+    assert repositorio.analise(x)['gastos']['por_veiculo'] == {'X': 15}
+    repositorio.atualizar_gasto(id, {'valor': 7})
+    assert repositorio.analise(x)['gastos']['por_veiculo'] == {'X': 17}
+    estatisticas = repositorio.estatisticas_cache()
+    assert (estatisticas['acertos'], estatisticas['falhas']) == (2, 4)
+    assert estatisticas['invalidacoes'] == 2
+
+
+def test_rota_estatisticas_do_cache(cliente):
+    cliente.post('/api/gastos', json=gasto(veiculo='X'))
+    cliente.get('/api/analise?veiculo=X')
+    cliente.get('/api/analise?veiculo=X&ano=')
+    cache = cliente.get('/api/analise/cache').get_json()['cache']
+    assert (cache['acertos'], cache['falhas'], cache['tamanho']) == (1, 1, 1)
@@ -0,0 +1,46 @@
+# test_cache_http.py - ETAG / IF-NONE-MATCH DAS ROTAS DE LEITURA
+import pytest
+
+from conftest import gasto
+
+ROTAS = ['/api/gastos', '/api/diarias', '/api/servicos', '/api/dashboard', '/api/analise?ano=2024',
+         '/api/filtros', '/api/analise/tendencias']
+
+
+@pytest.mark.parametrize('rota', ROTAS)
+def test_etag_repetido_retorna_304_ate_os_dados_mudarem(cliente, rota):
+    cliente.post('/api/gastos', json=gasto())
+    primeira = cliente.get(rota)
+    assert primeira.status_code == 200
+    etag = primeira.headers['ETag']
+    assert primeira.headers['Cache-Control'] == 'no-cache'
+
+    repetida = cliente.get(rota, headers={'If-None-Match': etag})
+    assert repetida.status_code == 304
+    assert repetida.get_data() == b''
+    assert repetida.headers['ETag'] == etag
+
+    cliente.post('/api/gastos', json=gasto(valor=5))
+    depois = cliente.get(rota, headers={'If-None-Match': etag})
+    assert depois.status_code == 200
+    assert depois.headers['ETag'] != etag
+
+
+def test_etag_depende_da_query_string_e_da_frota(cliente):
+    cliente.post('/api/frotas', json={'nome': 'norte'})
+    etags = {cliente.get(rota).headers['ETag']
+             for rota in ('/api/gastos', '/api/gastos?limit=1', '/api/frotas/norte/gastos')}
+    assert len(etags) == 3
+
+
+def test_escrita_sem_mudanca_mantem_o_etag(cliente):
+    cliente.post('/api/gastos', json=gasto())
+    etag = cliente.get('/api/gastos').headers['ETag']
+    assert cliente.delete('/api/gastos/999').status_code == 200
+    assert cliente.get('/api/gastos', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_erro_nao_recebe_etag(cliente):
+    resposta = cliente.get('/api/gastos?limit=abc')
+    assert resposta.status_code == 400
+    assert 'ETag' not in resposta.headers
@@ -0,0 +1,114 @@
+# test_escritor.py - FILA DE ESCRITA COM GRAVAÇÃO EM GRUPO
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pytest
+
+from conftest import gasto
+from escritor import EscritorUnico
+
+
+class Transacoes:
+    """transacao() de mentira: conta os lotes e pode segurar o primeiro ou falhar ao gravar"""
+
+    def __init__(self):
+        self.lotes = []
+        self.liberar = threading.Event()
+        self.liberar.set()
+        self.erro_ao_gravar = None
+
+    @contextmanager
+    def transacao(self):
+        self.liberar.wait()
+        lote = []
+        self.lotes.append(lote)
+        self.atual = lote
+        yield
+        if self.erro_ao_gravar is not None:
+            raise self.erro_ao_gravar
+
+
+def _esperar_fila(escritor, tamanho):
+    """Espera a fila do escritor chegar a `tamanho` pedidos"""
+    limite = time.monotonic() + 5
+    while escritor._fila.qsize() != tamanho:
+        assert time.monotonic() < limite
+        time.sleep(0.001)
+
+
+def _enfileirar(escritor, transacoes, valores):
+    """Executa uma operação por valor em threads separadas; retorna os futures"""
+    def operacao(valor):
+        def executar():
+            if valor == 'falha':
+                raise ValueError('valor inválido')
+            transacoes.atual.append(valor)
+            return valor * 2
+        return escritor.executar(executar)
+    executor = ThreadPoolExecutor(max_workers=len(valores))
+    return [executor.submit(operacao, valor) for valor in valores]
+
+
+def test_pedidos_que_chegam_juntos_vao_no_mesmo_lote():
+    transacoes = Transacoes()
+    escritor = EscritorUnico(transacoes.transacao)
+    # Segura a primeira transação até os outros pedidos estarem na fila
+    transacoes.liberar.clear()
+    primeiro = _enfileirar(escritor, transacoes, [0])
+    _esperar_fila(escritor, 0)
+    outros = _enfileirar(escritor, transacoes, list(range(1, 21)))
+    _esperar_fila(escritor, 20)
+    transacoes.liberar.set()
+
+    assert [futuro.result(timeout=5) for futuro in primeiro + outros] == [valor * 2 for valor in range(21)]
+    assert transacoes.lotes[0] == [0]
+    assert sorted(transacoes.lotes[1]) == list(range(1, 21))
+    assert len(transacoes.lotes) == 2
+
+
+def test_erro_de_uma_alteracao_so_vai_para_quem_a_pediu():
+    transacoes = Transacoes()
+    escritor = EscritorUnico(transacoes.transacao)
+    transacoes.liberar.clear()
+    bloqueio = _enfileirar(escritor, transacoes, [0])
+    _esperar_fila(escritor, 0)
+    futuros = _enfileirar(escritor, transacoes, [1, 'falha', 2])
+    _esperar_fila(escritor, 3)
+    transacoes.liberar.set()
+
+    bloqueio[0].result(timeout=5)
+    assert futuros[0].result(timeout=5) == 2
+    assert futuros[2].result(timeout=5) == 4
+    with pytest.raises(ValueError):
+        futuros[1].result(timeout=5)
+
+
+def test_falha_ao_gravar_o_lote_vai_para_todos():
+    transacoes = Transacoes()
+    transacoes.erro_ao_gravar = OSError('disco cheio')
+    escritor = EscritorUnico(transacoes.transacao)
+    for futuro in _enfileirar(escritor, transacoes, [1, 2, 3]):
+        with pytest.raises(OSError):
+            futuro.result(timeout=5)
+    # O escritor continua atendendo depois da falha
+    transacoes.erro_ao_gravar = None
+    assert escritor.executar(lambda: 'ok') == 'ok'
+
+
+def test_chamada_de_dentro_do_lote_roda_na_mesma_transacao():
+    transacoes = Transacoes()
+    escritor = EscritorUnico(transacoes.transacao)
+    assert escritor.executar(lambda: escritor.executar(lambda: 'dentro')) == 'dentro'
+    assert len(transacoes.lotes) == 1
+
+
+@pytest.mark.parametrize('backend', ['memoria', 'journal', 'sqlite', 'particionado'])
+def test_gravacoes_simultaneas_no_repositorio(abrir, backend):
+    repositorio = abrir(backend)
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        ids = list(executor.map(lambda valor: repositorio.inserir_gasto(gasto(valor=valor)), range(200)))
+    assert sorted(ids) == list(range(1, 201))
+    gastos = abrir(backend).listar_gastos()
+    assert sorted(g['valor'] for g in gastos) == list(range(200))
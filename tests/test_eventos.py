@@ -0,0 +1,84 @@
+# test_eventos.py - SERVER-SENT EVENTS (/api/stream)
+import json
+
+import eventos
+from conftest import gasto
+from eventos import CanalEventos, Leitor
+
+
+def _eventos_sse(corpo):
+    """(id, event, data) de cada evento de um corpo SSE"""
+    lidos = []
+    for bloco in corpo.decode('utf-8').split('\n\n'):
+        campos = dict(linha.split(': ', 1) for linha in bloco.splitlines() if ': ' in linha and not linha.startswith(':'))
+        if 'event' in campos:
+            lidos.append((campos.get('id'), campos['event'], json.loads(campos['data'])))
+    return lidos
+
+
+def test_leitor_recebe_as_alteracoes_em_ordem():
+    canal = CanalEventos()
+    versao = [0]
+    leitor = Leitor(canal, lambda: versao[0])
+    assert leitor.proximos() == b''
+    for numero in (1, 2):
+        versao[0] = numero
+        canal.publicar({'entidade': 'gastos', 'operacao': 'criar', 'id': numero, 'versao': numero})
+    lidos = _eventos_sse(leitor.proximos())
+    assert [(evento, dados['id']) for _, evento, dados in lidos] == [('alteracao', 1), ('alteracao', 2)]
+    assert lidos[-1][0] == f'{canal.instancia}:2:2'
+    assert leitor.proximos() == b''
+
+
+def test_reconexao_com_last_event_id_recebe_o_que_perdeu():
+    canal = CanalEventos()
+    versao = [0]
+    for numero in (1, 2, 3):
+        versao[0] = numero
+        canal.publicar({'entidade': 'gastos', 'operacao': 'criar', 'id': numero, 'versao': numero})
+    leitor = Leitor(canal, lambda: versao[0], f'{canal.instancia}:1:1')
+    assert [dados['id'] for _, _, dados in _eventos_sse(leitor.proximos())] == [2, 3]
+
+
+def test_recarregar_quando_nao_da_para_continuar():
+    canal = CanalEventos(capacidade=2)
+    versao = [0]
+    for numero in (1, 2, 3):
+        versao[0] = numero
+        canal.publicar({'entidade': 'gastos', 'operacao': 'criar', 'id': numero, 'versao': numero})
+
+    def recebidos(ultimo_id):
+        return [evento for _, evento, _ in _eventos_sse(Leitor(canal, lambda: versao[0], ultimo_id).proximos())]
+
+    # Histórico esgotado, outra instância e versão alterada sem evento (outro processo)
+    assert recebidos(f'{canal.instancia}:0:0') == ['recarregar']
+    assert recebidos('outra:1:1') == ['recarregar']
+    leitor = Leitor(canal, lambda: versao[0])
+    versao[0] = 4
+    assert [evento for _, evento, _ in _eventos_sse(leitor.proximos())] == ['recarregar']
+
+
+def test_stream_envia_as_gravacoes_da_frota(cliente, monkeypatch):
+    monkeypatch.setattr(eventos, 'INTERVALO', 0.05)
+    resposta = cliente.get('/api/stream', buffered=False)
+    assert resposta.mimetype == 'text/event-stream'
+    assert resposta.headers['Cache-Control'] == 'no-cache'
+    fluxo = iter(resposta.response)
+    assert next(fluxo) == f'retry: {eventos.RECONEXAO_MS}\n\n'.encode('utf-8')
+
+    id_gasto = cliente.post('/api/gastos', json=gasto()).get_json()['id']
+    cliente.post('/api/frotas', json={'nome': 'norte'})
+    cliente.post('/api/frotas/norte/gastos', json=gasto())
+    cliente.delete(f'/api/gastos/{id_gasto}')
+
+    lidos = []
+    while len(lidos) < 2:
+        pedaco = next(fluxo)
+        if pedaco != eventos.PULSO:
+            lidos.extend(_eventos_sse(pedaco))
+    resposta.close()
+    # Só os eventos da frota padrão; a gravação na frota 'norte' não aparece
+    assert [(evento, dados['operacao'], dados['id']) for _, evento, dados in lidos] == \
+        [('alteracao', 'inserir', id_gasto), ('alteracao', 'excluir', id_gasto)]
+    assert lidos[0][2]['registro']['id'] == id_gasto
+    assert 'registro' not in lidos[1][2]
@@ -0,0 +1,127 @@
+# test_frotas.py - FROTAS, PREFIXO /api/frotas/<nome> E DASHBOARD CONSOLIDADO
+from datetime import datetime
+
+import pytest
+
+from conftest import diaria, gasto
+from frotas import FROTA_PADRAO, Frotas, PrefixoFrota, nome_valido
+from persistencia import criar_persistencia
+from repositorio import RepositorioDados
+
+
+def _wsgi_eco(environ, start_response):
+    """App WSGI que devolve o caminho e a frota que recebeu"""
+    start_response('200 OK', [])
+    return [f"{environ['PATH_INFO']}|{environ.get('frota.nome')}".encode()]
+
+
+@pytest.mark.parametrize('caminho, esperado', [
+    ('/api/frotas/norte/gastos', '/api/gastos|norte'),
+    ('/api/frotas/norte/gastos/7', '/api/gastos/7|norte'),
+    ('/api/frotas/norte/analise/tendencias', '/api/analise/tendencias|norte'),
+    ('/api/gastos', '/api/gastos|None'),
+    # Rotas das próprias frotas não têm frota
+    ('/api/frotas', '/api/frotas|None'),
+    ('/api/frotas/dashboard', '/api/frotas/dashboard|None'),
+    ('/api/frotas/norte/', '/api/frotas/norte/|None'),
+])
+def test_prefixo_frota(caminho, esperado):
+    resposta = PrefixoFrota(_wsgi_eco)({'PATH_INFO': caminho}, lambda status, cabecalhos: None)
+    assert b''.join(resposta).decode() == esperado
+
+
+@pytest.mark.parametrize('nome', ['dashboard', '', 'Norte', '../fora', 'a/b', '-norte', 'x' * 65])
+def test_nomes_invalidos_ou_reservados(tmp_path, nome):
+    frotas = Frotas(str(tmp_path), lambda frota: None)
+    assert not nome_valido(nome)
+    with pytest.raises(ValueError):
+        frotas.criar(nome)
+    assert frotas.nomes() == [FROTA_PADRAO]
+
+
+def test_frotas_abrem_o_proprio_repositorio(tmp_path):
+    def criar_repositorio(nome):
+        caminho = frotas.caminho(nome, str(tmp_path / 'gastos_veiculos.json'))
+        return RepositorioDados(caminho, criar_persistencia('arquivo', caminho))
+
+    frotas = Frotas(str(tmp_path / 'frotas'), criar_repositorio)
+    assert frotas.obter('norte') is None
+    frotas.criar('norte')
+    frotas.criar('sul')
+    assert frotas.nomes() == [FROTA_PADRAO, 'norte', 'sul']
+    frotas.obter('norte').repositorio.inserir_gasto(gasto(valor=10))
+    assert frotas.obter('norte') is frotas.obter('norte')
+    assert (tmp_path / 'frotas' / 'norte' / 'gastos_veiculos.json').exists()
+    assert frotas.obter('sul').repositorio.listar_gastos() == []
+    assert frotas.obter(FROTA_PADRAO).repositorio.listar_gastos() == []
+
+
+def test_rotas_com_prefixo_usam_a_frota(cliente):
+    assert cliente.post('/api/frotas', json={'nome': 'norte'}).status_code == 200
+    assert cliente.post('/api/frotas', json={'nome': 'sul'}).status_code == 200
+    assert cliente.post('/api/frotas/norte/gastos', json=gasto(valor=30)).status_code == 200
+    assert cliente.post('/api/frotas/sul/gastos', json=gasto(valor=5, veiculo='Van 02')).status_code == 200
+    assert cliente.post('/api/gastos', json=gasto(valor=1)).status_code == 200
+
+    def valores(frota=None):
+        rota = f'/api/frotas/{frota}/gastos' if frota else '/api/gastos'
+        return [g['valor'] for g in cliente.get(rota).get_json()['gastos']]
+
+    assert valores('norte') == [30]
+    assert valores('sul') == [5]
+    assert valores() == [1]
+    # Ids e alterações ficam na frota
+    assert cliente.put('/api/frotas/sul/gastos/1', json={'valor': 6}).status_code == 200
+    assert valores('sul') == [6] and valores('norte') == [30]
+    cliente.delete('/api/frotas/norte/gastos/1')
+    assert valores('norte') == [] and valores() == [1]
+    veiculos = cliente.get('/api/frotas/sul/filtros').get_json()['filtros']['veiculos']
+    assert veiculos == ['Van 02']
+    assert cliente.get('/api/frotas/leste/gastos').status_code == 404
+
+
+@pytest.mark.parametrize('nome', ['dashboard', 'Norte', '../fora', ''])
+def test_criar_frota_com_nome_invalido_retorna_400(cliente, nome):
+    resposta = cliente.post('/api/frotas', json={'nome': nome})
+    assert resposta.status_code == 400
+    assert resposta.get_json()['status'] == 'erro'
+    assert [f['nome'] for f in cliente.get('/api/frotas').get_json()['frotas']] == [FROTA_PADRAO]
+
+
+def test_criar_frota_existente_retorna_409(cliente):
+    assert cliente.post('/api/frotas', json={'nome': 'norte'}).status_code == 200
+    assert cliente.post('/api/frotas', json={'nome': 'norte'}).status_code == 409
+    assert cliente.post('/api/frotas', json={'nome': FROTA_PADRAO}).status_code == 409
+
+
+def test_dashboard_consolidado_soma_as_frotas(app_modulo, cliente):
+    mes = datetime.now().strftime('%Y-%m')
+    for nome in ('norte', 'sul'):
+        cliente.post('/api/frotas', json={'nome': nome})
+    app_modulo.frotas.obter('norte').repositorio.inserir_gastos([
+        gasto(data=f'{mes}-01', valor=10.25), gasto(data='2020-01-10', valor=100, placa='XYZ-9999')])
+    app_modulo.frotas.obter('sul').repositorio.inserir_gastos([gasto(data=f'{mes}-01', valor=0.5, motorista='Bia')])
+    app_modulo.frotas.obter('sul').repositorio.inserir_diaria(diaria('d1', data_inicio=f'{mes}-02', valor_total=80))
+    app_modulo.frotas.obter(FROTA_PADRAO).repositorio.inserir_gasto(gasto(data='2020-01-10', valor=1))
+
+    def consolidado():
+        corpo = cliente.get('/api/frotas/dashboard').get_json()
+        return corpo['dashboard']['resumo'], corpo['frotas']
+
+    resumo, por_frota = consolidado()
+    assert set(por_frota) == {FROTA_PADRAO, 'norte', 'sul'}
+    for campo in ('total_gastos', 'total_diarias', 'gastos_mes_atual', 'diarias_mes_atual', 'servicos_vencidos'):
+        assert resumo[campo] == pytest.approx(sum(dashboard[campo] for dashboard in por_frota.values()))
+    assert resumo['total_gastos'] == 111.75
+    assert resumo['gastos_mes_atual'] == 10.75
+    assert resumo['diarias_mes_atual'] == 80
+    # Placas e motoristas distintos contam uma vez no consolidado
+    assert resumo['total_veiculos'] == 2
+    assert resumo['total_motoristas'] == 2
+
+    # Uma frota alterada troca só a sua parte da soma
+    cliente.delete('/api/frotas/norte/gastos/2')
+    resumo, por_frota = consolidado()
+    assert resumo['total_gastos'] == 11.75
+    assert por_frota['norte']['total_gastos'] == 10.25
+    assert resumo['total_veiculos'] == 1
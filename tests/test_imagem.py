@@ -0,0 +1,89 @@
+# test_imagem.py - IMAGEM BINÁRIA DO BACKEND 'memoria' (INÍCIO RÁPIDO)
+import atexit
+
+import pytest
+
+import imagem
+from conftest import gasto
+from persistencia import criar_persistencia
+from repositorio import RepositorioDados
+from test_repositorio import _alterar, _consultas, _dados_frota
+
+
+@pytest.fixture
+def abrir_memoria(tmp_path):
+    """abrir_memoria(com_imagem) abre o JSON de tmp_path, com ou sem a imagem ao lado"""
+    caminho = str(tmp_path / 'gastos_veiculos.json')
+
+    abertos = []
+
+    def abrir(com_imagem=True):
+        repositorio = RepositorioDados(caminho, criar_persistencia('arquivo', caminho), None,
+                                       f"{caminho}.imagem" if com_imagem else None)
+        abertos.append(repositorio)
+        return repositorio
+    yield abrir
+    # Sem a gravação da imagem ao encerrar o processo (a pasta já terá sido usada)
+    for repositorio in abertos:
+        atexit.unregister(repositorio.salvar_imagem)
+
+
+@pytest.fixture
+def com_imagem(abrir_memoria):
+    """Dados gravados e a imagem correspondente em disco"""
+    repositorio = abrir_memoria()
+    repositorio.substituir(_dados_frota())
+    _alterar(repositorio)
+    assert repositorio.salvar_imagem() is True
+    # Sem mudanças desde a última, não regrava
+    assert repositorio.salvar_imagem() is False
+    return abrir_memoria
+
+
+def test_carga_pela_imagem_igual_a_carga_pelo_json(com_imagem, capsys):
+    capsys.readouterr()
+    quente = com_imagem()
+    assert 'carregados da imagem' in capsys.readouterr().out
+    assert _consultas(quente) == _consultas(com_imagem(com_imagem=False))
+
+
+def test_imagem_desatualizada_e_ignorada(com_imagem, capsys):
+    id = com_imagem(com_imagem=False).inserir_gasto(gasto(valor=77))
+    capsys.readouterr()
+    repositorio = com_imagem()
+    assert 'carregados da imagem' not in capsys.readouterr().out
+    assert repositorio.obter_gasto(id)['valor'] == 77
+
+
+@pytest.mark.parametrize('estragar', ['corrompida', 'formato', 'codigo'])
+def test_imagem_que_nao_serve_volta_para_o_json(com_imagem, tmp_path, monkeypatch, capsys, estragar):
+    if estragar == 'corrompida':
+        caminho = tmp_path / 'gastos_veiculos.json.imagem'
+        caminho.write_bytes(caminho.read_bytes()[:200])
+        aviso = 'ignorada'
+    elif estragar == 'formato':
+        monkeypatch.setattr(imagem, 'FORMATO', imagem.FORMATO + 1)
+        aviso = 'de outra versão do código'
+    else:
+        monkeypatch.setattr(imagem, '_versao_codigo', 'outro-codigo')
+        aviso = 'de outra versão do código'
+    capsys.readouterr()
+    repositorio = com_imagem()
+    saida = capsys.readouterr().out
+    assert aviso in saida and 'carregados da imagem' not in saida
+    assert _consultas(repositorio) == _consultas(com_imagem(com_imagem=False))
+
+
+def test_gravacoes_depois_da_carga_pela_imagem(com_imagem):
+    quente = com_imagem()
+    ultimo = max(g['id'] for g in quente.listar_gastos())
+    id = quente.inserir_gasto(gasto(valor=42))
+    assert id == ultimo + 1
+    quente.excluir_gasto(ultimo)
+    frio = com_imagem(com_imagem=False)
+    assert frio.obter_gasto(id)['valor'] == 42
+    assert frio.obter_gasto(ultimo) is None
+    assert _consultas(quente) == _consultas(frio)
+    # A imagem nova reflete as gravações
+    assert quente.salvar_imagem() is True
+    assert _consultas(com_imagem()) == _consultas(frio)
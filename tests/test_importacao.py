@@ -0,0 +1,45 @@
+# test_importacao.py - IMPORTAÇÃO E EXPORTAÇÃO EM LOTE
+import csv
+import io
+
+from conftest import gasto
+from importacao import colunas_csv, gerar_csv
+from modelos import Gasto
+
+
+def _ler_csv(registros):
+    return list(csv.DictReader(io.StringIO(''.join(gerar_csv(registros)))))
+
+
+def test_colunas_sao_os_campos_do_modelo_e_depois_os_extras():
+    registros = [Gasto(gasto(id=1)), Gasto(gasto(id=2, centro_custo='Obra 7')), Gasto(gasto(id=3, valor='abc'))]
+    colunas = colunas_csv(registros)
+    assert colunas[:len(Gasto.CAMPOS)] == list(Gasto.CAMPOS)
+    assert colunas[len(Gasto.CAMPOS):] == ['centro_custo']
+
+
+def test_csv_tem_uma_linha_por_registro_com_os_valores_originais():
+    registros = [Gasto(gasto(id=id)) for id in range(1, 1203)]
+    registros[1] = Gasto(gasto(id=2, centro_custo='Obra 7'))
+    registros.append(Gasto(gasto(id=1203, valor='abc')))
+    linhas = _ler_csv(registros)
+    assert len(linhas) == 1203
+    assert linhas[0]['valor'] == '100.0' and linhas[0]['nf_numero'] == ''
+    assert linhas[1]['centro_custo'] == 'Obra 7'
+    # Valor inválido sai como foi gravado, não como 0.0
+    assert linhas[-1]['valor'] == 'abc'
+
+
+def test_exportar_e_importar_de_volta(cliente):
+    for valor in (10, 20.5):
+        cliente.post('/api/gastos', json=gasto(valor=valor, observacoes='linha, com "aspas"'))
+    exportado = cliente.get('/api/gastos/exportar?formato=csv')
+    assert exportado.status_code == 200
+    corpo = exportado.get_data()
+
+    for registro in cliente.get('/api/gastos').get_json()['gastos']:
+        cliente.delete(f"/api/gastos/{registro['id']}")
+    importado = cliente.post('/api/gastos/bulk', data=corpo, content_type='text/csv')
+    assert importado.status_code == 200, importado.get_json()
+    gastos = cliente.get('/api/gastos').get_json()['gastos']
+    assert [(float(g['valor']), g['observacoes']) for g in gastos] == [(10, 'linha, com "aspas"'), (20.5, 'linha, com "aspas"')]
@@ -0,0 +1,108 @@
+# test_metricas.py - /api/metrics E PERFIL DAS REQUISIÇÕES
+import os
+import re
+
+import pytest
+
+from conftest import gasto
+from metricas import BALDES, Metricas, Perfilador, metricas
+
+LINHA = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+
+
+def _amostras(texto):
+    """[(nome, {rótulo: valor}, número)] das linhas que não são comentário"""
+    amostras = []
+    for linha in texto.splitlines():
+        if linha.startswith('#'):
+            continue
+        nome, rotulos, valor = LINHA.match(linha).groups()
+        rotulos = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', rotulos or ''))
+        amostras.append((nome, rotulos, float(valor)))
+    return amostras
+
+
+def _verificar_histogramas(amostras, nome):
+    """Baldes acumulados, em ordem, com +Inf igual a _count; devolve as séries encontradas"""
+    series = {}
+    for amostra, rotulos, valor in amostras:
+        if amostra == f'{nome}_bucket':
+            chave = tuple(sorted((k, v) for k, v in rotulos.items() if k != 'le'))
+            series.setdefault(chave, []).append((rotulos['le'], valor))
+    contagens = {tuple(sorted(rotulos.items())): valor
+                 for amostra, rotulos, valor in amostras if amostra == f'{nome}_count'}
+    for chave, baldes in series.items():
+        assert [le for le, _ in baldes] == [str(limite) for limite in BALDES] + ['+Inf']
+        quantidades = [quantidade for _, quantidade in baldes]
+        assert quantidades == sorted(quantidades)
+        assert quantidades[-1] == contagens[chave]
+    assert set(series) == set(contagens)
+    return series
+
+
+def test_histograma_acumula_os_baldes():
+    registro = Metricas()
+    for duracao in (0.0005, 0.003, 0.003, 0.2, 60):
+        registro.registrar_requisicao('GET', '/api/gastos', 200, duracao)
+    amostras = _amostras(registro.exportar())
+    series = _verificar_histogramas(amostras, 'frota_requisicao_duracao_segundos')
+    baldes = dict(series[(('metodo', 'GET'), ('rota', '/api/gastos'))])
+    assert (baldes['0.001'], baldes['0.005'], baldes['0.25'], baldes['10.0'], baldes['+Inf']) == (1, 3, 4, 4, 5)
+    soma = [v for nome, _, v in amostras if nome == 'frota_requisicao_duracao_segundos_sum']
+    assert soma == [pytest.approx(60.2065)]
+
+
+def test_rotulos_escapados():
+    registro = Metricas()
+    registro.registrar_requisicao('GET', '/api/"x"\\\n', 200, 0.01)
+    assert 'rota="/api/\\"x\\"\\\\\\n"' in registro.exportar()
+
+
+def test_rota_metrics(cliente):
+    metricas.limpar()
+    cliente.post('/api/gastos', json=gasto())
+    cliente.post('/api/gastos', json=gasto(valor='abc'))
+    for _ in range(3):
+        cliente.get('/api/gastos/1')
+    cliente.get('/api/gastos/99')
+
+    resposta = cliente.get('/api/metrics')
+    assert resposta.status_code == 200
+    assert resposta.mimetype == 'text/plain'
+    texto = resposta.get_data(as_text=True)
+    assert '# TYPE frota_requisicoes_total counter' in texto
+    assert '# TYPE frota_requisicao_duracao_segundos histogram' in texto
+    amostras = _amostras(texto)
+    contadores = {(r['metodo'], r['rota'], r['status']): v
+                  for nome, r, v in amostras if nome == 'frota_requisicoes_total'}
+    # A regra da rota, não a URL: uma série por status, não por id
+    assert contadores == {
+        ('POST', '/api/gastos', '200'): 1,
+        ('POST', '/api/gastos', '400'): 1,
+        ('GET', '/api/gastos/<int:id>', '200'): 3,
+        ('GET', '/api/gastos/<int:id>', '404'): 1,
+    }
+    duracoes = _verificar_histogramas(amostras, 'frota_requisicao_duracao_segundos')
+    assert duracoes[(('metodo', 'GET'), ('rota', '/api/gastos/<int:id>'))][-1] == ('+Inf', 4)
+    secoes = _verificar_histogramas(amostras, 'frota_secao_duracao_segundos')
+    assert (('secao', 'gravar'),) in secoes
+    lotes = {nome: v for nome, _, v in amostras if nome.startswith('frota_escrita_')}
+    assert lotes == {'frota_escrita_lotes_total': 1, 'frota_escrita_alteracoes_total': 1}
+
+
+def test_perfil_vai_para_o_stderr(tmp_path, capsys):
+    perfilador = Perfilador(str(tmp_path), limite_ms=0)
+    perfil = perfilador.iniciar()
+    assert perfil is not None
+    # Um perfil por vez
+    assert perfilador.iniciar() is None
+    sorted(range(1000))
+    caminho = perfilador.finalizar(perfil, '/api/gastos', 0.01)
+    saida = capsys.readouterr()
+    assert saida.out == ''
+    assert caminho in saida.err and 'cumulative' in saida.err
+    assert os.path.dirname(caminho) == str(tmp_path) and os.path.exists(caminho)
+    # Liberado para o próximo; abaixo do limite não grava nada
+    perfilador.limite = 1
+    assert perfilador.finalizar(perfilador.iniciar(), '/api/gastos', 0.01) is None
+    assert capsys.readouterr().err == ''
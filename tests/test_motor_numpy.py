@@ -0,0 +1,66 @@
+# test_motor_numpy.py - MOTOR COLUNAR x CÁLCULO EM PYTHON
+from datetime import date
+
+import pytest
+
+from calculos import aplicar_filtros, calcular_analise_gastos
+from conftest import gasto
+from gerador_frota import gerar_frota
+from modelos import Gasto
+
+pytest.importorskip('numpy')
+from motor_numpy import MotorNumpy  # noqa: E402
+
+FILTROS = [
+    {},
+    {'ano': '2024'},
+    {'ano': '2024', 'mes': '3'},
+    {'mes': '11'},
+    {'veiculo': 'Caminhão 01'},
+    {'veiculo': 'Caminhão 01', 'ano': '2023', 'mes': '12'},
+    {'placa': 'ABC-1234'},
+    {'motorista': 'Ana'},
+    {'veiculo': 'Inexistente'},
+    # tipo_gasto não é filtro da análise: os dois ignoram
+    {'tipo_gasto': 'Combustivel', 'ano': '2024'},
+]
+
+
+def _frota():
+    frota = gerar_frota(veiculos=6, motoristas=4, anos=2, semente=7, ate=date(2024, 12, 31))['gastos']
+    # Casos que o gerador não cobre: valor inválido, sem data, data fora do formato e campos ausentes
+    extras = [
+        gasto(data='2024-03-05', valor='abc'),
+        gasto(data='2024-03-06', valor=None),
+        gasto(data='', valor=12.5),
+        gasto(data='2024-3-7', valor=8),
+        {'data': '2024-03-08', 'valor': '19.90', 'tipo_gasto': 'Pneus'},
+        gasto(data='2023-12-01', valor=0.1),
+        gasto(data='2023-12-02', valor=0.2),
+    ]
+    return [Gasto({**registro, 'id': i + 1}) for i, registro in enumerate(frota + extras)]
+
+
+@pytest.mark.parametrize('gastos', [[], _frota()], ids=['vazio', 'frota'])
+@pytest.mark.parametrize('filtros', FILTROS)
+def test_motor_numpy_igual_ao_calculo_em_python(gastos, filtros):
+    motor = MotorNumpy()
+    motor.reconstruir((g['id'], g) for g in gastos)
+    assert motor.analise(filtros) == calcular_analise_gastos(aplicar_filtros(gastos, filtros))
+
+
+@pytest.mark.parametrize('filtros', FILTROS)
+def test_motor_numpy_igual_depois_de_alterar(filtros):
+    gastos = {g['id']: g for g in _frota()}
+    motor = MotorNumpy()
+    for id, registro in gastos.items():
+        motor.adicionar(id, registro)
+    # Alterações no meio da ordem de registro, inclusive para valor inválido e sem data
+    for id in list(gastos)[::5]:
+        gastos[id] = gastos[id].alterar({'valor': 'x', 'data': ''} if id % 2 else {'veiculo': 'Caminhão 01'})
+        motor.atualizar(id, gastos[id])
+    for id in list(gastos)[1::3]:
+        del gastos[id]
+        motor.remover(id)
+    esperado = calcular_analise_gastos(aplicar_filtros(list(gastos.values()), filtros))
+    assert motor.analise(filtros) == esperado
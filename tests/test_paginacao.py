@@ -0,0 +1,84 @@
+# test_paginacao.py - ?limit=, ?offset=, ?sort= E ?fields= DAS LISTAGENS
+import pytest
+
+from conftest import gasto
+
+
+@pytest.fixture
+def cinco_gastos(cliente):
+    valores = [30, 10, 50, 20, 40]
+    for dia, valor in enumerate(valores, start=1):
+        cliente.post('/api/gastos', json=gasto(data=f'2024-01-0{dia}', valor=valor, placa=f'P-{6 - dia}'))
+    return valores
+
+
+def _gastos(cliente, query):
+    corpo = cliente.get(f'/api/gastos?{query}').get_json()
+    return corpo['gastos'], corpo['paginacao']
+
+
+@pytest.mark.parametrize('query, ids, paginacao', [
+    ('', [1, 2, 3, 4, 5], {'total': 5, 'limit': None, 'offset': 0}),
+    ('limit=2', [1, 2], {'total': 5, 'limit': 2, 'offset': 0}),
+    ('limit=2&offset=2', [3, 4], {'total': 5, 'limit': 2, 'offset': 2}),
+    ('limit=2&offset=4', [5], {'total': 5, 'limit': 2, 'offset': 4}),
+    ('offset=3', [4, 5], {'total': 5, 'limit': None, 'offset': 3}),
+    ('offset=5', [], {'total': 5, 'limit': None, 'offset': 5}),
+    ('offset=99&limit=1', [], {'total': 5, 'limit': 1, 'offset': 99}),
+    ('limit=0', [], {'total': 5, 'limit': 0, 'offset': 0}),
+    ('limit=100', [1, 2, 3, 4, 5], {'total': 5, 'limit': 100, 'offset': 0}),
+])
+def test_limit_e_offset(cliente, cinco_gastos, query, ids, paginacao):
+    gastos, recebida = _gastos(cliente, query)
+    assert [g['id'] for g in gastos] == ids
+    assert recebida == paginacao
+
+
+@pytest.mark.parametrize('query, ids', [
+    ('sort=valor', [2, 4, 1, 5, 3]),
+    ('sort=-valor', [3, 5, 1, 4, 2]),
+    ('sort=-data', [5, 4, 3, 2, 1]),
+    ('sort=placa', [5, 4, 3, 2, 1]),
+    # A ordenação vem antes da página
+    ('sort=-valor&limit=2&offset=1', [5, 1]),
+])
+def test_sort(cliente, cinco_gastos, query, ids):
+    assert [g['id'] for g in _gastos(cliente, query)[0]] == ids
+
+
+def test_sort_mantem_a_ordem_de_registro_nos_empates(cliente):
+    for valor in (5, 1, 5, 1):
+        cliente.post('/api/gastos', json=gasto(valor=valor))
+    assert [g['id'] for g in _gastos(cliente, 'sort=-valor')[0]] == [1, 3, 2, 4]
+
+
+def test_fields_projeta_os_campos(cliente, cinco_gastos):
+    gastos, paginacao = _gastos(cliente, 'fields=valor,placa&sort=-valor&limit=2')
+    assert gastos == [{'id': 3, 'valor': 50, 'placa': 'P-3'}, {'id': 5, 'valor': 40, 'placa': 'P-1'}]
+    assert paginacao['total'] == 5
+    # Campo que não existe não aparece; o id vai sempre
+    assert _gastos(cliente, 'fields=inexistente&limit=1')[0] == [{'id': 1}]
+    diarias = cliente.get('/api/diarias?fields=motorista').get_json()
+    assert diarias['diarias'] == [] and diarias['status'] == 'sucesso'
+
+
+@pytest.mark.parametrize('rota', ['/api/gastos', '/api/diarias', '/api/servicos'])
+@pytest.mark.parametrize('query', ['limit=abc', 'limit=-1', 'offset=-2', 'offset=1.5', 'sort=motorista',
+                                   'sort=-inexistente', 'sort=--valor'])
+def test_parametros_invalidos_retornam_400(cliente, rota, query):
+    if rota == '/api/diarias' and query == 'sort=motorista':
+        query = 'sort=placa'
+    resposta = cliente.get(f'{rota}?{query}')
+    assert resposta.status_code == 400
+    assert resposta.get_json()['status'] == 'erro'
+
+
+def test_obter_gasto(cliente, cinco_gastos):
+    resposta = cliente.get('/api/gastos/3')
+    assert resposta.status_code == 200
+    assert resposta.get_json()['gasto']['valor'] == 50
+    cliente.delete('/api/gastos/3')
+    for id in (3, 6, 0):
+        resposta = cliente.get(f'/api/gastos/{id}')
+        assert resposta.status_code == 404
+        assert resposta.get_json() == {'status': 'erro', 'mensagem': 'Gasto não encontrado'}
@@ -0,0 +1,108 @@
+# test_persistencia.py - JOURNAL E COMPACTAÇÃO
+import os
+import subprocess
+import sys
+import time
+
+from conftest import RAIZ, diaria, gasto
+from persistencia import PersistenciaJournal, reaplicar_journal
+
+# Grava pelo repositório e termina o processo sem atexit (sem fechar() nem fsync final)
+QUEDA = '''
+import os, sys
+sys.path.insert(0, {raiz!r})
+from persistencia import criar_persistencia
+from repositorio import RepositorioDados
+caminho = {caminho!r}
+repositorio = RepositorioDados(caminho, criar_persistencia('journal', caminho))
+ids = repositorio.inserir_gastos([{{'data': '2024-01-0%d' % dia, 'veiculo': 'V', 'valor': dia}} for dia in range(1, 6)])
+repositorio.atualizar_gasto(ids[0], {{'valor': 99}})
+repositorio.excluir_gasto(ids[1])
+repositorio.inserir_diaria({{'id': 'd1', 'motorista': 'Ana', 'data_inicio': '2024-01-02', 'valor_total': 10}})
+os._exit(0)
+'''
+
+
+def _resumo(repositorio):
+    return ([(g['id'], g['valor']) for g in repositorio.listar_gastos()],
+            [d['id'] for d in repositorio.listar_diarias()])
+
+
+def test_journal_reaplicado_depois_de_uma_queda(abrir, tmp_path):
+    caminho = str(tmp_path / 'gastos_veiculos.json')
+    subprocess.run([sys.executable, '-c', QUEDA.format(raiz=RAIZ, caminho=caminho)], check=True)
+    # Só o journal chegou ao disco: nenhum snapshot foi gravado
+    assert not os.path.exists(caminho)
+    assert os.path.exists(f"{caminho}.journal")
+
+    repositorio = abrir('journal')
+    assert _resumo(repositorio) == ([(1, 99.0), (3, 3.0), (4, 4.0), (5, 5.0)], ['d1'])
+    assert repositorio.resumo_dashboard('2024-01')['total_gastos'] == 111
+    # O próximo id continua depois dos que vieram do journal
+    assert repositorio.inserir_gasto(gasto()) == 6
+
+
+def test_ultima_linha_truncada_e_descartada(abrir, tmp_path):
+    repositorio = abrir('journal')
+    repositorio.inserir_gasto(gasto(valor=1))
+    repositorio.inserir_gasto(gasto(valor=2))
+    repositorio._persistencia.fechar()
+    with open(tmp_path / 'gastos_veiculos.json.journal', 'ab') as f:
+        f.write(b'{"entidade":"gastos","op":"gravar","registro":{"id":3,')
+
+    assert _resumo(abrir('journal'))[0] == [(1, 1.0), (2, 2.0)]
+
+
+def test_compactacao_interrompida_junta_os_dois_journals(tmp_path):
+    caminho = str(tmp_path / 'gastos_veiculos.json')
+    linhas = {
+        f"{caminho}.journal.compactando": [
+            b'{"entidade":"gastos","op":"gravar","registro":{"id":1,"valor":1}}',
+            b'{"entidade":"gastos","op":"gravar","registro":{"id":2,"valor":2}}'],
+        f"{caminho}.journal": [
+            b'{"entidade":"gastos","op":"excluir","id":1}',
+            b'{"entidade":"gastos","op":"gravar","registro":{"id":2,"valor":20}}'],
+    }
+    for arquivo, conteudo in linhas.items():
+        with open(arquivo, 'wb') as f:
+            f.write(b'\n'.join(conteudo) + b'\n')
+
+    persistencia = PersistenciaJournal(caminho)
+    assert persistencia.carregar() == {'gastos': [{'id': 2, 'valor': 20}], 'diarias': []}
+
+
+def test_compactar_grava_snapshot_e_descarta_o_journal(abrir, tmp_path):
+    caminho = tmp_path / 'gastos_veiculos.json'
+    repositorio = abrir('journal')
+    for valor in range(1, 4):
+        repositorio.inserir_gasto(gasto(valor=valor))
+    repositorio.inserir_diaria(diaria('d1'))
+    esperado = _resumo(repositorio)
+
+    repositorio._persistencia.compactar()
+    assert caminho.exists()
+    assert not (tmp_path / 'gastos_veiculos.json.journal').exists()
+    assert not (tmp_path / 'gastos_veiculos.json.journal.compactando').exists()
+    # Alterações depois da compactação vão para um journal novo
+    repositorio.excluir_gasto(2)
+    assert _resumo(abrir('journal')) == ([(1, 1.0), (3, 3.0)], esperado[1])
+
+
+def test_compactacao_automatica_ao_passar_do_limite(abrir, tmp_path, monkeypatch):
+    monkeypatch.setattr(PersistenciaJournal, 'LIMITE_COMPACTACAO', 5)
+    monkeypatch.setattr(PersistenciaJournal, 'INTERVALO_FSYNC', 0.01)
+    repositorio = abrir('journal')
+    repositorio.inserir_gastos([gasto(valor=valor) for valor in range(6)])
+    journal = tmp_path / 'gastos_veiculos.json.journal'
+    limite = time.monotonic() + 5
+    while journal.exists() and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert not journal.exists()
+    assert len(abrir('arquivo').listar_gastos()) == 6
+
+
+def test_reaplicar_o_journal_sobre_o_snapshot_que_ja_o_contem_nao_duplica():
+    dados = {'gastos': [{'id': 1, 'valor': 1}, {'id': 2, 'valor': 2}], 'diarias': []}
+    mutacoes = [{'entidade': 'gastos', 'op': 'gravar', 'registro': {'id': 1, 'valor': 1}},
+                {'entidade': 'gastos', 'op': 'excluir', 'id': 3}]
+    assert reaplicar_journal(dados, mutacoes)['gastos'] == [{'id': 1, 'valor': 1}, {'id': 2, 'valor': 2}]
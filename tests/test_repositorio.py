@@ -0,0 +1,151 @@
+# test_repositorio.py - BACKENDS DE DADOS (memoria, journal, sqlite, particionado)
+from datetime import date
+
+import pytest
+
+import repositorio_particionado
+from conftest import BACKENDS, diaria, gasto
+from gerador_frota import gerar_frota
+
+
+def _falhar_gravacao(repositorio, monkeypatch):
+    """Faz a próxima gravação do repositório levantar OSError"""
+    def falhar(*args, **kwargs):
+        raise OSError('disco cheio')
+    if isinstance(repositorio, repositorio_particionado.RepositorioParticionado):
+        monkeypatch.setattr(repositorio_particionado, 'gravar_json_atomico', falhar)
+    else:
+        monkeypatch.setattr(repositorio._persistencia, 'registrar', falhar)
+
+
+@pytest.mark.parametrize('backend', ['memoria', 'journal', 'particionado'])
+def test_falha_ao_gravar_desfaz_o_lote_na_memoria(abrir, monkeypatch, backend):
+    repositorio = abrir(backend)
+    id = repositorio.inserir_gasto(gasto(valor=100))
+    versao = repositorio.versao()
+
+    with monkeypatch.context() as contexto:
+        _falhar_gravacao(repositorio, contexto)
+        with pytest.raises(OSError):
+            repositorio.inserir_gasto(gasto(data='2024-03-01', valor=50))
+        with pytest.raises(OSError):
+            repositorio.atualizar_gasto(id, {'valor': 999})
+
+    # A memória voltou ao que está no disco
+    assert [(g['id'], g['valor']) for g in repositorio.listar_gastos()] == [(id, 100)]
+    assert repositorio.resumo_dashboard('2024-01')['total_gastos'] == 100
+    assert repositorio.versao() != versao
+    # E a fila de escrita continua funcionando
+    novo = repositorio.inserir_gasto(gasto(valor=10))
+    assert [g['id'] for g in abrir(backend).listar_gastos()] == [id, novo]
+
+
+@pytest.mark.parametrize('backend', ['memoria', 'journal', 'sqlite', 'particionado'])
+def test_excluir_id_inexistente_nao_grava(abrir, tmp_path, backend):
+    repositorio = abrir(backend)
+    repositorio.inserir_gasto(gasto())
+    versao = repositorio.versao()
+    arquivos = {caminho: caminho.stat().st_mtime_ns for caminho in tmp_path.rglob('*') if caminho.is_file()}
+
+    assert repositorio.excluir_gasto(999) is False
+    assert repositorio.excluir_diaria('nao-existe') is False
+    assert repositorio.versao() == versao
+    assert {caminho: caminho.stat().st_mtime_ns for caminho in tmp_path.rglob('*') if caminho.is_file()} == arquivos
+
+
+def _dados_frota():
+    dados = gerar_frota(veiculos=6, motoristas=4, anos=2, semente=7, ate=date(2024, 6, 30))
+    # Casos que o gerador não cobre: sem data, valor inválido e campos extras
+    dados['gastos'].append({'id': 10000, 'veiculo': 'Sem data', 'placa': 'SDT-0000', 'tipo_gasto': 'Outros',
+                            'valor': '12.5'})
+    dados['gastos'].append({'id': 10001, 'data': '2024-02-10', 'veiculo': 'Valor ruim', 'placa': 'VRM-0001',
+                            'motorista': 'Ana', 'tipo_gasto': 'Combustivel', 'valor': 'abc', 'centro_custo': 'Obra 7'})
+    return dados
+
+
+def _alterar(repositorio):
+    """A mesma sequência de alterações em qualquer backend"""
+    ids = repositorio.inserir_gastos([gasto(data='2024-06-%02d' % dia, valor=dia) for dia in range(1, 6)])
+    repositorio.inserir_gasto(gasto(data='2024-05-03', tipo_gasto='Manutencao', garantia_validade='2024-07-01'))
+    repositorio.atualizar_gasto(ids[0], {'valor': 321.45, 'data': '2023-11-30'})
+    repositorio.excluir_gasto(ids[1])
+    repositorio.excluir_gasto(3)
+    repositorio.inserir_diarias([diaria('20240601080000', data_inicio='2024-06-01') for _ in range(3)])
+    repositorio.atualizar_diaria('20240601080000-2', {'data_inicio': '2024-02-01', 'valor_total': 75.5})
+    repositorio.excluir_diaria('20240601080000')
+    repositorio.renovar_status_garantia('2024-03-01')
+
+
+def _consultas(repositorio):
+    filtros = [{}, {'ano': '2024'}, {'ano': '2023', 'mes': '7'}, {'placa': 'ABC-1234'},
+               {'motorista': 'Ana', 'ano': '2024'}]
+    return {
+        'gastos': [dict(g) for g in repositorio.listar_gastos()],
+        'diarias': [dict(d) for d in repositorio.listar_diarias()],
+        'servicos': [dict(s) for s in repositorio.listar_servicos()],
+        'paginas': [(entidade, ordenar, total, [r['id'] for r in registros])
+                    for entidade in ('gastos', 'diarias', 'servicos')
+                    for ordenar in (None, 'valor', '-data')
+                    for total, registros in [repositorio.pagina(entidade, ordenar, limite=7, offset=3)]],
+        'filtrados': [[g['id'] for g in repositorio.filtrar_gastos(f)] for f in filtros],
+        'analises': [repositorio.analise(f) for f in filtros],
+        'dashboard': [repositorio.resumo_dashboard(mes) for mes in ('2024-06', '2024-02', '2019-01')],
+        'opcoes': repositorio.opcoes_filtros(),
+        'garantias': repositorio.resumo_garantias('2024-03-01'),
+        'vencendo': [g['id'] for g in repositorio.servicos_vencendo('2024-01-01', '2024-12-31')],
+        'tendencias': [repositorio.tendencias(dimensao=dimensao, meses=12, janelas=[3, 6], top=5, limite=0)
+                       for dimensao in ('veiculo', 'placa', 'motorista')],
+    }
+
+
+def test_backends_dao_os_mesmos_resultados(abrir):
+    esperado = None
+    for backend in BACKENDS:
+        repositorio = abrir(backend)
+        repositorio.substituir(_dados_frota())
+        _alterar(repositorio)
+        # Totais mantidos a cada alteração e os refeitos ao reabrir do disco
+        for consultado in (repositorio, abrir(backend)):
+            resultado = _consultas(consultado)
+            if esperado is None:
+                esperado = resultado
+            for chave in esperado:
+                assert resultado[chave] == esperado[chave], (backend, chave)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_valor_invalido_nao_grava_nada(abrir, backend):
+    repositorio = abrir(backend)
+    id = repositorio.inserir_gasto(gasto(valor=10))
+    with pytest.raises(ValueError):
+        repositorio.inserir_gastos([gasto(valor=1), gasto(valor='abc')])
+    with pytest.raises(ValueError):
+        repositorio.atualizar_gasto(id, {'valor': 'abc'})
+    with pytest.raises(ValueError):
+        repositorio.inserir_diaria(diaria('d1', valor_total='abc'))
+    assert [(g['id'], g['valor']) for g in abrir(backend).listar_gastos()] == [(id, 10)]
+    assert repositorio.listar_diarias() == []
+    assert repositorio.resumo_dashboard('2024-01')['total_gastos'] == 10
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_registro_antigo_com_valor_invalido_continua_editavel(abrir, backend):
+    repositorio = abrir(backend)
+    repositorio.substituir({
+        'gastos': [gasto(id=1, valor='abc', garantia_validade='2024-06-01', status_garantia='Vigente'),
+                   gasto(id=2, valor=40)],
+        'diarias': [diaria('d1', valor_total='abc')],
+    })
+    # Só o que a atualização envia é validado
+    assert repositorio.atualizar_gasto(1, {'motorista': 'Zé'})['motorista'] == 'Zé'
+    assert repositorio.atualizar_diaria('d1', {'motorista': 'Bia'})['motorista'] == 'Bia'
+    assert repositorio.renovar_status_garantia('2024-07-01') == 1
+    with pytest.raises(ValueError):
+        repositorio.atualizar_gasto(1, {'valor': 'xyz'})
+    reaberto = abrir(backend)
+    antigo = reaberto.obter_gasto(1)
+    assert (antigo['valor'], antigo['motorista'], antigo['status_garantia']) == ('abc', 'Zé', 'Vencida')
+    assert reaberto.obter_diaria('d1')['valor_total'] == 'abc'
+    assert reaberto.resumo_dashboard('2024-01')['total_gastos'] == 40
+    repositorio.atualizar_gasto(1, {'valor': 5})
+    assert abrir(backend).resumo_dashboard('2024-01')['total_gastos'] == 45
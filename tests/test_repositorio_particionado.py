@@ -0,0 +1,91 @@
+# test_repositorio_particionado.py - BACKEND PARTICIONADO POR MÊS
+from conftest import diaria, gasto
+
+
+def _ids(registros):
+    return [registro['id'] for registro in registros]
+
+
+def test_diarias_na_mesma_ordem_do_backend_memoria(abrir):
+    memoria, particionado = abrir('memoria'), abrir('particionado')
+    # Mesmo id base no mesmo segundo: os sufixos -2 ... -12 não seguem a ordem de texto
+    lote = [diaria('20240110080000', data_inicio=f"2024-{mes:02d}-10") for mes in (3, 1, 2) * 4]
+    for repositorio in (memoria, particionado):
+        repositorio.inserir_diarias(lote)
+        repositorio.inserir_diaria(diaria('20240105080000', data_inicio='2023-12-20'))
+        # Mudar de mês troca a partição, mas não o lugar na listagem
+        repositorio.atualizar_diaria('20240110080000-2', {'data_inicio': '2024-06-01'})
+        repositorio.excluir_diaria('20240110080000-5')
+
+    esperado = _ids(memoria.listar_diarias())
+    assert esperado[:3] == ['20240110080000', '20240110080000-2', '20240110080000-3']
+    assert _ids(particionado.listar_diarias()) == esperado
+    assert _ids(particionado.pagina('diarias', limite=5, offset=8)[1]) == esperado[8:13]
+    # A ordem vem do índice ao reabrir
+    assert _ids(abrir('particionado').listar_diarias()) == esperado
+
+
+def test_ordem_da_migracao_e_dos_gastos(abrir):
+    dados = {
+        'gastos': [gasto(id=id, data=data) for id, data in ((3, '2024-02-01'), (1, '2024-01-01'), (2, '2024-02-15'))],
+        'diarias': [diaria('b', '2024-02-01'), diaria('a', '2024-01-01')]
+    }
+    particionado = abrir('particionado')
+    particionado.substituir(dados)
+    reaberto = abrir('particionado')
+    assert _ids(reaberto.listar_gastos()) == [3, 1, 2]
+    assert _ids(reaberto.listar_diarias()) == ['b', 'a']
+    reaberto.inserir_gasto(gasto(data='2023-12-01'))
+    assert _ids(abrir('particionado').listar_gastos()) == [3, 1, 2, 4]
+
+
+def _manifesto(pasta):
+    with open(pasta / 'manifesto.json', 'rb') as f:
+        return f.read()
+
+
+def test_manifesto_nao_cresce_com_os_registros(abrir, tmp_path):
+    particionado = abrir('particionado')
+
+    def inserir(quantidade):
+        particionado.inserir_gastos([
+            gasto(data=f"2024-{i % 3 + 1:02d}-10", veiculo=f"Caminhão {i % 4}", valor=i % 97 + 0.5,
+                  tipo_gasto='Manutencao', garantia_validade=f"2025-{i % 12 + 1:02d}-01")
+            for i in range(quantidade)
+        ])
+        particionado.inserir_diarias([diaria(f"2024010{i % 3 + 1}08{i:06d}", f"2024-{i % 3 + 1:02d}-10")
+                                      for i in range(quantidade // 4)])
+
+    inserir(200)
+    antes = len(_manifesto(tmp_path / 'particoes'))
+    inserir(4000)
+    manifesto = _manifesto(tmp_path / 'particoes')
+    # Mesmos meses, veículos e motoristas: só os números mudam de tamanho
+    assert len(manifesto) < antes * 1.1
+    assert len(manifesto) < 8000
+    assert b'"2025-' not in manifesto
+    # Os ids e as garantias estão no índice
+    reaberto = abrir('particionado')
+    assert len(reaberto.listar_gastos()) == 4200
+    assert reaberto.resumo_garantias('2025-06-15')['vigentes'] == particionado.resumo_garantias('2025-06-15')['vigentes']
+
+
+def test_particao_gravada_sem_o_manifesto(abrir, tmp_path):
+    particionado = abrir('particionado')
+    particionado.inserir_gastos([gasto(data='2024-01-10'), gasto(data='2024-02-10', valor=50)])
+    manifesto = _manifesto(tmp_path / 'particoes')
+    indice = {caminho.name: caminho.read_bytes() for caminho in (tmp_path / 'particoes').glob('indice-*')}
+    id = particionado.inserir_gasto(gasto(data='2024-02-20', valor=7, veiculo='Van 02'))
+    particionado.excluir_gasto(1)
+    # Queda depois de gravar as partições: manifesto e índice voltam ao estado anterior
+    (tmp_path / 'particoes' / 'manifesto.json').write_bytes(manifesto)
+    for nome, conteudo in indice.items():
+        (tmp_path / 'particoes' / nome).write_bytes(conteudo)
+
+    reaberto = abrir('particionado')
+    assert _ids(reaberto.listar_gastos()) == [2, id]
+    assert reaberto.resumo_dashboard('2024-02')['total_gastos'] == 57
+    assert 'Van 02' in reaberto.opcoes_filtros()['veiculos']
+    # A próxima gravação deixa manifesto e índice de acordo com as partições
+    reaberto.inserir_gasto(gasto(data='2024-03-01', valor=1))
+    assert _ids(abrir('particionado').listar_gastos()) == [2, id, id + 1]
@@ -0,0 +1,96 @@
+# test_tendencias.py - SÉRIES MENSAIS, MÉDIAS MÓVEIS E OUTLIERS
+import pytest
+
+from conftest import BACKENDS, gasto
+
+
+def _frota(repositorio):
+    # Veículo A: 100 em jan, nada em fev, 300 em mar e 50 em abr; veículo B: 10 em abr
+    repositorio.inserir_gastos([
+        gasto(data='2024-01-10', veiculo='A', valor=60),
+        gasto(data='2024-01-20', veiculo='A', valor=40),
+        gasto(data='2024-03-05', veiculo='A', valor=300),
+        gasto(data='2024-04-05', veiculo='A', valor=50),
+        gasto(data='2024-04-06', veiculo='B', valor=10),
+    ])
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_medias_moveis_e_variacao(abrir, backend):
+    repositorio = abrir(backend)
+    _frota(repositorio)
+    tendencias = repositorio.tendencias(meses=3, janelas=[2], ate='2024-04', top=10, limite=0)
+    assert tendencias['meses'] == ['2024-02', '2024-03', '2024-04']
+
+    frota = tendencias['frota']
+    assert frota['valores'] == [0, 300, 60]
+    assert frota['total'] == 360
+    # A média de fevereiro já usa janeiro, que fica fora dos meses exibidos
+    assert frota['medias'] == {'2': [50, 150, 180]}
+    assert frota['variacao'] == [-100, 300, -240]
+    # Mês anterior zerado: sem percentual
+    assert frota['variacao_percentual'] == [-100.0, None, -80.0]
+
+    assert list(tendencias['series']) == ['A', 'B']
+    assert tendencias['series']['A']['medias'] == {'2': [50, 150, 175]}
+    assert tendencias['series']['A']['variacao_percentual'] == [-100.0, None, -83.33]
+    assert tendencias['series']['B']['valores'] == [0, 0, 10]
+    assert tendencias['series']['B']['variacao_percentual'] == [None, None, None]
+
+    # Sem ?ate=, o último mês com gastos
+    assert repositorio.tendencias(meses=3, janelas=[2], top=10, limite=0) == tendencias
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_janelas_maiores_que_o_historico(abrir, backend):
+    repositorio = abrir(backend)
+    _frota(repositorio)
+    tendencias = repositorio.tendencias(meses=2, janelas=[1, 4], ate='2024-04', limite=1)
+    assert tendencias['janelas'] == [1, 4]
+    # Meses antes do primeiro gasto contam como zero
+    assert tendencias['frota']['medias'] == {'1': [300, 60], '4': [100, 115]}
+    assert list(tendencias['series']) == ['A']
+
+
+def test_outliers(abrir):
+    repositorio = abrir('memoria')
+    _frota(repositorio)
+    tendencias = repositorio.tendencias(meses=3, janelas=[2, 3], ate='2024-04', top=10)
+    # Base: média dos 2 meses anteriores (a menor janela), em todas as chaves
+    assert [(o['nome'], o['mes'], o['desvio']) for o in tendencias['outliers']] == [
+        ('A', '2024-03', 250), ('A', '2024-04', -100), ('A', '2024-02', -50), ('B', '2024-04', 10)]
+    maior = tendencias['outliers'][0]
+    assert (maior['valor'], maior['media_anterior'], maior['percentual']) == (300, 50, 500.0)
+    assert tendencias['outliers'][-1]['percentual'] is None
+    assert len(repositorio.tendencias(meses=3, janelas=[2], ate='2024-04', top=2)['outliers']) == 2
+    assert repositorio.tendencias(meses=3, janelas=[2], ate='2024-04', top=0)['outliers'] == []
+
+
+def test_dimensao_e_frota_vazia(abrir):
+    repositorio = abrir('memoria')
+    assert repositorio.tendencias()['meses'] == []
+    assert repositorio.tendencias()['frota'] is None
+    _frota(repositorio)
+    repositorio.inserir_gasto(gasto(data='2024-04-07', veiculo='B', motorista='Bia', valor=5))
+    tendencias = repositorio.tendencias(dimensao='motorista', meses=1, janelas=[1], ate='2024-04')
+    assert {nome: serie['total'] for nome, serie in tendencias['series'].items()} == {'Ana': 60, 'Bia': 5}
+
+
+def test_rota_tendencias(app_modulo, cliente):
+    _frota(app_modulo.repositorio)
+    resposta = cliente.get('/api/analise/tendencias?meses=3&janelas=2&ate=2024-04&top=1&limite=1')
+    assert resposta.status_code == 200
+    tendencias = resposta.get_json()['tendencias']
+    assert tendencias['frota']['medias'] == {'2': [50, 150, 180]}
+    assert list(tendencias['series']) == ['A']
+    assert [o['mes'] for o in tendencias['outliers']] == ['2024-03']
+
+
+@pytest.mark.parametrize('parametros', [
+    'dimensao=tipo', 'janelas=a', 'janelas=0', 'janelas=37', 'janelas=,', 'meses=0', 'meses=121',
+    'meses=abc', 'top=-1', 'top=101', 'limite=x', 'ate=2024-13', 'ate=2024-1', 'ate=abril',
+])
+def test_rota_tendencias_com_parametro_invalido_retorna_400(cliente, parametros):
+    resposta = cliente.get(f'/api/analise/tendencias?{parametros}')
+    assert resposta.status_code == 400
+    assert resposta.get_json()['status'] == 'erro'